@@ -3,6 +3,11 @@ import numpy as np
 from collections import Counter
 import subprocess
 import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from fababean.genotype_store import GenotypeStore, is_store
 
 def calculate_heterozygosity(genotypes):
     """Calculate observed heterozygosity"""
@@ -41,8 +46,8 @@ def get_allele_frequencies(genotypes):
         alleles.extend(gt)
     return Counter(alleles)
 
-def analyze_marker_diversity(vcf_file, output_file):
-    """Analyze genetic diversity for each marker in VCF file"""
+def read_vcf_markers(vcf_file):
+    """Read sample names and (marker, chr, position, genotypes) rows from a VCF file"""
     
     # Read VCF file
     vcf_data = []
@@ -61,7 +66,7 @@ def analyze_marker_diversity(vcf_file, output_file):
                     samples = line.strip().split('\t')[9:]
                     break
     
-    results = []
+    markers = []
     
     for row in vcf_data:
         chrom = row[0]
@@ -95,6 +100,41 @@ def analyze_marker_diversity(vcf_file, output_file):
             except (ValueError, IndexError):
                 continue
         
+        markers.append((marker_id, chrom, pos, genotypes))
+    
+    return samples, markers
+
+def read_store_markers(store_path, snp_ids=None):
+    """Read sample names and (marker, chr, position, genotypes) rows from a genotype store"""
+    store = GenotypeStore(store_path)
+    variants = store.variants()
+    if snp_ids is None:
+        rows = np.arange(store.n_snps)
+    else:
+        rows = np.flatnonzero(variants['id'].isin(snp_ids).to_numpy())
+    counts = store.take(rows)
+    
+    markers = []
+    for row, snp_counts in zip(rows, counts):
+        variant = variants.iloc[row]
+        ref, alt = variant['ref'], variant['alt']
+        calls = {0: [ref, ref], 1: [ref, alt], 2: [alt, alt]}
+        genotypes = [calls[count] for count in snp_counts.tolist() if count in calls]
+        markers.append((variant['id'], variant['chrom'], str(variant['pos']), genotypes))
+    
+    return store.samples, markers
+
+def analyze_marker_diversity(vcf_file, output_file, snp_ids=None):
+    """Analyze genetic diversity for each marker in VCF file (or genotype store)"""
+    
+    if is_store(vcf_file):
+        samples, markers = read_store_markers(vcf_file, snp_ids)
+    else:
+        samples, markers = read_vcf_markers(vcf_file)
+    
+    results = []
+    
+    for marker_id, chrom, pos, genotypes in markers:
         if not genotypes:
             continue
             
@@ -133,10 +173,17 @@ def analyze_marker_diversity(vcf_file, output_file):
 
 if __name__ == "__main__":
     vcf_file = "../output/faba_150.vcf"
+    store_path = "../../01_Raw/pop_genotypes.gstore"
+    snp_list = "../data/top_150_snps_list.txt"
     output_file = "../output/faba_genetic_diversity.csv"
     
     if os.path.exists(vcf_file):
         analyze_marker_diversity(vcf_file, output_file)
+    elif is_store(store_path) and os.path.exists(snp_list):
+        # Read the panel SNPs from the genotype store built in stage 01 instead of a VCF
+        with open(snp_list) as f:
+            snp_ids = [line.split()[0] for line in f if line.strip()]
+        analyze_marker_diversity(store_path, output_file, snp_ids)
     else:
         print(f"VCF file {vcf_file} not found!")
         print("Available files in output directory:")
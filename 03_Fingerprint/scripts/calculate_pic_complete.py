@@ -1,26 +1,75 @@
 # scripts/calculate_pic_complete.py
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 import numpy as np
-import subprocess
 import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from fababean import MISSING, BedFile, GenotypeView
+from fababean.shared import share_genotypes
 
 def calculate_pic(p, q):
     """Calculate Polymorphic Information Content for biallelic SNP"""
     return 1 - (p**2 + q**2) - 2*(p**2)*(q**2)
 
+def count_alleles(genotypes, missing):
+    """A1 allele copies and called genotypes of every SNP row"""
+    return np.where(missing, 0, genotypes).sum(axis=1), (~missing).sum(axis=1)
+
+def _count_block(task):
+    """Worker: allele counts of a SNP range of the published genotypes"""
+    handle, start, stop = task
+    genotypes, missing = handle.attach()
+    return start, count_alleles(genotypes[start:stop], missing[start:stop])
+
+def allele_frequencies(bfile, workers=1, block_snps=8192):
+    """A1 allele frequencies as in a PLINK .frq table, computed from the .bed file"""
+    with BedFile(bfile) as bed:
+        a1_counts = np.zeros(bed.n_snps, dtype=np.int64)
+        called = np.zeros(bed.n_snps, dtype=np.int64)
+        if workers > 1:
+            # Decoded once into shared memory, workers attach to it instead of receiving copies
+            with share_genotypes(GenotypeView(bed), block_snps=block_snps) as shared:
+                tasks = [(shared.handle, start, min(start + block_snps, bed.n_snps))
+                         for start in range(0, bed.n_snps, block_snps)]
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    for start, (a1, n_called) in pool.map(_count_block, tasks):
+                        a1_counts[start:start + len(a1)] = a1
+                        called[start:start + len(a1)] = n_called
+        else:
+            for start, block in bed.iter_blocks(block_snps):
+                stop = start + len(block)
+                a1_counts[start:stop], called[start:stop] = count_alleles(block, block == MISSING)
+        bim = bed.bim
+    with np.errstate(divide='ignore', invalid='ignore'):
+        maf = a1_counts / (2 * called)
+    return pd.DataFrame({
+        'CHR': bim['chrom'], 'SNP': bim['snp'], 'A1': bim['a1'], 'A2': bim['a2'],
+        # PLINK prints 4 significant digits, keep them so PIC ranks ties the same way
+        'MAF': [float(f'{value:.4g}') for value in maf],
+        'NCHROBS': 2 * called,
+    })
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="PIC of every SNP of the QC-filtered fileset")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Processes counting alleles when no .frq file exists (default: 1)")
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
     # Read allele frequencies
     frq_file = "data/Faba_high_quality.frq"
     
-    if not os.path.exists(frq_file):
-        print("Generating allele frequencies with PLINK...")
-        subprocess.run([
-            "plink", "--bfile", "data/Faba_high_quality", 
-            "--freq", "--out", "data/Faba_high_quality"
-        ])
-    
-    # Read frequency file
-    df_frq = pd.read_csv(frq_file, delim_whitespace=True)
+    if os.path.exists(frq_file):
+        # Read frequency file
+        df_frq = pd.read_csv(frq_file, delim_whitespace=True)
+    else:
+        print("Computing allele frequencies from the .bed file...")
+        df_frq = allele_frequencies("data/Faba_high_quality", workers=args.workers)
     
     # Calculate PIC
     df_frq['PIC'] = df_frq.apply(
@@ -1,45 +1,31 @@
 # scripts/create_fingerprint_heatmap.py
 
+import sys
+from pathlib import Path
+
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.patches import Patch
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from fababean import BedFile
+
 def load_genotype_data():
-    """Load genotype data from PLINK files"""
-    # Read sample information
-    fam = pd.read_csv('data/faba_fingerprint.fam',
-                      delim_whitespace=True, header=None,
-                      names=['FID', 'IID', 'Father', 'Mother', 'Sex', 'Phenotype'])
-    
-    # Read SNP information
-    bim = pd.read_csv('data/faba_fingerprint.bim',
-                      delim_whitespace=True, header=None,
-                      names=['CHR', 'SNP', 'cM', 'POS', 'A1', 'A2'])
-    
-    # Read genotype data (from .ped file)
-    ped = pd.read_csv('output/faba_fingerprint_genotypes.ped',
-                      delim_whitespace=True, header=None)
-    
-    # Extract genotype calls (columns 6 onwards are genotypes, pairs of alleles)
-    genotype_cols = ped.iloc[:, 6:]
-    sample_ids = fam['IID'].astype(str).tolist()
-
-    # Convert genotype pairs to single genotype calls
-    genotypes = []
-    for i in range(0, genotype_cols.shape[1], 2):
-        snp_genotypes = []
-        for j in range(len(genotype_cols)):
-            allele1 = genotype_cols.iloc[j, i]
-            allele2 = genotype_cols.iloc[j, i + 1]
-            if allele1 == '0' or allele2 == '0':
-                snp_genotypes.append('Missing')
-            elif allele1 == allele2:
-                snp_genotypes.append(f'{allele1}/{allele1}')
-            else:
-                snp_genotypes.append(f'{allele1}/{allele2}')
-        genotypes.append(snp_genotypes)
-    
+    """Load genotype data straight from the PLINK binary fileset"""
+    bed = BedFile('data/faba_fingerprint')
+    fam, bim = bed.fam, bed.bim
+    sample_ids = fam['iid'].astype(str).tolist()
+
+    # Convert A1 allele counts to genotype calls (2 = A1/A1, 1 = A1/A2, 0 = A2/A2)
+    a1 = bim['a1'].to_numpy(dtype=object)[:, None]
+    a2 = bim['a2'].to_numpy(dtype=object)[:, None]
+    counts = bed.read_snps()
+    genotypes = np.where(counts == 2, a1 + '/' + a1,
+                np.where(counts == 1, a1 + '/' + a2,
+                np.where(counts == 0, a2 + '/' + a2, 'Missing')))
+    bed.close()
+
     # Create genotype matrix with SNP1, SNP2, ..., SNP150
     snp_labels = [f'SNP{i+1}' for i in range(len(genotypes))]
     genotype_df = pd.DataFrame(genotypes, index=snp_labels, columns=sample_ids).T
@@ -4,10 +4,14 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 from scipy.cluster.hierarchy import dendrogram, linkage, fcluster
 from scipy.spatial.distance import pdist, squareform
-import subprocess
 import os
+import sys
+from pathlib import Path
 from matplotlib import rcParams
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from fababean import MISSING, BedFile, GenotypeView, write_subset
+
 # Set style
 plt.style.use('default')
 rcParams['font.family'] = 'DejaVu Sans'
@@ -30,93 +34,37 @@ def create_phylogenetic_tree():
     
     print("✓ All required files found")
     
-    # Step 1: Extract the 150 SNPs using PLINK
-    print("\n1. Extracting 150 SNPs using PLINK...")
-    
-    plink_cmd = [
-        "plink",
-        "--bfile", "data/Faba_high_quality",
-        "--extract", "data/top_150_snps_list.txt",
-        "--make-bed",
-        "--out", "output/faba_150_snps_tree",
-        "--allow-extra-chr"
-    ]
+    # Step 1: Select the 150 SNPs in memory from the QC-filtered fileset
+    print("\n1. Selecting 150 SNPs from the .bed file...")
     
-    result = subprocess.run(plink_cmd, capture_output=True, text=True)
-    if result.returncode == 0:
-        print("✓ Successfully extracted 150 SNPs")
-    else:
-        print(f"❌ PLINK error: {result.stderr}")
-        return
-    
-    # Step 2: Convert to VCF for easier processing
-    print("\n2. Converting to VCF format...")
-    
-    plink_cmd = [
-        "plink",
-        "--bfile", "output/faba_150_snps_tree",
-        "--recode", "vcf",
-        "--out", "output/faba_150_snps_tree",
-        "--allow-extra-chr"
-    ]
+    with open('data/top_150_snps_list.txt') as f:
+        snp_ids = [line.split()[0] for line in f if line.strip()]
+    bed = BedFile('data/Faba_high_quality')
+    panel = GenotypeView(bed).snps(snp_ids)
+    snps = panel.snp_index
     
-    result = subprocess.run(plink_cmd, capture_output=True, text=True)
-    if result.returncode == 0:
-        print("✓ Successfully converted to VCF")
-    else:
-        print(f"⚠️ VCF conversion warning: {result.stderr}")
+    # Keep the panel fileset with the other outputs, packed rows are copied as they are
+    write_subset(bed, 'output/faba_150_snps_tree', snps)
+    print(f"✓ Successfully extracted {len(snps)} SNPs")
     
-    # Step 3: Read and process the genotype data
-    print("\n3. Processing genotype data...")
+    # Step 2: Read the genotype data of the selection
+    print("\n2. Reading genotype data...")
     
-    # Read the BIM file to get SNP information
-    bim_data = pd.read_csv('output/faba_150_snps_tree.bim', 
-                          sep='\t', 
-                          header=None,
-                          names=['chr', 'snp_id', 'cM', 'position', 'allele1', 'allele2'])
-    
-    # Read the FAM file to get sample information
-    fam_data = pd.read_csv('output/faba_150_snps_tree.fam', 
-                          sep='\t', 
-                          header=None,
-                          names=['family', 'sample', 'father', 'mother', 'sex', 'phenotype'])
-    
-    samples = fam_data['sample'].tolist()
+    bim_data = bed.bim.iloc[snps]
+    samples = bed.samples
     print(f"✓ Loaded {len(samples)} samples: {samples}")
     print(f"✓ Using {len(bim_data)} SNPs")
     
-    # Step 4: Read the RAW file to get genotype matrix
-    print("\n4. Reading genotype data...")
-    
-    plink_cmd = [
-        "plink",
-        "--bfile", "output/faba_150_snps_tree",
-        "--recode", "A",
-        "--out", "output/faba_150_snps_tree",
-        "--allow-extra-chr"
-    ]
-    
-    result = subprocess.run(plink_cmd, capture_output=True, text=True)
-    
-    if os.path.exists('output/faba_150_snps_tree.raw'):
-        raw_data = pd.read_csv('output/faba_150_snps_tree.raw', sep='\s+')
-        print(f"✓ Loaded genotype data for {len(raw_data)} samples")
-        
-        # Extract genotype matrix (remove first 6 columns which are metadata)
-        genotype_columns = [col for col in raw_data.columns if col not in ['FID', 'IID', 'PAT', 'MAT', 'SEX', 'PHENOTYPE']]
-        genotype_matrix = raw_data[genotype_columns].values
-        
-        print(f"✓ Genotype matrix shape: {genotype_matrix.shape}")
-        
-    else:
-        print("❌ Could not read genotype data")
-        return
+    # Samples as rows, SNPs as columns, A1 allele counts as in a PLINK .raw table
+    genotype_matrix = panel.sample_matrix().astype(float)
+    bed.close()
+    print(f"✓ Genotype matrix shape: {genotype_matrix.shape}")
     
-    # Step 5: Calculate genetic distance matrix
-    print("\n5. Calculating genetic distance matrix...")
+    # Step 3: Calculate genetic distance matrix
+    print("\n3. Calculating genetic distance matrix...")
     
     # Handle missing data (coded as -9 in PLINK)
-    genotype_matrix[genotype_matrix == -9] = np.nan
+    genotype_matrix[genotype_matrix == MISSING] = np.nan
     
     # Calculate pairwise genetic distances (Euclidean distance)
     # Transpose to get samples as rows, SNPs as columns
@@ -126,14 +74,14 @@ def create_phylogenetic_tree():
     print(f"✓ Distance matrix calculated")
     print(f"  Distance range: {np.nanmin(distance_square):.2f} - {np.nanmax(distance_square):.2f}")
     
-    # Step 6: Build phylogenetic tree using hierarchical clustering
-    print("\n6. Building phylogenetic tree...")
+    # Step 4: Build phylogenetic tree using hierarchical clustering
+    print("\n4. Building phylogenetic tree...")
     
     # Perform hierarchical clustering
     linkage_matrix = linkage(distance_matrix, method='average')
     
-    # Step 7: Create the phylogenetic tree visualization
-    print("\n7. Creating phylogenetic tree visualization...")
+    # Step 5: Create the phylogenetic tree visualization
+    print("\n5. Creating phylogenetic tree visualization...")
     
     # Create figure with multiple views
     fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(20, 16))
@@ -187,8 +135,8 @@ def create_phylogenetic_tree():
     plt.savefig('plots/phylogenetic_tree_150_snps.pdf', dpi=300, bbox_inches='tight')
     plt.show()
     
-    # Step 8: Create a clean standalone tree
-    print("\n8. Creating clean standalone tree...")
+    # Step 6: Create a clean standalone tree
+    print("\n6. Creating clean standalone tree...")
     
     plt.figure(figsize=(12, 8))
     dendrogram(linkage_matrix, 
@@ -207,8 +155,8 @@ def create_phylogenetic_tree():
     plt.savefig('plots/phylogenetic_tree_clean.pdf', dpi=300, bbox_inches='tight')
     plt.show()
     
-    # Step 9: Save cluster assignments
-    print("\n9. Saving cluster assignments...")
+    # Step 7: Save cluster assignments
+    print("\n7. Saving cluster assignments...")
     
     # Cut the tree to get clusters (you can adjust the threshold)
     clusters = fcluster(linkage_matrix, t=3, criterion='maxclust')
@@ -222,7 +170,7 @@ def create_phylogenetic_tree():
     
     cluster_assignments.to_csv('output/phylogenetic_clusters.csv', index=False)
     
-    # Step 10: Print summary statistics
+    # Step 8: Print summary statistics
     print("\n📊 PHYLOGENETIC TREE SUMMARY:")
     print(f"✓ Samples: {len(samples)}")
     print(f"✓ SNPs used: {len(bim_data)}")
@@ -265,18 +213,18 @@ def create_alternative_tree():
     """Alternative method using different distance metrics"""
     print("\n=== CREATING ALTERNATIVE TREE (Hamming Distance) ===")
     
-    # Read the RAW file again for alternative processing
-    if os.path.exists('output/faba_150_snps_tree.raw'):
-        raw_data = pd.read_csv('output/faba_150_snps_tree.raw', sep='\s+')
-        samples = raw_data['IID'].tolist()
+    # Read the extracted .bed fileset again for alternative processing
+    if os.path.exists('output/faba_150_snps_tree.bed'):
+        bed = BedFile('output/faba_150_snps_tree')
+        samples = bed.samples
         
         # Extract genotype matrix
-        genotype_columns = [col for col in raw_data.columns if col not in ['FID', 'IID', 'PAT', 'MAT', 'SEX', 'PHENOTYPE']]
-        genotype_matrix = raw_data[genotype_columns].values
+        genotype_matrix = bed.sample_matrix()
+        bed.close()
         
         # Convert to binary (0/1) for Hamming distance
         # Handle missing data and convert to 0/1/2 format
-        binary_matrix = np.where(genotype_matrix == -9, np.nan, genotype_matrix)
+        binary_matrix = np.where(genotype_matrix == MISSING, np.nan, genotype_matrix)
         
         # Calculate Hamming distance (proportion of differing SNPs)
         from sklearn.metrics.pairwise import pairwise_distances
@@ -20,25 +20,15 @@ python3 scripts/calculate_pic_complete.py
 echo "Step 3: Selecting top 150 SNPs..."
 python3 scripts/select_top_snps.py
 
-# Step 4: Create fingerprint panel
+# Step 4: Create fingerprint panel (packed .bed rows copied in-process)
 echo "Step 4: Creating fingerprint panel..."
-plink --bfile data/Faba_high_quality \
+python3 ../workflow/scripts/subset_bed.py \
+      --bfile data/Faba_high_quality \
       --extract data/top_150_snps_list.txt \
-      --make-bed \
       --out data/faba_fingerprint
 
-# Step 5: Generate genotype tables
-echo "Step 5: Generating genotype tables..."
-plink --bfile data/faba_fingerprint \
-      --recode A \
-      --out output/faba_fingerprint_minimal
-
-plink --bfile data/faba_fingerprint \
-      --recode \
-      --out output/faba_fingerprint_genotypes
-
-# Step 6: Create visualization
-echo "Step 6: Creating fingerprint heatmap..."
+# Step 5: Create visualization (genotypes are read from the .bed file directly)
+echo "Step 5: Creating fingerprint heatmap..."
 python3 scripts/create_fingerprint_heatmap.py
 
 echo "=== Pipeline Complete ==="
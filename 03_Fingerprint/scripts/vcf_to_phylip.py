@@ -1,17 +1,45 @@
 #!/usr/bin/env python3
 """
-Convert VCF file to PHYLIP format for phylogenetic analysis
+Convert VCF file (or a genotype store built from one) to PHYLIP format for phylogenetic analysis
 """
 
 import sys
 import os
+from pathlib import Path
 
-def vcf_to_phylip(vcf_file, phylip_file):
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from fababean.genotype_store import GenotypeStore, is_store, plink_variant_id
+
+# Character of each ALT allele count (0, 1, 2) with N for missing data, as in the VCF conversion
+STORE_SYMBOLS = np.array([ord('A'), ord('G'), ord('T'), ord('N')], dtype=np.uint8)
+
+def read_store_sequences(store_path, snp_ids=None):
     """
-    Convert VCF file to PHYLIP format
+    Read sequences from a genotype store, optionally restricted to a list of SNP IDs
     """
-    print(f"Converting {vcf_file} to {phylip_file}")
-    
+    store = GenotypeStore(store_path)
+    samples = store.samples
+    print(f"Found {len(samples)} samples: {samples}")
+    if snp_ids is None:
+        genotypes = store.read()
+    else:
+        ids = store.variants()['id'].to_numpy()
+        genotypes = store.take(np.flatnonzero(np.isin(ids, list(snp_ids))))
+    codes = np.where(genotypes < 0, 3, genotypes)
+    rows = STORE_SYMBOLS[codes.T]
+    sequences = {sample: row.tobytes().decode('ascii') for sample, row in zip(samples, rows)}
+    return samples, sequences, genotypes.shape[0]
+
+def read_vcf_sequences(vcf_file, snp_ids=None):
+    """
+    Read sequences from a VCF file, optionally restricted to a list of SNP IDs
+
+    Every record is decoded, and only unphased calls are genotypes (phased ones are N);
+    records without an ID match the PLINK chrom:pos:allele:allele ID of the store
+    """
+    keep = None if snp_ids is None else set(snp_ids)
     samples = []
     sequences = {}
     snp_count = 0
@@ -37,6 +65,11 @@ def vcf_to_phylip(vcf_file, phylip_file):
                 
                 chrom, pos, snp_id, ref, alt = parts[0:5]
                 genotypes = parts[9:]
+                if keep is not None:
+                    if snp_id == '.':
+                        snp_id = plink_variant_id(chrom, pos, ref, alt)
+                    if snp_id not in keep:
+                        continue
                 
                 # Process genotypes for this SNP
                 for i, gt in enumerate(genotypes):
@@ -60,6 +93,19 @@ def vcf_to_phylip(vcf_file, phylip_file):
                 
                 snp_count += 1
     
+    return samples, sequences, snp_count
+
+def vcf_to_phylip(vcf_file, phylip_file, snp_ids=None):
+    """
+    Convert VCF file (or genotype store directory) to PHYLIP format
+    """
+    print(f"Converting {vcf_file} to {phylip_file}")
+    
+    if is_store(vcf_file):
+        samples, sequences, snp_count = read_store_sequences(vcf_file, snp_ids)
+    else:
+        samples, sequences, snp_count = read_vcf_sequences(vcf_file, snp_ids)
+    
     print(f"Processed {snp_count} SNPs")
     
     # Write PHYLIP format
@@ -90,18 +136,24 @@ def vcf_to_phylip(vcf_file, phylip_file):
     return samples, snp_count
 
 def main():
-    if len(sys.argv) != 3:
-        print("Usage: python vcf_to_phylip.py <input.vcf> <output.phy>")
+    if len(sys.argv) not in (3, 4):
+        print("Usage: python vcf_to_phylip.py <input.vcf|genotype_store> <output.phy> [snp_ids.txt]")
+        print("  A VCF is converted record by record (phased calls become N), a genotype store")
+        print("  holds only biallelic A/C/G/T SNPs and codes phased calls like unphased ones")
         sys.exit(1)
     
     vcf_file = sys.argv[1]
     phylip_file = sys.argv[2]
+    snp_ids = None
+    if len(sys.argv) == 4:
+        with open(sys.argv[3]) as f:
+            snp_ids = [line.split()[0] for line in f if line.strip()]
     
     if not os.path.exists(vcf_file):
         print(f"Error: VCF file {vcf_file} not found")
         sys.exit(1)
     
-    samples, snp_count = vcf_to_phylip(vcf_file, phylip_file)
+    samples, snp_count = vcf_to_phylip(vcf_file, phylip_file, snp_ids)
     print(f"Conversion completed successfully!")
     print(f"Samples: {len(samples)}, SNPs: {snp_count}")
 
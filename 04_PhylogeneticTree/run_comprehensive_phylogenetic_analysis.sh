@@ -3,9 +3,9 @@
 
 echo "=== Comprehensive Faba Bean Phylogenetic Analysis ==="
 
-# Step 1: Convert VCF to PHYLIP
-echo "Step 1: Converting VCF to PHYLIP format..."
-python vcf2phylip.py -i data/faba_fingerprint.vcf -o data/faba_fingerprint
+# Step 1: Convert the PLINK fileset to PHYLIP (vcf2phylip conventions, no intermediate VCF)
+echo "Step 1: Converting PLINK .bed to PHYLIP format..."
+python scripts/convert_bed_to_phylip.py -i data/faba_fingerprint
 
 # Check if conversion was successful
 if [ -f "faba_fingerprint.min4.phy" ]; then
@@ -14,7 +14,7 @@ if [ -f "faba_fingerprint.min4.phy" ]; then
 elif [ -f "data/faba_fingerprint.phy" ]; then
     echo "✓ PHYLIP file exists: data/faba_fingerprint.phy"
 else
-    echo "ERROR: vcf2phylip conversion failed"
+    echo "ERROR: .bed to PHYLIP conversion failed"
     python scripts/convert_raw_to_phylip.py
     if [ ! -f "data/faba_fingerprint.phy" ]; then
         exit 1
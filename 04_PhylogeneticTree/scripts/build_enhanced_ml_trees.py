@@ -5,6 +5,11 @@ import pandas as pd
 from Bio import Phylo
 import matplotlib.pyplot as plt
 import numpy as np
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from fababean.trees import root_at_midpoint, support_values
 
 def build_enhanced_ml_trees():
     """Build enhanced Maximum Likelihood trees with better visualization"""
@@ -124,14 +129,22 @@ def visualize_enhanced_ml_trees():
             except Exception as e:
                 print(f"✗ Error visualizing {tree_file}: {e}")
 
-def add_bootstrap_labels(ax, tree):
-    """Add bootstrap support values to tree branches"""
-    try:
-        # This is a simplified version - in practice you'd parse the bootstrap values
-        # from the tree file and add them as labels
-        pass
-    except:
-        pass
+def add_bootstrap_labels(ax, tree, threshold=95):
+    """Summarize the bootstrap support of the tree on the plot
+    
+    Phylo.draw already labels every branch with its support (the clade confidence read
+    from the tree file), this adds how many clades reach ``threshold`` (95 for ultrafast
+    bootstrap, 70 for the standard bootstrap).
+    """
+    support = support_values(tree)
+    if not support:
+        return
+    strong = sum(value >= threshold for value in support)
+    ax.text(0.02, 0.02, f'Bootstrap support: median {np.median(support):.0f}\n'
+                        f'{strong}/{len(support)} clades >= {threshold}',
+           transform=ax.transAxes, fontsize=10, fontweight='bold',
+           verticalalignment='bottom',
+           bbox=dict(boxstyle='round', facecolor='lightyellow', alpha=0.8))
 
 def create_rooted_ml_trees():
     """Create rooted versions of ML trees"""
@@ -150,7 +163,7 @@ def create_rooted_ml_trees():
                 tree = Phylo.read(tree_file, 'newick')
                 
                 # Root the tree at midpoint
-                rooted_tree = root_tree_at_midpoint(tree)
+                rooted_tree = root_at_midpoint(tree)
                 
                 # Save rooted tree
                 Phylo.write(rooted_tree, f'output/rooted_{tree_name.lower()}.newick', 'newick')
@@ -161,26 +174,6 @@ def create_rooted_ml_trees():
             except Exception as e:
                 print(f"✗ Error processing {tree_file}: {e}")
 
-def root_tree_at_midpoint(tree):
-    """Root tree at midpoint"""
-    terminals = list(tree.get_terminals())
-    
-    max_distance = 0
-    tip1, tip2 = None, None
-    
-    for t1 in terminals:
-        for t2 in terminals:
-            if t1 != t2:
-                dist = tree.distance(t1, t2)
-                if dist > max_distance:
-                    max_distance = dist
-                    tip1, tip2 = t1, t2
-    
-    if tip1 and tip2:
-        tree.root_at_midpoint(tip1, tip2, max_distance/2)
-    
-    return tree
-
 def plot_enhanced_rooted_ml_tree(tree, tree_type):
     """Create enhanced visualization of rooted ML tree"""
     
@@ -1,14 +1,68 @@
 # scripts/build_enhanced_nj_trees.py (Fixed version)
+import argparse
 import pandas as pd
 import numpy as np
-from Bio.Phylo.TreeConstruction import DistanceTreeConstructor, DistanceMatrix
 from Bio import Phylo
 import matplotlib
 import matplotlib.pyplot as plt
 from matplotlib.colors import ListedColormap
 import os
+import sys
+from pathlib import Path
 
-def build_enhanced_nj_trees():
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from fababean.bootstrap import bootstrap_splits
+from fababean.distance import METRICS, encode_sequences
+from fababean.trees import (
+    annotate_support, neighbor_joining, root_at_midpoint, root_with_outgroup, support_values,
+)
+from build_enhanced_ml_trees import add_bootstrap_labels
+from generate_distance_from_phylip import read_phylip_file
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Neighbour-Joining trees of a distance matrix")
+    parser.add_argument("-m", "--metric", choices=list(METRICS), default="hamming",
+                        help="Distance of output/<metric>_distance_matrix.csv, also used for "
+                             "the bootstrap replicates (default: hamming)")
+    parser.add_argument("-b", "--bootstrap", type=int, default=0,
+                        help="Site-bootstrap replicates for clade support (default: 0, none)")
+    parser.add_argument("-a", "--alignment", default="data/faba_fingerprint.phy",
+                        help="PHYLIP alignment resampled by --bootstrap "
+                             "(default: data/faba_fingerprint.phy)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Processes building bootstrap trees (default: all cores)")
+    parser.add_argument("--seed", type=int, default=None, help="Seed of the bootstrap resampling")
+    parser.add_argument("--outgroup", nargs="+", default=None, metavar="SAMPLE",
+                        help="Root the tree on these samples instead of at the midpoint")
+    return parser.parse_args()
+
+def add_bootstrap_support(tree, sample_ids, args):
+    """Annotate the NJ tree with the clade frequencies of site-bootstrap replicate trees"""
+    sequences, _, _ = read_phylip_file(args.alignment)
+    if sequences is None:
+        raise ValueError(f"cannot read alignment {args.alignment}")
+    # Same order and FID trimming as the distance matrix the tree was built from
+    names = [sid.split('_')[0] if '_' in sid else sid for sid in sequences]
+    if names != sample_ids:
+        raise ValueError("alignment samples differ from the distance matrix samples")
+    alignment = encode_sequences(list(sequences.values()))
+    
+    print(f"Running {args.bootstrap} bootstrap replicates ({args.metric} distance)...")
+    counts, used = bootstrap_splits(alignment, names, args.bootstrap, args.metric,
+                                    workers=args.workers, seed=args.seed)
+    if used < args.bootstrap:
+        print(f"⚠ Skipped {args.bootstrap - used}/{args.bootstrap} replicates with saturated "
+              f"{args.metric} distances")
+    if not used:
+        print("⚠ No replicate gave a tree, the NJ tree is left without support")
+        return
+    annotate_support(tree, counts, used, {name: i for i, name in enumerate(names)})
+    
+    support = support_values(tree)
+    print(f"✓ Bootstrap support: median {np.median(support):.0f}%, "
+          f"{sum(value >= 70 for value in support)}/{len(support)} clades >= 70%")
+
+def build_enhanced_nj_trees(args):
     """Build enhanced Neighbour-Joining trees with better visualization"""
     
     print("Building Enhanced Neighbour-Joining trees...")
@@ -19,7 +73,7 @@ def build_enhanced_nj_trees():
     
     # Read distance matrix
     try:
-        dist_df = pd.read_csv('output/hamming_distance_matrix.csv', index_col=0)
+        dist_df = pd.read_csv(f'output/{args.metric}_distance_matrix.csv', index_col=0)
         # Use FID only (remove everything after underscore if present)
         sample_ids = [sid.split('_')[0] if '_' in sid else sid for sid in dist_df.index.tolist()]
         print(f"✓ Loaded distance matrix for {len(sample_ids)} samples")
@@ -28,18 +82,12 @@ def build_enhanced_nj_trees():
         print(f"✗ Error loading distance matrix: {e}")
         return False
     
-    # Convert to BioPython DistanceMatrix format
-    def df_to_distance_matrix(df):
-        matrix = []
-        for i in range(len(df)):
-            matrix.append(df.iloc[i, :i+1].tolist())
-        return DistanceMatrix(names=sample_ids, matrix=matrix)
-    
     try:
         # Build NJ tree
-        constructor = DistanceTreeConstructor()
-        distance_matrix = df_to_distance_matrix(dist_df)
-        nj_tree = constructor.nj(distance_matrix)
+        nj_tree = neighbor_joining(dist_df.to_numpy(), sample_ids)
+        
+        if args.bootstrap:
+            add_bootstrap_support(nj_tree, sample_ids, args)
         
         # Save unrooted tree
         Phylo.write(nj_tree, 'output/nj_tree_unrooted.newick', 'newick')
@@ -82,6 +130,9 @@ def plot_enhanced_nj_trees(tree, sample_ids):
         text.set_fontweight('bold')
         text.set_fontsize(12)
     
+    # Bootstrap support, when the tree was annotated with --bootstrap
+    add_bootstrap_labels(ax, tree, threshold=70)
+    
     plt.tight_layout()
     plt.savefig('plots/nj_tree_unrooted_enhanced.png', dpi=350, bbox_inches='tight')
     plt.savefig('plots/nj_tree_unrooted_enhanced.pdf', bbox_inches='tight')
@@ -110,7 +161,7 @@ def plot_enhanced_nj_trees(tree, sample_ids):
     
     print("✓ Enhanced NJ tree visualizations saved")
 
-def create_rooted_nj_tree():
+def create_rooted_nj_tree(outgroup=None):
     """Create and visualize rooted NJ tree"""
     
     print("Creating rooted NJ tree...")
@@ -119,14 +170,19 @@ def create_rooted_nj_tree():
         # Read the unrooted tree
         tree = Phylo.read('output/nj_tree_unrooted.newick', 'newick')
         
-        # Root the tree at midpoint
-        rooted_tree = root_tree_at_midpoint(tree)
+        # Root the tree on the outgroup, or at midpoint
+        if outgroup:
+            rooted_tree = root_with_outgroup(tree, outgroup)
+            rooting = 'Outgroup Rooting'
+        else:
+            rooted_tree = root_at_midpoint(tree)
+            rooting = 'Midpoint Rooting'
         
         # Save rooted tree
         Phylo.write(rooted_tree, 'output/nj_tree_rooted.newick', 'newick')
         
         # Create enhanced visualization of rooted tree
-        plot_enhanced_rooted_tree(rooted_tree, 'Neighbour-Joining')
+        plot_enhanced_rooted_tree(rooted_tree, 'Neighbour-Joining', rooting)
         
         return rooted_tree
         
@@ -134,30 +190,7 @@ def create_rooted_nj_tree():
         print(f"✗ Error creating rooted NJ tree: {e}")
         return None
 
-def root_tree_at_midpoint(tree):
-    """Root tree at midpoint"""
-    # Get all terminal nodes
-    terminals = list(tree.get_terminals())
-    
-    # Find the two most distant nodes
-    max_distance = 0
-    tip1, tip2 = None, None
-    
-    for t1 in terminals:
-        for t2 in terminals:
-            if t1 != t2:
-                dist = tree.distance(t1, t2)
-                if dist > max_distance:
-                    max_distance = dist
-                    tip1, tip2 = t1, t2
-    
-    if tip1 and tip2:
-        # Root at midpoint
-        tree.root_at_midpoint(tip1, tip2, max_distance/2)
-    
-    return tree
-
-def plot_enhanced_rooted_tree(tree, tree_type):
+def plot_enhanced_rooted_tree(tree, tree_type, rooting='Midpoint Rooting'):
     """Create enhanced visualization of rooted tree"""
     
     plt.rcParams['font.family'] = 'Arial'
@@ -168,7 +201,7 @@ def plot_enhanced_rooted_tree(tree, tree_type):
     # Draw rooted tree
     Phylo.draw(tree, axes=ax, do_show=False)
     
-    ax.set_title(f'Rooted {tree_type} Phylogenetic Tree\nFaba Bean Accessions (Midpoint Rooting)', 
+    ax.set_title(f'Rooted {tree_type} Phylogenetic Tree\nFaba Bean Accessions ({rooting})', 
                 fontsize=16, fontweight='bold', pad=20)
     
     # Enhance tip labels
@@ -196,18 +229,20 @@ def plot_enhanced_rooted_tree(tree, tree_type):
 def main():
     print("=== Enhanced Neighbour-Joining Tree Analysis ===")
     
+    args = parse_args()
+    
     # Build enhanced NJ trees
-    result = build_enhanced_nj_trees()
+    result = build_enhanced_nj_trees(args)
     
     if result:
         # Create rooted version
-        rooted_tree = create_rooted_nj_tree()
+        rooted_tree = create_rooted_nj_tree(args.outgroup)
         
         print("\n✓ Enhanced NJ tree analysis completed successfully")
         print("✓ Generated:")
         print("  - Unrooted NJ tree (standard layout)")
         print("  - Unrooted NJ tree (circular layout)") 
-        print("  - Rooted NJ tree (midpoint rooting)")
+        print(f"  - Rooted NJ tree ({'outgroup' if args.outgroup else 'midpoint'} rooting)")
     else:
         print("\n✗ Enhanced NJ tree analysis failed")
 
@@ -1,10 +1,14 @@
 # scripts/build_nj_from_phylip.py
 import pandas as pd
 import numpy as np
-from Bio.Phylo.TreeConstruction import DistanceTreeConstructor, DistanceMatrix
 from Bio import Phylo
 import matplotlib.pyplot as plt
 import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from fababean.trees import neighbor_joining
 
 def build_nj_trees():
     """Build Neighbour-Joining trees from distance matrix"""
@@ -24,18 +28,9 @@ def build_nj_trees():
         print(f"✗ Error loading distance matrix: {e}")
         return False
     
-    # Convert to BioPython DistanceMatrix format
-    def df_to_distance_matrix(df):
-        matrix = []
-        for i in range(len(df)):
-            matrix.append(df.iloc[i, :i+1].tolist())
-        return DistanceMatrix(names=df.index.tolist(), matrix=matrix)
-    
     try:
         # Build NJ tree
-        constructor = DistanceTreeConstructor()
-        distance_matrix = df_to_distance_matrix(dist_df)
-        nj_tree = constructor.nj(distance_matrix)
+        nj_tree = neighbor_joining(dist_df.to_numpy(), sample_ids)
         
         # Save unrooted tree
         Phylo.write(nj_tree, 'output/nj_tree_unrooted.newick', 'newick')
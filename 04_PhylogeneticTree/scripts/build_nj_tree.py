@@ -1,11 +1,14 @@
 # PhylogeneticTree/scripts/build_nj_tree.py
 import pandas as pd
 import numpy as np
-from Bio.Phylo.TreeConstruction import DistanceTreeConstructor
-from Bio.Phylo.TreeConstruction import DistanceMatrix
 from Bio import Phylo
 import matplotlib.pyplot as plt
 import seaborn as sns
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from fababean.trees import neighbor_joining
 
 def build_neighbour_joining_trees():
     """Build Neighbour-Joining trees using different distance matrices"""
@@ -18,25 +21,13 @@ def build_neighbour_joining_trees():
     
     sample_ids = euclidean_df.index.tolist()
     
-    # Convert to BioPython DistanceMatrix format
-    def df_to_distance_matrix(df):
-        matrix = []
-        for i in range(len(df)):
-            matrix.append(df.iloc[i, :i+1].tolist())
-        return DistanceMatrix(names=df.index.tolist(), matrix=matrix)
-    
-    # Build trees
-    constructor = DistanceTreeConstructor()
-    
     # Euclidean distance NJ tree
     print("Building Euclidean distance NJ tree...")
-    euclidean_dm = df_to_distance_matrix(euclidean_df)
-    nj_tree_euclidean = constructor.nj(euclidean_dm)
+    nj_tree_euclidean = neighbor_joining(euclidean_df.to_numpy(), euclidean_df.index.tolist())
     
     # Hamming distance NJ tree
     print("Building Hamming distance NJ tree...")
-    hamming_dm = df_to_distance_matrix(hamming_df)
-    nj_tree_hamming = constructor.nj(hamming_dm)
+    nj_tree_hamming = neighbor_joining(hamming_df.to_numpy(), hamming_df.index.tolist())
     
     # Save trees
     Phylo.write(nj_tree_euclidean, 'output/nj_tree_euclidean.newick', 'newick')
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Check that fababean's neighbour-joining writes the same Newick as Biopython's
+DistanceTreeConstructor.nj, on random p-distance matrices full of ties and on
+copies nudged by a few ulps (near-ties)
+"""
+
+import argparse
+import io
+import sys
+from pathlib import Path
+
+import numpy as np
+from Bio import Phylo
+from Bio.Phylo.TreeConstruction import DistanceMatrix, DistanceTreeConstructor
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from fababean.distance import p_distance
+from fababean.trees import neighbor_joining
+
+def newick(tree):
+    handle = io.StringIO()
+    Phylo.write(tree, handle, 'newick')
+    return handle.getvalue()
+
+def biopython_nj(distances, names):
+    lower = [[float(distances[i, j]) for j in range(i + 1)] for i in range(len(names))]
+    return DistanceTreeConstructor().nj(DistanceMatrix(list(names), lower))
+
+def random_matrices(count, rng):
+    """p-distances of related sequences; few sites make many equal distances"""
+    for _ in range(count):
+        n = int(rng.integers(5, 40))
+        sites = int(rng.choice([8, 30, 200, 1000]))
+        base = rng.choice(np.frombuffer(b'ACGT', dtype=np.uint8), sites)
+        alignment = np.tile(base, (n, 1))
+        mutated = rng.random(alignment.shape) < rng.uniform(0.02, 0.4)
+        alignment[mutated] = rng.choice(np.frombuffer(b'ACGT-', dtype=np.uint8), mutated.sum())
+        distances = p_distance(alignment)
+        yield distances
+        # Near-ties: move some distances by a few ulps, keeping the matrix symmetric
+        steps = rng.integers(-3, 4, distances.shape) * (rng.random(distances.shape) < 0.3)
+        steps = np.tril(steps, -1)
+        steps = steps + steps.T
+        yield distances + steps * np.spacing(np.maximum(distances, 1e-300))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--matrices', type=int, default=100,
+                        help='Random matrices to check, each also nudged (default: 100)')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the random matrices')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    checked = failed = 0
+    for distances in random_matrices(args.matrices, rng):
+        names = [f'S{i}' for i in range(len(distances))]
+        expected = newick(biopython_nj(distances, names))
+        for bound in (True, False):
+            checked += 1
+            if newick(neighbor_joining(distances, names, bound=bound)) != expected:
+                failed += 1
+                print(f"✗ {len(names)} taxa (bound={bound}): Newick differs from Biopython")
+    if failed:
+        print(f"✗ {failed}/{checked} trees differ from Biopython")
+        sys.exit(1)
+    print(f"✓ {checked} trees identical to Biopython")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Convert a PLINK .bed/.bim/.fam fileset to PHYLIP, FASTA and NEXUS matrices with the same
+conventions and output names as vcf2phylip.py, without writing an intermediate VCF
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from fababean import BedFile
+from fababean.alignment import export_alignment
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-i", "--input", required=True,
+                        help="PLINK fileset prefix (or the .bed file)")
+    parser.add_argument("--output-folder", default="./",
+                        help="Output folder name, created if it does not exist (default: ./)")
+    parser.add_argument("--output-prefix",
+                        help="Prefix for output filenames (input name by default)")
+    parser.add_argument("-m", "--min-samples-locus", type=int, default=4,
+                        help="Minimum of samples required to be present at a locus (default=4)")
+    parser.add_argument("-o", "--outgroup", default="",
+                        help="Name of the outgroup, written as the first taxon")
+    parser.add_argument("-p", "--phylip-disable", action="store_true",
+                        help="Do not write the PHYLIP matrix")
+    parser.add_argument("-f", "--fasta", action="store_true", help="Write a FASTA matrix")
+    parser.add_argument("-n", "--nexus", action="store_true", help="Write a NEXUS matrix")
+    parser.add_argument("-b", "--nexus-binary", action="store_true",
+                        help="Write a binary NEXUS matrix (0/1/2 ALT allele copies) for SNAPP")
+    args = parser.parse_args()
+
+    formats = []
+    if not args.phylip_disable:
+        formats.append("PHYLIP")
+    if args.fasta:
+        formats.append("FASTA")
+    if args.nexus:
+        formats.append("NEXUS")
+    if args.nexus_binary:
+        formats.append("BINARY NEXUS")
+
+    bed = BedFile(args.input)
+    prefix = args.output_prefix or bed.prefix.name
+    prefix += f".min{args.min_samples_locus}"
+    Path(args.output_folder).mkdir(parents=True, exist_ok=True)
+    outfile = Path(args.output_folder, prefix)
+
+    print(f"Converting PLINK fileset '{bed.prefix}': {bed.n_samples} samples, {bed.n_snps} SNPs")
+    summary = export_alignment(bed, outfile, formats, args.min_samples_locus, args.outgroup)
+    bed.close()
+
+    print(f"Sites written to the matrices: {summary.sites}")
+    print(f"Sites skipped for having fewer than {args.min_samples_locus} samples: {summary.shallow}")
+    print(f"Sites skipped for having alleles longer than one nucleotide: {summary.mnp}")
+    for output in summary.outputs:
+        print(f"✓ Matrix written: {output}")
+
+if __name__ == "__main__":
+    main()
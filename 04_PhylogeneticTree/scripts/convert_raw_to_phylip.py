@@ -1,76 +1,46 @@
 # scripts/convert_raw_to_phylip.py
-import pandas as pd
-import numpy as np
-import subprocess
 import os
+import sys
+from pathlib import Path
 
-def generate_raw_file():
-    """Generate PLINK RAW file if it doesn't exist"""
-    print("Generating PLINK RAW file...")
-    
-    # Check if we already have the files
-    if os.path.exists('data/faba_fingerprint_fixed.raw'):
-        print("✓ RAW file already exists")
-        return True
-    
-    # Run PLINK to generate RAW file
-    cmd = [
-        'plink',
-        '--bfile', 'data/faba_fingerprint',
-        '--allow-extra-chr',
-        '--recode', 'A',
-        '--out', 'data/faba_fingerprint_fixed'
-    ]
-    
-    print(f"Running: {' '.join(cmd)}")
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    
-    if result.returncode == 0:
-        print("✓ RAW file generated successfully")
-        return True
-    else:
-        print(f"✗ Failed to generate RAW file: {result.stderr}")
-        return False
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from fababean import BedFile
+
+# PHYLIP character of each A1 allele count read as a byte, the missing code (-9) maps to '?'
+GENOTYPE_CHARS = np.full(256, ord('?'), dtype=np.uint8)
+GENOTYPE_CHARS[[0, 1, 2]] = [ord('0'), ord('1'), ord('2')]
 
 def convert_to_phylip():
-    """Convert RAW file to PHYLIP format"""
-    print("Converting RAW file to PHYLIP format...")
+    """Convert the PLINK binary fileset to PHYLIP format"""
+    print("Converting PLINK .bed file to PHYLIP format...")
     
-    # Read RAW file
+    # Memory-map the .bed file instead of recoding it to a RAW table
     try:
-        raw = pd.read_csv('data/faba_fingerprint_fixed.raw', sep='\s+')
-        print(f"✓ RAW file loaded: {len(raw)} samples")
-    except Exception as e:
-        print(f"✗ Error reading RAW file: {e}")
+        bed = BedFile('data/faba_fingerprint')
+        print(f"✓ BED file loaded: {bed.n_samples} samples")
+    except (OSError, ValueError) as e:
+        print(f"✗ Error reading BED file: {e}")
         return False
     
-    # Extract sample IDs and SNP columns
-    sample_ids = raw['IID'].tolist()
-    snp_cols = [col for col in raw.columns if col.startswith('SNP')]
+    sample_ids = bed.samples
+    print(f"✓ Found {bed.n_snps} SNPs")
     
-    print(f"✓ Found {len(snp_cols)} SNPs")
+    # Samples as rows, one character per SNP
+    rows = GENOTYPE_CHARS[bed.sample_matrix().view(np.uint8)]
+    bed.close()
     
     # Create PHYLIP format
     with open('data/faba_fingerprint.phy', 'w') as f:
         # Header: number of samples and number of sites
-        f.write(f' {len(sample_ids)} {len(snp_cols)}\n')
+        f.write(f' {len(sample_ids)} {rows.shape[1]}\n')
         
         # Write each sample's genotypes
-        for i, sample_id in enumerate(sample_ids):
+        for sample_id, row in zip(sample_ids, rows):
             # Format sample ID (max 10 characters for PHYLIP)
             formatted_id = sample_id[:10].ljust(10)
-            
-            # Convert genotypes to characters (0,1,2) and handle missing data
-            genotype_chars = []
-            for snp in snp_cols:
-                val = raw[snp].iloc[i]
-                if pd.isna(val):
-                    genotype_chars.append('?')
-                else:
-                    genotype_chars.append(str(int(val)))
-            
-            genotype_str = ''.join(genotype_chars)
-            f.write(f'{formatted_id} {genotype_str}\n')
+            f.write(f'{formatted_id} {row.tobytes().decode("ascii")}\n')
     
     print(f"✓ PHYLIP file created: data/faba_fingerprint.phy")
     
@@ -90,15 +60,11 @@ def main():
     # Ensure data directory exists
     os.makedirs('data', exist_ok=True)
     
-    # Generate RAW file
-    if generate_raw_file():
-        # Convert to PHYLIP
-        if convert_to_phylip():
-            print("\n✓ Successfully created PHYLIP file via alternative method")
-        else:
-            print("\n✗ Alternative conversion failed")
+    # Convert to PHYLIP
+    if convert_to_phylip():
+        print("\n✓ Successfully created PHYLIP file via alternative method")
     else:
-        print("\n✗ Cannot generate RAW file")
+        print("\n✗ Alternative conversion failed")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,7 +1,13 @@
 # scripts/generate_distance_from_phylip.py
+import argparse
 import pandas as pd
 import numpy as np
 import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from fababean.distance import METRICS, encode_sequences
 
 def read_phylip_file(phy_file):
     """Read PHYLIP format file and return sequence data"""
@@ -41,56 +47,56 @@ def read_phylip_file(phy_file):
     print(f"Successfully loaded {len(sequences)} sequences")
     return sequences, n_seqs, seq_len
 
-def calculate_simple_distance_matrix(sequences):
-    """Calculate simple Hamming distance matrix"""
+def calculate_distance_matrix(sequences, metric='hamming', workers=None):
+    """Calculate the distance matrix of one of the METRICS kernels"""
     sample_ids = list(sequences.keys())
-    n_samples = len(sample_ids)
-    
-    print("Calculating distance matrix...")
-    
-    # Initialize distance matrix
-    distance_matrix = np.zeros((n_samples, n_samples))
-    
-    for i in range(n_samples):
-        seq1 = sequences[sample_ids[i]]
-        for j in range(i, n_samples):
-            if i == j:
-                distance_matrix[i, j] = 0
-            else:
-                seq2 = sequences[sample_ids[j]]
-                # Calculate proportion of differing sites
-                matches = sum(1 for a, b in zip(seq1, seq2) if a == b and a != '?' and a != '-')
-                total_sites = sum(1 for a, b in zip(seq1, seq2) if a != '?' and b != '?' and a != '-' and b != '-')
-                
-                if total_sites > 0:
-                    distance_matrix[i, j] = 1 - (matches / total_sites)
-                    distance_matrix[j, i] = distance_matrix[i, j]
-                else:
-                    distance_matrix[i, j] = 1.0
-                    distance_matrix[j, i] = 1.0
+    
+    print(f"Calculating {metric} distance matrix...")
+    
+    # hamming: sites with '?' or '-' in either sequence do not count, as before
+    alignment = encode_sequences([sequences[sample_id] for sample_id in sample_ids])
+    distance_matrix = METRICS[metric](alignment, workers=workers)
     
     return sample_ids, distance_matrix
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Pairwise distance matrix of a PHYLIP alignment")
+    parser.add_argument("-i", "--input", default="data/faba_fingerprint.phy",
+                        help="PHYLIP alignment (default: data/faba_fingerprint.phy)")
+    parser.add_argument("-m", "--metric", choices=list(METRICS), default="hamming",
+                        help="hamming: mismatches skipping '?'/'-' (default); p: also masks N; "
+                             "asd: IUPAC/0-1-2 allele-sharing distance; jc69, k2p: corrected "
+                             "distances over unambiguous bases")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Threads computing blocks of sample pairs (default: all cores)")
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
     print("=== Generating Distance Matrix ===")
     
     # Ensure output directory exists
     os.makedirs('output', exist_ok=True)
     
     # Read PHYLIP file
-    sequences, n_seqs, seq_len = read_phylip_file('data/faba_fingerprint.phy')
+    sequences, n_seqs, seq_len = read_phylip_file(args.input)
     
     if sequences is None:
         print("Failed to read PHYLIP file")
         return
     
     # Calculate distance matrix
-    sample_ids, distance_matrix = calculate_simple_distance_matrix(sequences)
+    sample_ids, distance_matrix = calculate_distance_matrix(sequences, args.metric, args.workers)
+    
+    undefined = np.isinf(distance_matrix).sum() // 2
+    if undefined:
+        print(f"WARNING: {undefined} pairs are saturated or share no unambiguous site (inf)")
     
     # Save distance matrix as CSV
+    csv_file = f'output/{args.metric}_distance_matrix.csv'
     dist_df = pd.DataFrame(distance_matrix, index=sample_ids, columns=sample_ids)
-    dist_df.to_csv('output/hamming_distance_matrix.csv')
-    print("✓ Hamming distance matrix saved: output/hamming_distance_matrix.csv")
+    dist_df.to_csv(csv_file)
+    print(f"✓ {args.metric} distance matrix saved: {csv_file}")
     
     # Create PHYLIP format distance matrix
     with open('output/distance_matrix.phy', 'w') as f:
@@ -104,10 +110,11 @@ def main():
     
     # Print summary statistics
     print(f"\nDistance Matrix Summary:")
-    print(f"  Minimum distance: {distance_matrix.min():.4f}")
-    print(f"  Maximum distance: {distance_matrix.max():.4f}")
-    print(f"  Mean distance: {distance_matrix.mean():.4f}")
-    print(f"  Standard deviation: {distance_matrix.std():.4f}")
+    finite = distance_matrix[np.isfinite(distance_matrix)]
+    print(f"  Minimum distance: {finite.min():.4f}")
+    print(f"  Maximum distance: {finite.max():.4f}")
+    print(f"  Mean distance: {finite.mean():.4f}")
+    print(f"  Standard deviation: {finite.std():.4f}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
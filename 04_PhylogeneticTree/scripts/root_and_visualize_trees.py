@@ -3,6 +3,11 @@ from Bio import Phylo
 from Bio.Phylo.BaseTree import Tree
 import matplotlib.pyplot as plt
 import numpy as np
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from fababean.trees import root_at_midpoint
 
 def root_trees_with_midpoint():
     """Apply midpoint rooting to all trees"""
@@ -25,7 +30,7 @@ def root_trees_with_midpoint():
             tree = Phylo.read(tree_file, 'newick')
             
             # Apply midpoint rooting
-            rooted_tree = root_tree_at_midpoint(tree)
+            rooted_tree = root_at_midpoint(tree)
             
             # Save rooted tree
             rooted_filename = f'output/rooted_{tree_name.lower().replace(" ", "_")}.newick'
@@ -43,30 +48,6 @@ def root_trees_with_midpoint():
     
     return rooted_trees
 
-def root_tree_at_midpoint(tree):
-    """Root tree at midpoint (longest path midpoint)"""
-    
-    # Find the two most distant tips
-    max_distance = 0
-    tip1, tip2 = None, None
-    
-    for tip1_candidate in tree.get_terminals():
-        for tip2_candidate in tree.get_terminals():
-            if tip1_candidate != tip2_candidate:
-                distance = tree.distance(tip1_candidate, tip2_candidate)
-                if distance > max_distance:
-                    max_distance = distance
-                    tip1, tip2 = tip1_candidate, tip2_candidate
-    
-    if tip1 and tip2:
-        # Find midpoint
-        midpoint = max_distance / 2
-        
-        # Root the tree at the midpoint
-        tree.root_at_midpoint(tip1, tip2, midpoint)
-    
-    return tree
-
 def create_comprehensive_visualization(rooted_trees):
     """Create comprehensive visualization of all rooted trees"""
     
@@ -1,10 +1,14 @@
 # scripts/simple_nj_tree.py
 import pandas as pd
 import numpy as np
-from Bio.Phylo.TreeConstruction import DistanceTreeConstructor, DistanceMatrix
 from Bio import Phylo
 import matplotlib.pyplot as plt
 import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from fababean.trees import neighbor_joining, root_at_midpoint
 
 def build_simple_nj_tree():
     """Build a simple NJ tree as backup"""
@@ -24,17 +28,8 @@ def build_simple_nj_tree():
         
         print(f"Building tree for {len(sample_ids)} samples: {sample_ids}")
         
-        # Convert to BioPython DistanceMatrix format
-        def df_to_distance_matrix(df):
-            matrix = []
-            for i in range(len(df)):
-                matrix.append(df.iloc[i, :i+1].tolist())
-            return DistanceMatrix(names=sample_ids, matrix=matrix)
-        
         # Build NJ tree
-        constructor = DistanceTreeConstructor()
-        distance_matrix = df_to_distance_matrix(dist_df)
-        nj_tree = constructor.nj(distance_matrix)
+        nj_tree = neighbor_joining(dist_df.to_numpy(), sample_ids)
         
         # Save tree
         Phylo.write(nj_tree, 'output/nj_tree_simple.newick', 'newick')
@@ -78,21 +73,8 @@ def plot_simple_tree(tree, title, filename):
 def root_tree_simple(tree):
     """Simple midpoint rooting"""
     try:
-        terminals = list(tree.get_terminals())
-        
-        # Find two most distant terminals
-        max_dist = 0
-        t1, t2 = None, None
-        
-        for i in range(len(terminals)):
-            for j in range(i+1, len(terminals)):
-                dist = tree.distance(terminals[i], terminals[j])
-                if dist > max_dist:
-                    max_dist = dist
-                    t1, t2 = terminals[i], terminals[j]
-        
-        if t1 and t2:
-            tree.root_at_midpoint(t1, t2, max_dist/2)
+        if len(tree.get_terminals()) > 1:
+            root_at_midpoint(tree)
             print("✓ Tree rooted at midpoint")
             return tree
         else:
@@ -17,11 +17,23 @@ __email__       = "e.ortiz.v@gmail.com"
 __date__        = "2023-07-07"
 
 import argparse
+import bisect
+import collections
+import functools
 import gzip
+import hashlib
+import json
+import multiprocessing
+import os
 import random
+import re
+import struct
 import sys
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from fababean.alignment import MATRIX_SUFFIXES, WRITE_BUFFER, MatrixWriter
+
 # Dictionary of IUPAC ambiguities for nucleotides
 # '*' is a deletion in GATK, deletions are ignored in consensus, lowercase consensus is used when an
 # 'N' or '*' is part of the genotype. Capitalization is used by some software but ignored by Geneious
@@ -59,6 +71,16 @@ GEN_BIN = {
     "1|1":"2",
 }
 
+# Approximate size in bytes of the pieces of the VCF parsed by each worker process, and of the
+# blocks of lines decoded at once when a single process is used
+CHUNK_SIZE = 4 * 1024 * 1024
+BLOCK_SIZE = 1024 * 1024
+
+# Mask of 64-bit integers for the random number generator
+MASK64 = (1 << 64) - 1
+
+# Largest position of a region without end
+MAX_POS = 1 << 62
 
 def extract_sample_names(vcf_file):
     """
@@ -79,14 +101,6 @@ def extract_sample_names(vcf_file):
     return sample_names
 
 
-def is_anomalous(record, num_samples):
-    """
-    Determine if the number of samples in current record corresponds to number of samples described
-    in the line '#CHROM'
-    """
-    return bool(len(record) != num_samples + 9)
-
-
 def is_snp(record):
     """
     Determine if current VCF record is a SNP (single nucleotide polymorphism) as opposed to MNP
@@ -97,54 +111,870 @@ def is_snp(record):
     return bool(len(record[3]) == 1 and len(alt) - alt.count(",") == alt.count(",") + 1)
 
 
-def num_genotypes(record, num_samples):
+class ColumnTable(dict):
     """
-    Get number of genotypes in VCF record, total number of samples - missing genotypes
+    Lookup table translating the GT subfield of a VCF record with the given REF and ALT into a
+    matrix cell, entries are computed the first time a genotype is seen. Cells are IUPAC characters,
+    or tuples with the nucleotide of each allele when heterozygous genotypes are resolved at random.
+    A malformed genotype raises KeyError
     """
-    missing = 0
-    for i in range(9, num_samples + 9):
-        if record[i].startswith("."):
-            missing += 1
-    return num_samples - missing
+    def __init__(self, ref, alt, resolve_IUPAC):
+        super().__init__()
+        self.nt_dict = {str(0): ref.replace("-","*").upper(), ".": "N"}
+        # <NON_REF> must be replaced by the REF in the ALT field for GVCFs from GATK
+        alt = alt.replace("-", "*").replace("<NON_REF>", self.nt_dict["0"])
+        alt = alt.split(",")
+        for n in range(len(alt)):
+            self.nt_dict[str(n+1)] = alt[n]
+        self.resolve_IUPAC = resolve_IUPAC
+
+    def __missing__(self, gt):
+        geno_num = gt.replace("/", "").replace("|", "")
+        geno_nuc = "".join(sorted(set([self.nt_dict[j] for j in geno_num])))
+        if self.resolve_IUPAC is False or len(set(geno_num)) < 2:
+            cell = AMBIG[geno_nuc]
+        else:
+            cell = tuple([AMBIG[self.nt_dict[j]] for j in geno_num])
+        self[gt] = cell
+        return cell
 
 
-def get_matrix_column(record, num_samples, resolve_IUPAC):
+class BinTable(dict):
     """
-    Transform a VCF record into a phylogenetic matrix column with nucleotides instead of numbers
+    GEN_BIN as a lookup table that returns '?' for genotypes that are not diploid with at most two
+    alleles
     """
-    nt_dict = {str(0): record[3].replace("-","*").upper(), ".": "N"}
-    # <NON_REF> must be replaced by the REF in the ALT field for GVCFs from GATK
-    alt = record[4].replace("-", "*").replace("<NON_REF>", nt_dict["0"])
-    alt = alt.split(",")
-    for n in range(len(alt)):
-        nt_dict[str(n+1)] = alt[n]
-    column = ""
-    for i in range(9, num_samples + 9):
-        geno_num = record[i].split(":")[0].replace("/", "").replace("|", "")
-        try:
-            geno_nuc = "".join(sorted(set([nt_dict[j] for j in geno_num])))
-        except KeyError:
-            return "malformed"
-        if resolve_IUPAC is False:
-            column += AMBIG[geno_nuc]
+    def __missing__(self, gt):
+        return "?"
+
+
+BIN_TABLE = BinTable(GEN_BIN)
+
+# Lookup tables of the REF and ALT combinations seen so far
+COLUMN_TABLES = {}
+
+
+def get_column_table(ref, alt, resolve_IUPAC):
+    """
+    Return the lookup table for a REF and ALT combination, the cache is reset if it grows too large
+    """
+    key = (ref, alt, resolve_IUPAC)
+    if key not in COLUMN_TABLES:
+        if len(COLUMN_TABLES) > 10000:
+            COLUMN_TABLES.clear()
+        COLUMN_TABLES[key] = ColumnTable(ref, alt, resolve_IUPAC)
+    return COLUMN_TABLES[key]
+
+
+# Positions of the DP, GQ and AD subfields in the FORMAT strings seen so far
+FORMAT_INDICES = {}
+
+
+def get_format_indices(format_field):
+    """
+    Return the positions of the DP, GQ and AD subfields in a FORMAT string, None if absent
+    """
+    if format_field not in FORMAT_INDICES:
+        keys = format_field.split(":")
+        FORMAT_INDICES[format_field] = tuple([keys.index(key) if key in keys else None
+                                              for key in ("DP", "GQ", "AD")])
+    return FORMAT_INDICES[format_field]
+
+
+def get_value(subfields, idx):
+    """
+    Return the numeric value of a FORMAT subfield, None if the subfield is absent or missing
+    """
+    if idx is None or idx >= len(subfields):
+        return None
+    try:
+        return float(subfields[idx])
+    except ValueError:
+        return None
+
+
+def mask_genotypes(fields, genotypes, format_field, args):
+    """
+    Replace by '.' the called genotypes with a read depth below '--min-dp', a genotype quality below
+    '--min-gq', or heterozygous genotypes whose least supported allele has a fraction of the allele
+    depths (AD) below '--min-allele-balance'. As in bcftools, missing values never mask a genotype.
+    Returns the number of genotypes masked
+    """
+    dp_idx, gq_idx, ad_idx = get_format_indices(format_field)
+    if args.min_dp is None:
+        dp_idx = None
+    if args.min_gq is None:
+        gq_idx = None
+    if args.min_allele_balance is None:
+        ad_idx = None
+    if dp_idx is None and gq_idx is None and ad_idx is None:
+        return 0
+
+    num_masked = 0
+    for i, field in enumerate(fields):
+        if genotypes[i].startswith("."):
+            continue
+        subfields = field.split(":")
+        dp = get_value(subfields, dp_idx)
+        gq = get_value(subfields, gq_idx)
+        low = bool((dp is not None and dp < args.min_dp) or (gq is not None and gq < args.min_gq))
+        if not low and ad_idx is not None and ad_idx < len(subfields):
+            alleles = set(genotypes[i].replace("|", "/").split("/"))
+            depths = subfields[ad_idx].split(",")
+            if len(alleles) > 1 and all([a.isdigit() and int(a) < len(depths) for a in alleles]):
+                try:
+                    counts = [int(depths[int(a)]) for a in alleles]
+                except ValueError:
+                    counts = []
+                if sum(counts) > 0 and min(counts) / sum(counts) < args.min_allele_balance:
+                    low = True
+        if low:
+            genotypes[i] = "."
+            num_masked += 1
+    return num_masked
+
+
+def splitmix64(x):
+    """
+    SplitMix64 mixing function, maps a 64-bit integer to a well distributed 64-bit integer
+    """
+    x = (x + 0x9E3779B97F4A7C15) & MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASK64
+    return x ^ (x >> 31)
+
+
+def site_key(seed, record):
+    """
+    64-bit key of a site derived from the seed and the CHROM, POS, REF and ALT of the record, so the
+    same site gets the same key whatever the chunk, region or worker that decodes it
+    """
+    site = "\t".join([str(seed), record[0], record[1], record[3], record[4]]).encode()
+    return int.from_bytes(hashlib.blake2b(site, digest_size=8).digest(), "little")
+
+
+def resolve_cells(cells, key):
+    """
+    Randomly resolve the heterozygous cells of a column (tuples with the nucleotide of each allele)
+    with a counter-based generator, the random number of each cell only depends on the site key and
+    the index of the sample
+    """
+    for i, cell in enumerate(cells):
+        if type(cell) is tuple:
+            draw = splitmix64((key + i * 0x9E3779B97F4A7C15) & MASK64)
+            cells[i] = cell[(draw * len(cell)) >> 64]
+
+
+def minor_allele_frequency(genotypes):
+    """
+    Frequency of the second most common allele among the called alleles, as 'minor' in bcftools
+    """
+    allele_counts = collections.Counter()
+    for gt, count in collections.Counter(genotypes).items():
+        for allele in gt.replace("|", "/").split("/"):
+            if allele != ".":
+                allele_counts[allele] += count
+    if len(allele_counts) < 2:
+        return 0.0
+    counts = sorted(allele_counts.values(), reverse=True)
+    return counts[1] / sum(counts)
+
+
+def decode_records(data, num_samples, args):
+    """
+    Apply the filters to a batch of VCF lines given as bytes and transform the records into
+    alignment columns. The number of columns and of missing genotypes are counted on the raw line,
+    so the sample fields of records rejected by those filters are never split, and the genotypes
+    of accepted records are translated with lookup tables. Low-confidence genotypes are masked as
+    missing before counting the samples of the locus again. Comments, empty lines and records
+    outside the requested regions are skipped, every record produces one tuple that is either
+    ('malformed', line), ('shallow',), ('mnp',), ('rare',) or ('site', chrom, pos,
+    num_samples_locus, column, binary_column, num_masked), columns are None when not requested or
+    not applicable
+    """
+    masking = bool(args.min_dp is not None or args.min_gq is not None
+                   or args.min_allele_balance is not None)
+    parsed = []
+    for line in data.decode().split("\n"):
+        line = line.strip()
+
+        if not line or line.startswith("#"): # skip empty and commented lines
+            continue
+        if args.regions is not None:
+            head = line.split("\t", 2)
+            if len(head) < 2:
+                parsed.append(("malformed", line))
+                continue
+            chrom, pos = head[:2]
+            if not pos.isdigit() or not in_regions(args.regions, chrom, int(pos)):
+                continue
+        # Determine if the number of samples in current record corresponds to number of samples
+        # described in the line '#CHROM'
+        if line.count("\t") != num_samples + 8:
+            parsed.append(("malformed", line))
+            continue
+        record = line.split("\t", 9)
+        # Check if the SNP has the minimum number of samples required, missing genotypes are the
+        # sample fields starting with '.'
+        missing = record[9].count("\t.") + record[9].startswith(".")
+        num_samples_locus = num_samples - missing
+        if num_samples_locus < args.min_samples_locus:
+            parsed.append(("shallow",))
+            continue
+        # Check that neither REF nor ALT contain MNPs
+        if not is_snp(record):
+            parsed.append(("mnp",))
+            continue
+        if ":" in record[9]:
+            fields = record[9].split("\t")
+            genotypes = [field.partition(":")[0] for field in fields]
         else:
-            column += AMBIG[nt_dict[random.choice(geno_num)]]
-    return column
+            fields = None
+            genotypes = record[9].split("\t")
+        num_masked = 0
+        if masking and fields is not None:
+            num_masked = mask_genotypes(fields, genotypes, record[8], args)
+            if num_masked:
+                num_samples_locus -= num_masked
+                if num_samples_locus < args.min_samples_locus:
+                    parsed.append(("shallow",))
+                    continue
+        # Check the frequency of the second most common allele
+        if args.maf is not None and minor_allele_frequency(genotypes) < args.maf:
+            parsed.append(("rare",))
+            continue
+        site_tmp = None
+        binsite_tmp = None
+        # If nucleotide matrices are requested transform VCF record into an alignment column
+        if args.nucleotides:
+            table = get_column_table(record[3], record[4], args.resolve_IUPAC)
+            try:
+                cells = list(map(table.__getitem__, genotypes))
+            except KeyError:
+                parsed.append(("malformed", line))
+                continue
+            if args.resolve_IUPAC:
+                resolve_cells(cells, site_key(args.seed, record))
+            site_tmp = "".join(cells)
+        # Translate genotype into 0 for homozygous REF, 1 for heterozygous, and 2 for homozygous
+        # ALT if the SNP only has two alleles
+        if args.nexusbin and len(record[4]) == 1:
+            binsite_tmp = "".join(map(BIN_TABLE.__getitem__, genotypes))
+        parsed.append(("site", record[0], record[1], num_samples_locus, site_tmp, binsite_tmp,
+                       num_masked))
+    return parsed
+
+
+def is_bgzf(vcf_file):
+    """
+    Determine if the file is compressed in BGZF blocks (bgzip) instead of being plain gzip
+    """
+    with open(vcf_file, "rb") as vcf:
+        header = vcf.read(16)
+    return bool(header[:4] == b"\x1f\x8b\x08\x04" and header[12:14] == b"BC")
 
 
-def get_matrix_column_bin(record, num_samples):
+def read_bgzf_block_size(vcf):
+    """
+    Read the header of the BGZF block at the current position of the file and return the compressed
+    size of the block, or None at the end of the file
     """
-    Return an alignment column in NEXUS binary from a VCF record, if genotype is not diploid with at
-    most two alleles it will return '?' as state
+    header = vcf.read(12)
+    if len(header) < 12:
+        return None
+    xlen = struct.unpack("<H", header[10:12])[0]
+    extra = vcf.read(xlen)
+    i = 0
+    while i + 4 <= xlen:
+        slen = struct.unpack("<H", extra[i+2:i+4])[0]
+        if extra[i:i+2] == b"BC":
+            return struct.unpack("<H", extra[i+4:i+6])[0] + 1
+        i += 4 + slen
+    raise ValueError("Not a BGZF block at offset {:d}".format(vcf.tell() - 12 - xlen))
+
+
+def bgzf_blocks(vcf_file, offset=0):
     """
-    column = ""
-    for i in range(9, num_samples + 9):
-        genotype = record[i].split(":")[0]
-        if genotype in GEN_BIN:
-            column += GEN_BIN[genotype]
+    Yield the offset and the compressed size of every BGZF block in the file, starting at the
+    block at 'offset'
+    """
+    with open(vcf_file, "rb") as vcf:
+        while 1:
+            vcf.seek(offset)
+            bsize = read_bgzf_block_size(vcf)
+            if bsize is None:
+                break
+            yield offset, bsize
+            offset += bsize
+
+
+def read_bgzf_range(vcf_file, start, end):
+    """
+    Decompress the data between two BGZF virtual offsets, the upper 48 bits of a virtual offset are
+    the position of a block in the file and the lower 16 bits the position within the block
+    """
+    with open(vcf_file, "rb") as vcf:
+        vcf.seek(start >> 16)
+        data = gzip.decompress(vcf.read((end >> 16) - (start >> 16)))
+        if end & 0xFFFF:
+            bsize = read_bgzf_block_size(vcf)
+            vcf.seek(end >> 16)
+            data += gzip.decompress(vcf.read(bsize))[:end & 0xFFFF]
+    return data[start & 0xFFFF:]
+
+
+def split_range(vcf_file, start, end, chunk_size):
+    """
+    Split the data between two BGZF virtual offsets into pieces of about 'chunk_size' compressed
+    bytes that start and end at block boundaries
+    """
+    pieces = []
+    for offset, bsize in bgzf_blocks(vcf_file, start >> 16):
+        if (offset + bsize) << 16 >= end:
+            break
+        if offset + bsize - (start >> 16) >= chunk_size:
+            pieces.append((start, (offset + bsize) << 16))
+            start = (offset + bsize) << 16
+    if end > start:
+        pieces.append((start, end))
+    return pieces
+
+
+def split_chunks(vcf_file, chunk_size):
+    """
+    Split a BGZF-compressed or uncompressed VCF into ranges of about 'chunk_size' bytes, ranges of
+    uncompressed files are byte offsets and ranges of compressed files are virtual offsets at BGZF
+    block boundaries
+    """
+    size = Path(vcf_file).stat().st_size
+    if not vcf_file.lower().endswith(".gz"):
+        return [(start, min(start + chunk_size, size)) for start in range(0, size, chunk_size)]
+    return split_range(vcf_file, 0, size << 16, chunk_size)
+
+
+def parse_regions(regions, regions_file):
+    """
+    Parse regions given as a comma-separated list of 'CHROM', 'CHROM:POS' or 'CHROM:BEG-END', and
+    from a file with one region per line in the same format or as tab-separated CHROM, BEG and END
+    columns. Coordinates are 1-based and inclusive. Returns a dictionary with the sorted and merged
+    intervals of each chromosome, or None if no region was given
+    """
+    if not regions and not regions_file:
+        return None
+    region_list = []
+    if regions:
+        region_list += regions.split(",")
+    if regions_file:
+        with open(regions_file) as regfile:
+            for line in regfile:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    fields = line.split("\t")
+                    if len(fields) >= 3:
+                        region_list.append("{}:{}-{}".format(*fields[:3]))
+                    else:
+                        region_list.append(fields[0])
+    intervals = {}
+    for region in region_list:
+        region = region.strip()
+        if not region:
+            continue
+        chrom, beg, end = region, 1, MAX_POS
+        if ":" in region:
+            chrom, coords = region.rsplit(":", 1)
+            coords = coords.replace(",", "")
+            if "-" in coords:
+                beg, end = coords.split("-")
+                beg = int(beg) if beg else 1
+                end = int(end) if end else MAX_POS
+            else:
+                beg = end = int(coords)
+        intervals.setdefault(chrom, []).append((max(beg, 1), end))
+    for chrom in intervals:
+        merged = []
+        for beg, end in sorted(intervals[chrom]):
+            if merged and beg <= merged[-1][1] + 1:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((beg, end))
+        intervals[chrom] = merged
+    return intervals
+
+
+def in_regions(regions, chrom, pos):
+    """
+    Determine if a position falls in any of the intervals of its chromosome
+    """
+    if chrom not in regions:
+        return False
+    intervals = regions[chrom]
+    i = bisect.bisect_right(intervals, (pos, MAX_POS)) - 1
+    return bool(i >= 0 and intervals[i][0] <= pos <= intervals[i][1])
+
+
+def read_index(vcf_file):
+    """
+    Read the tabix (.tbi) or CSI (.csi) index of a BGZF-compressed VCF. Returns the minimum shift
+    and depth of the binning scheme and a dictionary with the bins of each chromosome (bin number
+    to list of chunks as pairs of virtual offsets) and its linear index, or None if there is no
+    usable index
+    """
+    for ext in (".tbi", ".csi"):
+        if Path(vcf_file + ext).exists():
+            break
+    else:
+        return None
+    with gzip.open(vcf_file + ext, "rb") as idx:
+        data = idx.read()
+
+    tbi = bool(data[:4] == b"TBI\x01")
+    if tbi:
+        min_shift, depth = 14, 5
+        n_ref = struct.unpack_from("<i", data, 4)[0]
+        l_nm = struct.unpack_from("<i", data, 32)[0]
+        names = data[36:36+l_nm]
+        i = 36 + l_nm
+    elif data[:4] == b"CSI\x01":
+        min_shift, depth, l_aux = struct.unpack_from("<iii", data, 4)
+        # Chromosome names are stored in the auxiliary data, in the same layout as tabix
+        if l_aux < 28:
+            return None
+        l_nm = struct.unpack_from("<i", data, 16+24)[0]
+        names = data[16+28:16+28+l_nm]
+        i = 16 + l_aux
+        n_ref = struct.unpack_from("<i", data, i)[0]
+        i += 4
+    else:
+        return None
+    names = names.rstrip(b"\x00").decode().split("\x00")
+
+    refs = {}
+    for r in range(n_ref):
+        bins = {}
+        n_bin = struct.unpack_from("<i", data, i)[0]
+        i += 4
+        for b in range(n_bin):
+            if tbi:
+                bin_num, n_chunk = struct.unpack_from("<Ii", data, i)
+                i += 8
+            else:
+                bin_num, loffset, n_chunk = struct.unpack_from("<IQi", data, i)
+                i += 16
+            bins[bin_num] = list(struct.iter_unpack("<QQ", data[i:i+16*n_chunk]))
+            i += 16 * n_chunk
+        linear = []
+        if tbi:
+            n_intv = struct.unpack_from("<i", data, i)[0]
+            i += 4
+            linear = struct.unpack_from("<{:d}Q".format(n_intv), data, i)
+            i += 8 * n_intv
+        refs[names[r]] = (bins, linear)
+    return min_shift, depth, refs
+
+
+def region_chunks(index, regions):
+    """
+    Get the sorted and merged ranges of virtual offsets that hold the records of the regions
+    """
+    min_shift, depth, refs = index
+    chunks = []
+    for chrom in regions:
+        if chrom not in refs:
+            continue
+        bins, linear = refs[chrom]
+        for beg, end in regions[chrom]:
+            # Bins overlapping the 0-based interval [beg-1, end), as in htslib reg2bins()
+            beg -= 1
+            end = min(end, 1 << (min_shift + depth * 3))
+            min_offset = 0
+            if linear:
+                min_offset = linear[min(beg >> min_shift, len(linear) - 1)]
+            t, shift = 0, min_shift + depth * 3
+            for level in range(depth + 1):
+                for bin_num in range(t + (beg >> shift), t + ((end - 1) >> shift) + 1):
+                    for chunk in bins.get(bin_num, []):
+                        if chunk[1] > min_offset:
+                            chunks.append(chunk)
+                t += 1 << (level * 3)
+                shift -= 3
+    merged = []
+    for beg, end in sorted(chunks):
+        if merged and beg <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((beg, end))
+    return merged
+
+
+def parse_chunk(num_samples, args, chunk):
+    """
+    Read and decompress a range of the VCF and parse all the complete lines in it. The fragments
+    before the first and after the last newline are returned as bytes so the lines split between
+    chunks can be rebuilt in order, the first fragment is None if there is no newline
+    """
+    start, end = chunk
+    if args.filename.lower().endswith(".gz"):
+        data = read_bgzf_range(args.filename, start, end)
+    else:
+        with open(args.filename, "rb") as vcf:
+            vcf.seek(start)
+            data = vcf.read(end - start)
+    first = data.find(b"\n")
+    if first == -1:
+        return None, [], data
+    last = data.rfind(b"\n")
+    return data[:first], decode_records(data[first+1:last], num_samples, args), data[last+1:]
+
+
+def join_chunks(parsed_chunks, num_samples, args, first=0, carry=b""):
+    """
+    Yield the records of consecutive parsed chunks, parsing the lines split between chunks. After
+    each chunk a ('position', [next_chunk, carry]) marker tells where reading can be resumed, the
+    carry being the start of the split line decoded as latin-1
+    """
+    for i, (head, parsed, tail) in enumerate(parsed_chunks, first + 1):
+        if head is None:
+            carry += tail
         else:
-            column += "?"
-    return column
+            # Rebuild the line split between the previous chunk and this one
+            yield from decode_records(carry + head, num_samples, args)
+            yield from parsed
+            carry = tail
+        yield ("position", [i, carry.decode("latin-1")])
+    if carry:
+        yield from decode_records(carry, num_samples, args)
+
+
+def iter_records(num_samples, args, position=None):
+    """
+    Yield the parsed VCF records in the order of the file. With more than one thread, BGZF or
+    uncompressed VCFs are split in chunks that are decompressed and parsed by worker processes. If
+    regions are requested and the BGZF-compressed VCF is indexed only the chunks of the file that
+    overlap the regions are read, otherwise the records are filtered while streaming. Markers
+    ('position', position) are yielded between batches of records, reading starts at 'position' if
+    given
+    """
+    vcf_file = args.filename
+    bgzf = vcf_file.lower().endswith(".gz") and is_bgzf(vcf_file)
+    parallel = args.threads > 1
+    if parallel and vcf_file.lower().endswith(".gz") and not bgzf:
+        print("Input VCF is not compressed with bgzip, it will be parsed with a single thread\n")
+        parallel = False
+
+    index = None
+    if args.regions is not None and bgzf:
+        index = read_index(vcf_file)
+        if index is None:
+            print("No index found for the input VCF, records outside the regions will be skipped "
+                  "while reading the whole file\n")
+
+    if index is not None:
+        chunks = []
+        for start, end in region_chunks(index, args.regions):
+            chunks += split_range(vcf_file, start, end, CHUNK_SIZE)
+    elif parallel:
+        chunks = split_chunks(vcf_file, CHUNK_SIZE)
+    else:
+        # Stream the decompressed file, the position is the offset of the next line to read
+        if vcf_file.lower().endswith(".gz"):
+            opener = gzip.open
+        else:
+            opener = open
+        offset = position or 0
+        with opener(vcf_file, "rb") as vcf:
+            vcf.seek(offset)
+            carry = b""
+            while 1:
+                # Load large chunks of file into memory, cutting them after the last complete line
+                vcf_chunk = vcf.read(BLOCK_SIZE)
+                if not vcf_chunk:
+                    break
+                vcf_chunk = carry + vcf_chunk
+                last = vcf_chunk.rfind(b"\n")
+                if last == -1:
+                    carry = vcf_chunk
+                    continue
+                yield from decode_records(vcf_chunk[:last], num_samples, args)
+                offset += last + 1
+                yield ("position", offset)
+                carry = vcf_chunk[last+1:]
+            if carry:
+                yield from decode_records(carry, num_samples, args)
+        return
+
+    first, carry = position or (0, "")
+    worker = functools.partial(parse_chunk, num_samples, args)
+    if parallel:
+        with multiprocessing.Pool(args.threads) as pool:
+            yield from join_chunks(pool.imap(worker, chunks[first:]), num_samples, args, first,
+                                   carry.encode("latin-1"))
+    else:
+        yield from join_chunks(map(worker, chunks[first:]), num_samples, args, first,
+                               carry.encode("latin-1"))
+
+
+def transpose_matrix(tmp_file, order, max_memory, row_ranges=None):
+    """
+    Transpose a temporary file holding one alignment column per line into one sequence per sample,
+    yielded as bytes in the order given by 'order'. All lines have the same length, so the file is
+    loaded as a byte matrix and every sequence is a strided slice of it. If the matrix does not fit
+    in 'max_memory' bytes the samples are processed in tiles, reading the file in large blocks once
+    per tile. Only the lines in 'row_ranges', a list of (start, end) line numbers, are used if given
+    """
+    with open(tmp_file, "rb") as tmp_seq:
+        row_len = len(tmp_seq.readline())
+        if row_len == 0:
+            for s in order:
+                yield b""
+            return
+        if row_ranges is None:
+            row_ranges = [(0, tmp_seq.seek(0, 2) // row_len)]
+        num_rows = sum([end - start for start, end in row_ranges])
+
+        def read_blocks(rows_block):
+            for start, end in row_ranges:
+                tmp_seq.seek(start * row_len)
+                for row in range(start, end, rows_block):
+                    yield tmp_seq.read(min(rows_block, end - row) * row_len)
+
+        # In-RAM fast path, the whole matrix is read at once
+        if num_rows * row_len <= max_memory:
+            matrix = b"".join(read_blocks(max(1, num_rows)))
+            for s in order:
+                yield matrix[s::row_len]
+            return
+
+        # Out-of-core, reserve a quarter of the memory for reading blocks and fill the rest with as
+        # many sequences as possible
+        rows_block = max(1, min(num_rows, max_memory // 4 // row_len))
+        tile_size = max(1, (max_memory - rows_block * row_len) // num_rows)
+        for t in range(0, len(order), tile_size):
+            tile = order[t:t+tile_size]
+            tile_seqs = [bytearray() for s in tile]
+            for block in read_blocks(rows_block):
+                for i, s in enumerate(tile):
+                    tile_seqs[i] += block[s::row_len]
+            yield from tile_seqs
+
+
+class SiteSelector:
+    """
+    Streaming selection of the sites that passed the filters. With a locus size only the site
+    genotyped in most samples of each fixed window of that many bp is kept (the first one on ties),
+    as a proxy of one SNP per GBS tag, and with a thinning distance kept sites are at least that many
+    bp apart. Only the best site of the current window is held in memory
+    """
+    def __init__(self, thin, locus_size):
+        self.thin = thin
+        self.locus_size = locus_size
+        self.pending = None
+        self.last_kept = None
+
+    def add(self, record):
+        """
+        Return the records to output in place of a 'site' record, rejected sites are replaced by
+        ('thinned',) and the best site of a window is only returned when the window is complete
+        """
+        if not self.locus_size:
+            return [self.check_distance(record)]
+        if self.pending is None:
+            self.pending = record
+            return []
+        window = (record[1], int(record[2]) // self.locus_size)
+        if window == (self.pending[1], int(self.pending[2]) // self.locus_size):
+            if record[3] > self.pending[3]:
+                self.pending = record
+            return [("thinned",)]
+        selected = self.check_distance(self.pending)
+        self.pending = record
+        return [selected]
+
+    def flush(self):
+        """
+        Return the best site of the last window
+        """
+        if self.pending is None:
+            return []
+        selected = self.check_distance(self.pending)
+        self.pending = None
+        return [selected]
+
+    def check_distance(self, record):
+        if self.thin:
+            chrom, pos = record[1], int(record[2])
+            if self.last_kept and self.last_kept[0] == chrom and pos - self.last_kept[1] < self.thin:
+                return ("thinned",)
+            self.last_kept = (chrom, pos)
+        return record
+
+
+def select_sites(records, selector):
+    """
+    Apply '--one-per-locus' and '--thin' to the stream of parsed records
+    """
+    if selector is None:
+        yield from records
+        return
+    for record in records:
+        if record[0] == "site":
+            yield from selector.add(record)
+        else:
+            yield record
+    yield from selector.flush()
+
+
+def checkpoint_signature(args):
+    """
+    Describe the input VCF and the options that determine the output, a checkpoint can only be
+    resumed by a run with the same signature
+    """
+    stat = Path(args.filename).stat()
+    options = {key: value for key, value in vars(args).items()
+               if key not in ("resume", "checkpoint_every", "max_memory", "threads")}
+    options["parallel"] = bool(args.threads > 1)
+    return json.loads(json.dumps({"input": str(Path(args.filename).resolve()),
+                                  "size": stat.st_size, "mtime": stat.st_mtime_ns,
+                                  "options": options}))
+
+
+def save_checkpoint(checkpoint_file, state, outputs):
+    """
+    Flush the temporary outputs to disk and save their sizes with the state of the conversion,
+    the checkpoint is written to a separate file that then replaces the previous one
+    """
+    state["sizes"] = {}
+    for output in outputs:
+        output.flush()
+        os.fsync(output.fileno())
+        state["sizes"][output.name] = os.fstat(output.fileno()).st_size
+    with open(checkpoint_file+".part", "w") as part:
+        json.dump(state, part)
+        part.flush()
+        os.fsync(part.fileno())
+    os.replace(checkpoint_file+".part", checkpoint_file)
+
+
+def load_checkpoint(checkpoint_file, signature):
+    """
+    Load the state of an interrupted conversion and truncate the temporary outputs to the sizes
+    they had at the checkpoint. Returns None if there is no checkpoint to resume
+    """
+    if not Path(checkpoint_file).exists():
+        print("No checkpoint found, the conversion will start from the beginning\n")
+        return None
+    with open(checkpoint_file) as checkpoint:
+        state = json.load(checkpoint)
+    if state["signature"] != signature:
+        print("\nThe checkpoint '{}' was saved for a different input VCF or different options, "
+              "run again without '--resume' to start from the beginning\n".format(checkpoint_file))
+        sys.exit()
+    for filename, size in state["sizes"].items():
+        if not Path(filename).exists() or Path(filename).stat().st_size < size:
+            print("\nTemporary file '{}' is missing or incomplete, run again without '--resume' "
+                  "to start from the beginning\n".format(filename))
+            sys.exit()
+        os.truncate(filename, size)
+    return state
+
+
+def open_writers(outfile, args, ntax, nchar, bin_nchar, len_longest_name):
+    """
+    Open a writer for every requested format of the nucleotide and of the binary matrices
+    """
+    def open_writer(matrix_format, nchar):
+        return MatrixWriter(outfile+MATRIX_SUFFIXES[matrix_format], matrix_format, ntax, nchar,
+                            len_longest_name)
+
+    writers = []
+    if nchar is not None:
+        if not args.phylipdisable:
+            writers.append(open_writer("PHYLIP", nchar))
+        if args.fasta:
+            writers.append(open_writer("FASTA", nchar))
+        if args.nexus:
+            writers.append(open_writer("NEXUS", nchar))
+    bin_writers = []
+    if args.nexusbin and bin_nchar is not None:
+        bin_writers.append(open_writer("BINARY NEXUS", bin_nchar))
+    return writers, bin_writers
+
+
+def write_matrices(writers, bin_writers, tmp_prefix, sample_names, order, idx_outgroup,
+                   max_memory, rows=None, bin_rows=None, verbose=True):
+    """
+    Transpose the temporary matrices, restricted to the given line ranges, and feed every sequence
+    to all the writers of its matrix
+    """
+    # Split the memory cap between the matrices that have to be transposed
+    if writers and bin_writers:
+        max_memory //= 2
+
+    # This is where the transposing happens, sequences come out in the order of the alignment
+    if writers:
+        seqs = transpose_matrix(tmp_prefix+".tmp", order, max_memory, rows)
+    if bin_writers:
+        bin_seqs = transpose_matrix(tmp_prefix+".bin.tmp", order, max_memory, bin_rows)
+
+    for s in order:
+        if writers:
+            seqout = next(seqs)
+            for writer in writers:
+                writer.write(sample_names[s], seqout)
+
+            # Print current progress
+            if not verbose:
+                pass
+            elif s == idx_outgroup:
+                print("Outgroup, '{}', added to the matrix(ces).".format(sample_names[s]))
+            else:
+                print("Sample {:d} of {:d}, '{}', added to the nucleotide matrix(ces).".format(
+                                                       s+1, len(sample_names), sample_names[s]))
+
+        if bin_writers:
+            seqout = next(bin_seqs)
+            for writer in bin_writers:
+                writer.write(sample_names[s], seqout)
+
+            # Print current progress
+            if not verbose:
+                pass
+            elif s == idx_outgroup:
+                print("Outgroup, '{}', added to the binary matrix.".format(sample_names[s]))
+            else:
+                print("Sample {:d} of {:d}, '{}', added to the binary matrix.".format(
+                                                       s+1, len(sample_names), sample_names[s]))
+
+    for writer in writers + bin_writers:
+        writer.close()
+
+
+def add_segment(segments, chrom, row):
+    """
+    Extend the last (chrom, start, end) run of lines of a matrix with a new line, or start a new run
+    if the chromosome changes
+    """
+    if segments and segments[-1][0] == chrom:
+        segments[-1][2] = row + 1
+    else:
+        segments.append([chrom, row, row + 1])
+
+
+def write_partitions(outfile, segments):
+    """
+    Write the chromosome partitions of the combined nucleotide matrix as a RAxML partition file and
+    as a NEXUS sets block for IQ-TREE, coordinates are 1-based alignment columns
+    """
+    charsets = {}
+    for chrom, start, end in segments:
+        charsets.setdefault(chrom, []).append("{:d}-{:d}".format(start + 1, end))
+    with open(outfile+".partitions.txt", "w") as raxml:
+        for chrom in charsets:
+            raxml.write("DNA, {} = {}\n".format(chrom, ", ".join(charsets[chrom])))
+    with open(outfile+".partitions.nex", "w") as nexus:
+        nexus.write("#nexus\nbegin sets;\n")
+        for chrom in charsets:
+            nexus.write("\tcharset {} = {};\n".format(chrom, " ".join(charsets[chrom])))
+        nexus.write("end;\n")
 
 
 def main():
@@ -200,11 +1030,104 @@ def main():
         dest = "resolve_IUPAC",
         help = "Randomly resolve heterozygous genotypes to avoid IUPAC ambiguities in the matrices "
                "(disabled by default)")
+    parser.add_argument("--seed",
+        action = "store",
+        dest = "seed",
+        type = int,
+        help = "Seed for '--resolve-IUPAC', each heterozygous genotype is resolved from the seed, "
+               "the site and the sample, so matrices are reproducible with any number of threads "
+               "or regions (random by default)")
     parser.add_argument("-w", "--write-used-sites",
         action = "store_true",
         dest = "write_used",
         help = "Save the list of coordinates that passed the filters and were used in the alignments "
                "(disabled by default)")
+    parser.add_argument("--min-dp",
+        action = "store",
+        dest = "min_dp",
+        type = int,
+        help = "Mask as missing the genotypes with a read depth (FORMAT/DP) below this value "
+               "(disabled by default)")
+    parser.add_argument("--min-gq",
+        action = "store",
+        dest = "min_gq",
+        type = float,
+        help = "Mask as missing the genotypes with a genotype quality (FORMAT/GQ) below this value "
+               "(disabled by default)")
+    parser.add_argument("--min-allele-balance",
+        action = "store",
+        dest = "min_allele_balance",
+        type = float,
+        help = "Mask as missing the heterozygous genotypes where the least supported allele has "
+               "less than this fraction of the allele depths (FORMAT/AD), e.g. 0.2 (disabled by "
+               "default)")
+    parser.add_argument("--maf",
+        action = "store",
+        dest = "maf",
+        type = float,
+        help = "Minimum frequency of the second most common allele among the called genotypes "
+               "(disabled by default)")
+    parser.add_argument("--thin",
+        action = "store",
+        dest = "thin",
+        type = int,
+        help = "Keep only sites at least this many bp apart, the first site is kept "
+               "(disabled by default)")
+    parser.add_argument("--one-per-locus",
+        action = "store_true",
+        dest = "one_per_locus",
+        help = "Keep one SNP per locus, the one genotyped in most samples within each fixed window "
+               "of '--locus-size' bp (disabled by default)")
+    parser.add_argument("--locus-size",
+        action = "store",
+        dest = "locus_size",
+        type = int,
+        default = 100,
+        help = "Size in bp of the windows used as loci by '--one-per-locus', e.g. the length of "
+               "the GBS tags (default=100)")
+    parser.add_argument("--regions",
+        action = "store",
+        dest = "regions",
+        help = "Comma-separated list of regions to convert, as CHROM, CHROM:POS or CHROM:BEG-END "
+               "(e.g. chr1L:1-5000000,chr3). A tabix (.tbi) or CSI (.csi) index next to a bgzipped "
+               "VCF is used to read only the regions, otherwise the whole VCF is filtered")
+    parser.add_argument("--regions-file",
+        action = "store",
+        dest = "regions_file",
+        help = "File with the regions to convert, one per line as in --regions or as "
+               "tab-separated CHROM, BEG and END columns (1-based, inclusive)")
+    parser.add_argument("--split-by",
+        action = "store",
+        dest = "split_by",
+        choices = ["CHROM"],
+        help = "Also write one matrix per chromosome, and the chromosome partitions of the "
+               "combined matrix for RAxML (.partitions.txt) and IQ-TREE (.partitions.nex)")
+    parser.add_argument("--threads",
+        action = "store",
+        dest = "threads",
+        type = int,
+        default = 1,
+        help = "Number of worker processes used to decompress and parse the VCF, only VCFs "
+               "compressed with bgzip or uncompressed can be split among processes (default=1)")
+    parser.add_argument("--checkpoint-every",
+        action = "store",
+        dest = "checkpoint_every",
+        type = int,
+        default = 100000,
+        help = "Save a checkpoint of the conversion every this many VCF records, 0 disables "
+               "checkpoints (default=100000)")
+    parser.add_argument("--resume",
+        action = "store_true",
+        dest = "resume",
+        help = "Continue an interrupted conversion from its last checkpoint, the input VCF and "
+               "the options must be the same as in the interrupted run")
+    parser.add_argument("--max-memory",
+        action = "store",
+        dest = "max_memory",
+        type = int,
+        default = 1024,
+        help = "Maximum memory in MB used to transpose the matrices in RAM, larger matrices are "
+               "transposed out-of-core in tiles (default=1024)")
     parser.add_argument("-v", "--version",
         action = "version",
         version = "%(prog)s {version}".format(version=__version__))
@@ -246,111 +1169,155 @@ def main():
 
     outfile = str(Path(args.folder, args.prefix))
 
+    args.nucleotides = bool(args.fasta or args.nexus or not args.phylipdisable)
+    args.regions = parse_regions(args.regions, args.regions_file)
+
+    checkpoint_file = outfile + ".checkpoint"
+
+    # Draw a seed to resolve heterozygous genotypes if none was given, or reuse the one of the
+    # interrupted conversion
+    if args.resolve_IUPAC and args.seed is None:
+        args.seed = random.SystemRandom().getrandbits(63)
+        if args.resume and Path(checkpoint_file).exists():
+            with open(checkpoint_file) as checkpoint:
+                args.seed = json.load(checkpoint)["signature"]["options"]["seed"]
+        print("Random seed used to resolve heterozygous genotypes: {:d}\n".format(args.seed))
+
+    # Load the state of an interrupted conversion if requested, temporary files are then appended
+    signature = checkpoint_signature(args)
+    state = None
+    if args.resume:
+        state = load_checkpoint(checkpoint_file, signature)
+    mode = "a" if state else "w"
+
     # We need to create an intermediate file to hold the sequence data vertically and then transpose
     # it to create the matrices
+    outputs = []
     if args.fasta or args.nexus or not args.phylipdisable:
-        temporal = open(outfile+".tmp", "w")
+        temporal = open(outfile+".tmp", mode, buffering=WRITE_BUFFER)
+        outputs.append(temporal)
 
     # If binary NEXUS is selected also create a separate temporal
     if args.nexusbin:
-        temporalbin = open(outfile+".bin.tmp", "w")
+        temporalbin = open(outfile+".bin.tmp", mode, buffering=WRITE_BUFFER)
+        outputs.append(temporalbin)
 
 
     ##########################
     # PROCESS GENOTYPES IN VCF
 
     if args.write_used:
-        used_sites = open(outfile+".used_sites.tsv", "w")
-        used_sites.write("#CHROM\tPOS\tNUM_SAMPLES\n")
-
-    if args.filename.lower().endswith(".gz"):
-        opener = gzip.open
-    else:
-        opener = open
-
-    with opener(args.filename, "rt") as vcf:
-        # Initialize line counter
-        snp_num = 0
-        snp_accepted = 0
-        snp_shallow = 0
-        mnp_num = 0
-        snp_biallelic = 0
-
-        while 1:
-            # Load large chunks of file into memory
-            vcf_chunk = vcf.readlines(50000)
-            if not vcf_chunk:
-                break
-
-            for line in vcf_chunk:
-                line = line.strip()
-
-                if line and not line.startswith("#"): # skip empty and commented lines
-                    # Split line into columns
-                    record = line.split("\t")
-                    # Keep track of number of genotypes processed
-                    snp_num += 1
-                    # Print progress every 500000 lines
-                    if snp_num % 500000 == 0:
-                        print("{:d} genotypes processed.".format(snp_num))
-                    if is_anomalous(record, num_samples):
-                        print("Skipping malformed line:\n{}".format(line))
-                        continue
-                    else:
-                        # Check if the SNP has the minimum number of samples required
-                        num_samples_locus = num_genotypes(record, num_samples)
-                        if  num_samples_locus < args.min_samples_locus:
-                            # Keep track of loci rejected due to exceeded missing data
-                            snp_shallow += 1
-                            continue
-                        else:
-                            # Check that neither REF nor ALT contain MNPs
-                            if is_snp(record):
-                                # If nucleotide matrices are requested
-                                if args.fasta or args.nexus or not args.phylipdisable:
-                                    # Uncomment for debugging
-                                    # print(record)
-                                    # Transform VCF record into an alignment column
-                                    site_tmp = get_matrix_column(record, num_samples,
-                                                                 args.resolve_IUPAC)
-                                    # Uncomment for debugging
-                                    # print(site_tmp)
-                                    # Write entire row of single nucleotide genotypes to temp file
-                                    if site_tmp == "malformed":
-                                        print("Skipping malformed line:\n{}".format(line))
-                                        continue
-                                    else:
-                                        # Add to running sum of accepted SNPs
-                                        snp_accepted += 1
-                                        temporal.write(site_tmp+"\n")
-                                        if args.write_used:
-                                            used_sites.write(record[0] + "\t"
-                                                             + record[1] + "\t"
-                                                             + str(num_samples_locus) + "\n")
-                                # Write binary NEXUS for SNAPP if requested
-                                if args.nexusbin:
-                                    # Check that the SNP only has two alleles
-                                    if len(record[4]) == 1:
-                                        # Add to running sum of biallelic SNPs
-                                        snp_biallelic += 1
-                                        # Translate genotype into 0 for homozygous REF, 1 for
-                                        # heterozygous, and 2 for homozygous ALT
-                                        binsite_tmp = get_matrix_column_bin(record, num_samples)
-                                        # Write entire row to temporary file
-                                        temporalbin.write(binsite_tmp+"\n")
-                            else:
-                                # Keep track of loci rejected due to multinucleotide genotypes
-                                mnp_num += 1
-
-        # Print useful information about filtering of SNPs
-        print("Total of genotypes processed: {:d}".format(snp_num))
-        print("Genotypes excluded because they exceeded the amount "
-              "of missing data allowed: {:d}".format(snp_shallow))
-        print("Genotypes that passed missing data filter but were "
-              "excluded for being MNPs: {:d}".format(mnp_num))
-        print("SNPs that passed the filters: {:d}".format(snp_accepted))
-        if args.nexusbin:
-            print("Biallelic SNPs selected for binary NEXUS: {:d}".format(snp_biallelic))
+        used_sites = open(outfile+".used_sites.tsv", mode)
+        if not state:
+            used_sites.write("#CHROM\tPOS\tNUM_SAMPLES\n")
+        outputs.append(used_sites)
+
+    # Initialize line counter
+    snp_num = 0
+    snp_accepted = 0
+    snp_shallow = 0
+    mnp_num = 0
+    snp_biallelic = 0
+    geno_masked = 0
+    snp_rare = 0
+    snp_thinned = 0
+
+    # Runs of consecutive lines of each chromosome in the temporary matrices
+    segments = []
+    bin_segments = []
+
+    selector = None
+    if args.thin or args.one_per_locus:
+        selector = SiteSelector(args.thin, args.locus_size if args.one_per_locus else None)
+
+    position = None
+    if state:
+        (snp_num, snp_accepted, snp_shallow, mnp_num, snp_biallelic, geno_masked, snp_rare,
+         snp_thinned) = state["counters"]
+        segments = state["segments"]
+        bin_segments = state["bin_segments"]
+        if selector:
+            pending, last_kept = state["selector"]
+            selector.pending = tuple(pending) if pending else None
+            selector.last_kept = tuple(last_kept) if last_kept else None
+        position = state["position"]
+        print("Resuming from checkpoint after {:d} genotypes processed.\n".format(snp_num))
+    last_checkpoint = snp_num
+
+    records = select_sites(iter_records(num_samples, args, position), selector)
+
+    for record in records:
+        # Save a checkpoint between batches of records
+        if record[0] == "position":
+            if args.checkpoint_every and snp_num - last_checkpoint >= args.checkpoint_every:
+                save_checkpoint(checkpoint_file, {
+                    "signature": signature,
+                    "position": record[1],
+                    "counters": [snp_num, snp_accepted, snp_shallow, mnp_num, snp_biallelic,
+                                 geno_masked, snp_rare, snp_thinned],
+                    "segments": segments,
+                    "bin_segments": bin_segments,
+                    "selector": [selector.pending, selector.last_kept] if selector else None,
+                }, outputs)
+                last_checkpoint = snp_num
+            continue
+        # Keep track of number of genotypes processed
+        snp_num += 1
+        # Print progress every 500000 lines
+        if snp_num % 500000 == 0:
+            print("{:d} genotypes processed.".format(snp_num))
+        if record[0] == "malformed":
+            print("Skipping malformed line:\n{}".format(record[1]))
+        elif record[0] == "shallow":
+            # Keep track of loci rejected due to exceeded missing data
+            snp_shallow += 1
+        elif record[0] == "mnp":
+            # Keep track of loci rejected due to multinucleotide genotypes
+            mnp_num += 1
+        elif record[0] == "rare":
+            # Keep track of loci rejected due to low minor allele frequency
+            snp_rare += 1
+        elif record[0] == "thinned":
+            # Keep track of loci rejected by thinning
+            snp_thinned += 1
+        else:
+            chrom, pos, num_samples_locus, site_tmp, binsite_tmp, num_masked = record[1:]
+            geno_masked += num_masked
+            # Write entire row of single nucleotide genotypes to temp file
+            if site_tmp is not None:
+                # Add to running sum of accepted SNPs
+                snp_accepted += 1
+                temporal.write(site_tmp+"\n")
+                if args.split_by:
+                    add_segment(segments, chrom, snp_accepted - 1)
+                if args.write_used:
+                    used_sites.write(chrom + "\t" + pos + "\t" + str(num_samples_locus) + "\n")
+            # Write binary NEXUS for SNAPP if requested
+            if binsite_tmp is not None:
+                # Add to running sum of biallelic SNPs
+                snp_biallelic += 1
+                # Write entire row to temporary file
+                temporalbin.write(binsite_tmp+"\n")
+                if args.split_by:
+                    add_segment(bin_segments, chrom, snp_biallelic - 1)
+
+    # Print useful information about filtering of SNPs
+    print("Total of genotypes processed: {:d}".format(snp_num))
+    print("Genotypes excluded because they exceeded the amount "
+          "of missing data allowed: {:d}".format(snp_shallow))
+    print("Genotypes that passed missing data filter but were "
+          "excluded for being MNPs: {:d}".format(mnp_num))
+    if args.maf is not None:
+        print("SNPs excluded for having a minor allele frequency "
+              "below {}: {:d}".format(args.maf, snp_rare))
+    if args.thin or args.one_per_locus:
+        print("SNPs excluded by thinning or one-per-locus selection: {:d}".format(snp_thinned))
+    print("SNPs that passed the filters: {:d}".format(snp_accepted))
+    if args.min_dp is not None or args.min_gq is not None or args.min_allele_balance is not None:
+        print("Sample genotypes masked as missing in those SNPs for low depth, quality or allele "
+              "balance: {:d}".format(geno_masked))
+    if args.nexusbin:
+        print("Biallelic SNPs selected for binary NEXUS: {:d}".format(snp_biallelic))
 
     if args.write_used:
         print("Used sites saved to: '" + outfile + ".used_sites.tsv'")
@@ -366,25 +1333,6 @@ def main():
     #######################
     # WRITE OUTPUT MATRICES
 
-    if not args.phylipdisable:
-        output_phy = open(outfile+".phy", "w")
-        output_phy.write("{:d} {:d}\n".format(len(sample_names), snp_accepted))
-
-    if args.fasta:
-        output_fas = open(outfile+".fasta", "w")
-
-    if args.nexus:
-        output_nex = open(outfile+".nexus", "w")
-        output_nex.write("#NEXUS\n\nBEGIN DATA;\n\tDIMENSIONS NTAX={:d} NCHAR={:d};\n\tFORMAT "
-                         "DATATYPE=DNA MISSING=N GAP=- ;\nMATRIX\n".format(len(sample_names),
-                                                                                      snp_accepted))
-
-    if args.nexusbin:
-        output_nexbin = open(outfile+".bin.nexus", "w")
-        output_nexbin.write("#NEXUS\n\nBEGIN DATA;\n\tDIMENSIONS NTAX={:d} NCHAR={:d};\n\tFORMAT "
-                            "DATATYPE=SNP MISSING=? GAP=- ;\nMATRIX\n".format(len(sample_names),
-                                                                                     snp_biallelic))
-
     # Get length of longest sequence name
     len_longest_name = 0
     for name in sample_names:
@@ -395,106 +1343,44 @@ def main():
     idx_outgroup = None
     if outgroup in sample_names:
         idx_outgroup = sample_names.index(outgroup)
+        order = [idx_outgroup] + [s for s in range(len(sample_names)) if s != idx_outgroup]
+    else:
+        order = list(range(len(sample_names)))
+    max_memory = args.max_memory * 1024 * 1024
 
-        if args.fasta or args.nexus or not args.phylipdisable:
-            with open(outfile+".tmp") as tmp_seq:
-                seqout = ""
-
-                # This is where the transposing happens
-                for line in tmp_seq:
-                    seqout += line[idx_outgroup]
-
-                # Write FASTA line
-                if args.fasta:
-                    output_fas.write(">"+sample_names[idx_outgroup]+"\n"+seqout+"\n")
-
-                # Pad sequences names and write PHYLIP or NEXUS lines
-                padding = (len_longest_name + 3 - len(sample_names[idx_outgroup])) * " "
-                if not args.phylipdisable:
-                    output_phy.write(sample_names[idx_outgroup]+padding+seqout+"\n")
-                if args.nexus:
-                    output_nex.write(sample_names[idx_outgroup]+padding+seqout+"\n")
-
-                # Print current progress
-                print("Outgroup, '{}', added to the matrix(ces).".format(outgroup))
-
-        if args.nexusbin:
-            with open(outfile+".bin.tmp") as bin_tmp_seq:
-                seqout = ""
-
-                # This is where the transposing happens
-                for line in bin_tmp_seq:
-                    seqout += line[idx_outgroup]
-
-                # Write line of binary SNPs to NEXUS
-                padding = (len_longest_name + 3 - len(sample_names[idx_outgroup])) * " "
-                output_nexbin.write(sample_names[idx_outgroup]+padding+seqout+"\n")
-
-                # Print current progress
-                print("Outgroup, '{}', added to the binary matrix.".format(outgroup))
-
-    # Write sequences of the ingroup
-    for s in range(0, len(sample_names)):
-        if s != idx_outgroup:
-            if args.fasta or args.nexus or not args.phylipdisable:
-                with open(outfile+".tmp") as tmp_seq:
-                    seqout = ""
-
-                    # This is where the transposing happens
-                    for line in tmp_seq:
-                        seqout += line[s]
-
-                    # Write FASTA line
-                    if args.fasta:
-                        output_fas.write(">"+sample_names[s]+"\n"+seqout+"\n")
-
-                    # Pad sequences names and write PHYLIP or NEXUS lines
-                    padding = (len_longest_name + 3 - len(sample_names[s])) * " "
-                    if not args.phylipdisable:
-                        output_phy.write(sample_names[s]+padding+seqout+"\n")
-                    if args.nexus:
-                        output_nex.write(sample_names[s]+padding+seqout+"\n")
-
-                    # Print current progress
-                    print("Sample {:d} of {:d}, '{}', added to the nucleotide matrix(ces).".format(
-                                                           s+1, len(sample_names), sample_names[s]))
-
-            if args.nexusbin:
-                with open(outfile+".bin.tmp") as bin_tmp_seq:
-                    seqout = ""
-
-                    # This is where the transposing happens
-                    for line in bin_tmp_seq:
-                        seqout += line[s]
-
-                    # Write line of binary SNPs to NEXUS
-                    padding = (len_longest_name + 3 - len(sample_names[s])) * " "
-                    output_nexbin.write(sample_names[s]+padding+seqout+"\n")
-
-                    # Print current progress
-                    print("Sample {:d} of {:d}, '{}', added to the binary matrix.".format(
-                                                           s+1, len(sample_names), sample_names[s]))
-
+    # All the requested formats of a matrix are written from the same transposition
+    writers, bin_writers = open_writers(outfile, args, len(sample_names), snp_accepted,
+                                        snp_biallelic, len_longest_name)
+    write_matrices(writers, bin_writers, outfile, sample_names, order, idx_outgroup, max_memory)
     print()
-    if not args.phylipdisable:
-        print("PHYLIP matrix saved to: " + outfile+".phy")
-        output_phy.close()
-    if args.fasta:
-        print("FASTA matrix saved to: " + outfile+".fasta")
-        output_fas.close()
-    if args.nexus:
-        output_nex.write(";\nEND;\n")
-        print("NEXUS matrix saved to: " + outfile+".nex")
-        output_nex.close()
-    if args.nexusbin:
-        output_nexbin.write(";\nEND;\n")
-        print("BINARY NEXUS matrix saved to: " + outfile+".bin.nex")
-        output_nexbin.close()
+    for writer in writers + bin_writers:
+        print("{} matrix saved to: {}".format(writer.matrix_format, writer.filename))
+
+    # Write one alignment per chromosome from the same temporary matrices
+    if args.split_by:
+        print()
+        if segments:
+            write_partitions(outfile, segments)
+            print("Partitions saved to: {0}.partitions.txt and {0}.partitions.nex".format(outfile))
+        for chrom in dict.fromkeys([seg[0] for seg in segments + bin_segments]):
+            rows = [(start, end) for c, start, end in segments if c == chrom]
+            bin_rows = [(start, end) for c, start, end in bin_segments if c == chrom]
+            chrom_outfile = outfile + "." + re.sub(r"[^\w.-]", "_", chrom)
+            writers, bin_writers = open_writers(
+                chrom_outfile, args, len(sample_names),
+                sum([end - start for start, end in rows]) if rows else None,
+                sum([end - start for start, end in bin_rows]) if bin_rows else None,
+                len_longest_name)
+            write_matrices(writers, bin_writers, outfile, sample_names, order, idx_outgroup,
+                           max_memory, rows, bin_rows, verbose=False)
+            print("Chromosome '{}' matrix(ces) saved to: {}.*".format(chrom, chrom_outfile))
 
     if args.fasta or args.nexus or not args.phylipdisable:
         Path(outfile+".tmp").unlink()
     if args.nexusbin:
         Path(outfile+".bin.tmp").unlink()
+    if Path(checkpoint_file).exists():
+        Path(checkpoint_file).unlink()
 
     print( "\nDone!\n")
 
@@ -0,0 +1,6 @@
+"""Shared genotype I/O helpers for the Faba bean GBS workflow stages."""
+
+from fababean.plink_bed import MISSING, BedFile, read_bim, read_fam, write_subset
+from fababean.views import GenotypeView
+
+__all__ = ["MISSING", "BedFile", "GenotypeView", "read_bim", "read_fam", "write_subset"]
@@ -0,0 +1,182 @@
+"""Write PHYLIP/FASTA/NEXUS alignments straight from a PLINK .bed fileset.
+
+The conventions are those of ``04_PhylogeneticTree/vcf2phylip.py`` applied to
+the VCF that ``plink --recode vcf`` would write (A2 as REF, A1 as ALT,
+``FID_IID`` sample names):
+
+- homozygous genotypes are the allele nucleotide, heterozygous genotypes
+  the IUPAC ambiguity code of both alleles and missing genotypes ``N``;
+- the binary NEXUS matrix holds 0/1/2 copies of the ALT allele and ``?``;
+- sites called in fewer than ``min_samples_locus`` samples and sites with
+  alleles longer than one nucleotide are skipped;
+- matrix headers and name padding are identical, vcf2phylip.py writes its
+  matrices with :class:`MatrixWriter`.
+
+Sequences are built in sample blocks, so memory stays bounded by the block
+size times the number of SNPs.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Sequence
+
+import numpy as np
+
+from fababean.plink_bed import MISSING, BedFile
+
+# IUPAC ambiguity code of each unordered pair of nucleotides
+IUPAC_PAIRS = {
+    "AC": "M", "AG": "R", "AT": "W", "CG": "S", "CT": "Y", "GT": "K",
+}
+NUCLEOTIDES = set("ACGT")
+
+# Size in bytes of the buffers of the output matrices
+WRITE_BUFFER = 8 * 1024 * 1024
+
+# Headers, footers and file suffixes of the output matrices, shared with vcf2phylip.py
+MATRIX_HEADERS = {
+    "PHYLIP": "{ntax:d} {nchar:d}\n",
+    "FASTA": "",
+    "NEXUS": "#NEXUS\n\nBEGIN DATA;\n\tDIMENSIONS NTAX={ntax:d} NCHAR={nchar:d};\n\tFORMAT "
+             "DATATYPE=DNA MISSING=N GAP=- ;\nMATRIX\n",
+    "BINARY NEXUS": "#NEXUS\n\nBEGIN DATA;\n\tDIMENSIONS NTAX={ntax:d} NCHAR={nchar:d};\n\tFORMAT "
+                    "DATATYPE=SNP MISSING=? GAP=- ;\nMATRIX\n",
+}
+MATRIX_FOOTERS = {
+    "PHYLIP": "",
+    "FASTA": "",
+    "NEXUS": ";\nEND;\n",
+    "BINARY NEXUS": ";\nEND;\n",
+}
+MATRIX_SUFFIXES = {
+    "PHYLIP": ".phy",
+    "FASTA": ".fasta",
+    "NEXUS": ".nexus",
+    "BINARY NEXUS": ".bin.nexus",
+}
+
+# Binary NEXUS character of each ALT (A1) allele count, the last entry is for missing genotypes
+BINARY_CHARS = np.frombuffer(b"012?", dtype=np.uint8)
+
+
+def genotype_cell(first: str, second: str) -> str:
+    """Alignment cell of a genotype with the given alleles, as vcf2phylip writes it."""
+    if first == second:
+        return first if first in NUCLEOTIDES else "N"
+    return IUPAC_PAIRS.get("".join(sorted((first, second))), "N")
+
+
+def site_tables(a1: Sequence[str], a2: Sequence[str]) -> np.ndarray:
+    """(snps, 4) table of the cell for 0, 1 and 2 copies of A1 and for a missing genotype."""
+    cells: dict[tuple[str, str], bytes] = {}
+    tables = np.empty((len(a1), 4), dtype=np.uint8)
+    for i, alleles in enumerate(zip(a1, a2)):
+        if alleles not in cells:
+            alt, ref = alleles
+            cells[alleles] = (
+                genotype_cell(ref, ref) + genotype_cell(ref, alt) + genotype_cell(alt, alt) + "N"
+            ).encode()
+        tables[i] = np.frombuffer(cells[alleles], dtype=np.uint8)
+    return tables
+
+
+def plink_vcf_names(bed: BedFile) -> list[str]:
+    """Sample names of the VCF written by ``plink --recode vcf``."""
+    return (bed.fam["fid"] + "_" + bed.fam["iid"]).tolist()
+
+
+@dataclass
+class ExportSummary:
+    sites: int
+    shallow: int
+    mnp: int
+    outputs: list[Path] = field(default_factory=list)
+
+
+class MatrixWriter:
+    """Buffered writer of one output matrix, sequences are given as bytes."""
+
+    def __init__(self, filename: str | Path, matrix_format: str, ntax: int, nchar: int,
+                 len_longest_name: int) -> None:
+        self.filename = filename
+        self.matrix_format = matrix_format
+        self.len_longest_name = len_longest_name
+        self.output = open(filename, "wb", buffering=WRITE_BUFFER)
+        self.output.write(MATRIX_HEADERS[matrix_format].format(ntax=ntax, nchar=nchar).encode())
+
+    def write(self, name: str, seq: bytes) -> None:
+        if self.matrix_format == "FASTA":
+            self.output.write(b"".join([b">", name.encode(), b"\n", seq, b"\n"]))
+        else:
+            # Names are padded to three spaces past the longest one
+            padding = (self.len_longest_name + 3 - len(name)) * " "
+            self.output.write(b"".join([(name + padding).encode(), seq, b"\n"]))
+
+    def close(self) -> None:
+        self.output.write(MATRIX_FOOTERS[self.matrix_format].encode())
+        self.output.close()
+
+
+def select_sites(
+    bed: BedFile, min_samples_locus: int, block_snps: int = 8192
+) -> tuple[np.ndarray, int, int]:
+    """Indices of the SNPs written to the matrices, with the numbers of shallow and MNP sites."""
+    single = (bed.bim["a1"].str.len().to_numpy() == 1) & (bed.bim["a2"].str.len().to_numpy() == 1)
+    called = np.empty(bed.n_snps, dtype=np.int64)
+    for start, block in bed.iter_blocks(block_snps):
+        called[start : start + len(block)] = (block != MISSING).sum(axis=1)
+    deep = called >= min_samples_locus
+    return np.flatnonzero(deep & single), int((~deep).sum()), int((deep & ~single).sum())
+
+
+def export_alignment(
+    bed: BedFile,
+    outfile: str | Path,
+    formats: Sequence[str] = ("PHYLIP",),
+    min_samples_locus: int = 4,
+    outgroup: str | None = None,
+    names: Sequence[str] | None = None,
+    block_samples: int = 256,
+) -> ExportSummary:
+    """Write the requested matrices to ``outfile`` + format suffix and return a summary."""
+    names = list(plink_vcf_names(bed) if names is None else names)
+    sites, shallow, mnp = select_sites(bed, min_samples_locus)
+    tables = site_tables(bed.bim["a1"].to_numpy()[sites], bed.bim["a2"].to_numpy()[sites])
+    site_rows = np.arange(len(sites))[:, None]
+
+    len_longest_name = max((len(name) for name in names), default=0)
+    writers = [
+        MatrixWriter(Path(f"{outfile}{MATRIX_SUFFIXES[fmt]}"), fmt, len(names), len(sites),
+                     len_longest_name)
+        for fmt in formats
+    ]
+
+    def write_samples(start: int, stop: int, skip: int | None = None) -> None:
+        counts = bed.read_samples(start, stop)[sites]
+        codes = np.where(counts == MISSING, 3, counts)
+        nucleotides = tables[site_rows, codes].T
+        binary = BINARY_CHARS[codes].T
+        for offset in range(stop - start):
+            if start + offset == skip:
+                continue
+            seq, bin_seq = nucleotides[offset].tobytes(), binary[offset].tobytes()
+            for writer in writers:
+                writer.write(names[start + offset],
+                             bin_seq if writer.matrix_format == "BINARY NEXUS" else seq)
+
+    # The outgroup is written first on its own, then the samples stream in file order
+    first = names.index(outgroup) if outgroup in names else None
+    if first is not None:
+        write_samples(first, first + 1)
+    for start in range(0, len(names), block_samples):
+        write_samples(start, min(start + block_samples, len(names)), skip=first)
+    for writer in writers:
+        writer.close()
+    return ExportSummary(
+        sites=len(sites),
+        shallow=shallow,
+        mnp=mnp,
+        outputs=[Path(f"{outfile}{MATRIX_SUFFIXES[fmt]}") for fmt in formats],
+    )
@@ -0,0 +1,139 @@
+"""Chromosome/position index over the SNPs of a PLINK .bim file.
+
+The index maps every chromosome to a block of a position-sorted array, with
+the .bim row of each entry, so region, nearest-SNP and window queries are
+binary searches instead of boolean scans of the whole table. It is persisted
+as ``<file>.bim.idx.npz`` next to the .bim and rebuilt when the .bim size or
+modification time changes.
+
+Regions are 1-based and inclusive at both ends, as in
+:meth:`fababean.genotype_store.GenotypeStore.region`; windows are half-open.
+"""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import Sequence
+
+import numpy as np
+import pandas as pd
+
+INDEX_SUFFIX = ".idx.npz"
+
+
+def index_path(bim_path: str | Path) -> Path:
+    bim_path = Path(bim_path)
+    return bim_path.with_name(bim_path.name + INDEX_SUFFIX)
+
+
+def source_stamp(path: Path) -> np.ndarray:
+    stat = path.stat()
+    return np.array([stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+
+
+class BimIndex:
+    """Position-sorted SNPs per chromosome; ``rows`` gives the .bim row of every entry."""
+
+    def __init__(
+        self, chroms: Sequence[str], offsets: np.ndarray, pos: np.ndarray, rows: np.ndarray
+    ) -> None:
+        self.chroms = list(chroms)
+        self.offsets = offsets
+        self.pos = pos
+        self.rows = rows
+        self._spans = {chrom: (int(offsets[i]), int(offsets[i + 1]))
+                       for i, chrom in enumerate(self.chroms)}
+
+    @classmethod
+    def build(
+        cls, chrom: Sequence[str] | np.ndarray, pos: Sequence[int] | np.ndarray
+    ) -> "BimIndex":
+        """Index chromosome and position columns, chromosomes kept in order of appearance."""
+        codes, chroms = pd.factorize(pd.Series(chrom, dtype=str), sort=False)
+        pos = np.asarray(pos, dtype=np.int64)
+        order = np.lexsort((pos, codes))
+        offsets = np.zeros(len(chroms) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(codes, minlength=len(chroms)))
+        return cls(list(chroms), offsets, pos[order], order.astype(np.int64))
+
+    @classmethod
+    def open(cls, bim_path: str | Path) -> "BimIndex":
+        """Load the index persisted next to ``bim_path``, building it if missing or stale."""
+        bim_path = Path(bim_path)
+        cached = index_path(bim_path)
+        stamp = source_stamp(bim_path)
+        if cached.exists():
+            with np.load(cached) as data:
+                if np.array_equal(data["source"], stamp):
+                    return cls(data["chroms"].tolist(), data["offsets"], data["pos"], data["rows"])
+        bim = pd.read_csv(
+            bim_path, sep=r"\s+", header=None, usecols=[0, 3], names=["chrom", "pos"],
+            dtype={"chrom": str, "pos": np.int64},
+        )
+        index = cls.build(bim["chrom"], bim["pos"])
+        try:
+            index.save(cached, stamp)
+        except OSError:
+            # A read-only data directory only costs the rebuild next time
+            pass
+        return index
+
+    def save(self, path: Path, stamp: np.ndarray) -> None:
+        tmp = path.with_name(path.name + ".tmp.npz")
+        np.savez(tmp, chroms=np.array(self.chroms, dtype=str), offsets=self.offsets,
+                 pos=self.pos, rows=self.rows, source=stamp)
+        os.replace(tmp, path)
+
+    @property
+    def n_snps(self) -> int:
+        return len(self.pos)
+
+    def span(self, chrom: str) -> tuple[int, int]:
+        """Range of ``chrom`` in the sorted arrays, empty for an unknown chromosome."""
+        return self._spans.get(str(chrom), (0, 0))
+
+    def count(self, chrom: str) -> int:
+        lo, hi = self.span(chrom)
+        return hi - lo
+
+    def counts(self, chroms: Sequence[str] | None = None) -> pd.Series:
+        """SNPs per chromosome, in index order or in the order of ``chroms`` (0 if absent)."""
+        chroms = self.chroms if chroms is None else [str(chrom) for chrom in chroms]
+        return pd.Series([self.count(chrom) for chrom in chroms], index=chroms, dtype=np.int64)
+
+    def max_pos(self, chrom: str) -> int:
+        """Largest position on ``chrom``, 0 without SNPs."""
+        lo, hi = self.span(chrom)
+        return int(self.pos[hi - 1]) if hi > lo else 0
+
+    def _bounds(self, chrom: str, start: int | None, end: int | None) -> tuple[int, int]:
+        lo, hi = self.span(chrom)
+        pos = self.pos[lo:hi]
+        first = 0 if start is None else int(np.searchsorted(pos, start, side="left"))
+        last = len(pos) if end is None else int(np.searchsorted(pos, end, side="right"))
+        return lo + first, lo + max(first, last)
+
+    def snps_in(self, chrom: str, start: int | None = None, end: int | None = None) -> np.ndarray:
+        """.bim rows of the SNPs of ``chrom`` with ``start <= pos <= end``, by position."""
+        first, last = self._bounds(chrom, start, end)
+        return self.rows[first:last]
+
+    def count_in(self, chrom: str, start: int | None = None, end: int | None = None) -> int:
+        first, last = self._bounds(chrom, start, end)
+        return last - first
+
+    def nearest(self, chrom: str, pos: int) -> int:
+        """.bim row of the SNP of ``chrom`` closest to ``pos`` (the lower one on ties), or -1."""
+        lo, hi = self.span(chrom)
+        if hi == lo:
+            return -1
+        at = lo + int(np.searchsorted(self.pos[lo:hi], pos, side="left"))
+        if at == hi or (at > lo and pos - self.pos[at - 1] <= self.pos[at] - pos):
+            at -= 1
+        return int(self.rows[at])
+
+    def window_counts(self, chrom: str, edges: Sequence[int] | np.ndarray) -> np.ndarray:
+        """SNP counts of ``chrom`` in the windows ``[edges[i], edges[i + 1])``."""
+        lo, hi = self.span(chrom)
+        return np.diff(np.searchsorted(self.pos[lo:hi], np.asarray(edges), side="left"))
@@ -0,0 +1,89 @@
+"""Site-bootstrap support for neighbour-joining trees.
+
+A bootstrap replicate resamples the alignment columns with replacement, which
+only changes how often every distinct column (site pattern) is counted. A
+replicate is therefore a multinomial draw of pattern weights, and its distances
+are the kernel's pair sums over the patterns with those weights
+(:func:`~fababean.distance.pair_sums`), one feature GEMM per sample block with
+nothing held per pattern and pair. The patterns are published in shared memory
+for a process pool whose workers draw weights, build the NJ trees and count
+their splits.
+
+Corrected distances (``jc69``, ``k2p``) are infinite for saturated pairs; a
+replicate with such a pair has no NJ tree and is left out of the support.
+"""
+
+from __future__ import annotations
+
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Sequence
+
+import numpy as np
+
+from fababean.distance import METRICS
+from fababean.shared import SharedArray, allocate, close_block
+from fababean.trees import neighbor_joining, splits
+
+
+def site_patterns(alignment: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Distinct columns of a (samples, sites) alignment and how many sites have each."""
+    patterns, counts = np.unique(alignment, axis=1, return_counts=True)
+    return np.ascontiguousarray(patterns), counts
+
+
+def _replicate_splits(
+    task: tuple[SharedArray, np.ndarray, str, list[str], np.random.SeedSequence, int]
+) -> tuple[Counter, int]:
+    """Worker: split counts of ``replicates`` NJ trees of resampled patterns, and skips."""
+    handle, counts, metric, names, seed, replicates = task
+    patterns = handle.attach()
+    rng = np.random.default_rng(seed)
+    weights = rng.multinomial(counts.sum(), counts / counts.sum(), size=replicates)
+    index = {name: i for i, name in enumerate(names)}
+    found: Counter = Counter()
+    skipped = 0
+    for replicate in weights:
+        # The pool already spreads the replicates over the cores
+        distances = METRICS[metric](patterns, site_weights=replicate, workers=1)
+        if not np.isfinite(distances).all():
+            skipped += 1
+            continue
+        found.update(splits(neighbor_joining(distances, names), index))
+    return found, skipped
+
+
+def bootstrap_splits(
+    alignment: np.ndarray,
+    names: Sequence[str],
+    replicates: int,
+    metric: str = "hamming",
+    workers: int | None = None,
+    seed: int | None = None,
+    batch: int = 16,
+) -> tuple[Counter, int]:
+    """Counts of the splits of ``replicates`` site-bootstrap NJ trees, by split bitmask.
+
+    Also returns the number of replicates that gave a tree; the others had a pair at
+    infinite distance and are skipped.
+    """
+    patterns, counts = site_patterns(alignment)
+    shared, handle, shm = allocate(patterns.shape, np.uint8)
+    try:
+        shared[...] = patterns
+        sizes = [min(batch, replicates - start) for start in range(0, replicates, batch)]
+        seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+        tasks = [(handle, counts, metric, list(names), child, size)
+                 for child, size in zip(seeds, sizes)]
+        found: Counter = Counter()
+        skipped = 0
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            for result, missed in pool.map(_replicate_splits, tasks):
+                found.update(result)
+                skipped += missed
+        return found, replicates - skipped
+    finally:
+        del shared
+        close_block(shm)
+        shm.unlink()
@@ -0,0 +1,260 @@
+"""Pairwise distances between the sequences of an alignment, computed in sample blocks.
+
+An alignment is a (samples, sites) uint8 matrix of ASCII symbols
+(:func:`encode_sequences`). Every distance is built from per-pair sums over
+sites of a symmetric 256 x 256 lookup table indexed by the two symbols, e.g.
+"both sites called" or "called and identical". :func:`pair_sums` evaluates
+such tables without a Python loop over pairs or sites: each table is split
+exactly into two per-symbol feature lookups (:func:`factor_table`), so for a
+block of samples and sites it becomes one matrix product and the work runs in
+BLAS. Blocks of sample pairs are independent and spread over a thread pool
+(NumPy releases the GIL in the products).
+
+Only the symbols present in the alignment get features, so an SNP alignment
+with a handful of nucleotide and ambiguity codes stays cheap.
+
+Kernels (:data:`METRICS`, by command-line name):
+
+- ``hamming``: p-distance skipping ``?`` and ``-`` only, the historical default;
+- ``p``: p-distance that also masks ``N`` and the lowercase partial genotypes
+  of ``vcf2phylip.py``;
+- ``asd``: allele-sharing distance between diploid genotypes, the IUPAC codes
+  of biallelic calls or the 0/1/2 allele counts of ``convert_raw_to_phylip.py``
+  (``A`` vs ``R`` shares one allele of two and is at 0.5);
+- ``jc69`` and ``k2p``: Jukes-Cantor and Kimura 2-parameter corrections over
+  the sites where both sequences have an unambiguous base.
+"""
+
+from __future__ import annotations
+
+import os
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, NamedTuple, Sequence
+
+import numpy as np
+
+# Symbols the original pairwise loops skipped: unknown and gap
+MISSING_SYMBOLS = b"?-"
+
+
+def encode_sequences(sequences: Sequence[str]) -> np.ndarray:
+    """(samples, sites) uint8 matrix of equally long ASCII sequences."""
+    lengths = {len(sequence) for sequence in sequences}
+    if len(lengths) > 1:
+        raise ValueError(f"Sequences of different lengths: {sorted(lengths)}")
+    sites = lengths.pop() if lengths else 0
+    data = "".join(sequences).encode("ascii")
+    return np.frombuffer(data, dtype=np.uint8).reshape(len(sequences), sites)
+
+
+# Also masked by the "p" kernel: no call, and vcf2phylip genotypes with a missing allele
+N_MASKED = b"Nn?-acgtmrwsykvhdb"
+
+BASES = b"ACGT"
+TRANSITIONS = [(b"A", b"G"), (b"C", b"T")]
+
+# Alleles of the diploid genotypes written for biallelic calls
+GENOTYPE_ALLELES = {
+    # vcf2phylip.py: homozygous bases and two-base IUPAC codes
+    "A": ("A", "A"), "C": ("C", "C"), "G": ("G", "G"), "T": ("T", "T"),
+    "M": ("A", "C"), "R": ("A", "G"), "W": ("A", "T"),
+    "S": ("C", "G"), "Y": ("C", "T"), "K": ("G", "T"),
+    # convert_raw_to_phylip.py: copies of the A1 allele
+    "0": ("A2", "A2"), "1": ("A1", "A2"), "2": ("A1", "A1"),
+}
+
+
+def lookup(symbols: bytes) -> np.ndarray:
+    """Boolean lookup of ``symbols`` by byte value."""
+    table = np.zeros(256, dtype=bool)
+    table[np.frombuffer(symbols, dtype=np.uint8)] = True
+    return table
+
+
+def called(missing: bytes = MISSING_SYMBOLS) -> np.ndarray:
+    """Boolean lookup of the symbols that are not ``missing``."""
+    return ~lookup(missing)
+
+
+def identity_table(ok: np.ndarray) -> np.ndarray:
+    """Pair table of identical symbols among ``ok``."""
+    return np.diag(ok).astype(np.float32)
+
+
+def both_table(ok: np.ndarray) -> np.ndarray:
+    """Pair table of sites where both symbols are ``ok``."""
+    return np.outer(ok, ok).astype(np.float32)
+
+
+def transition_table() -> np.ndarray:
+    """Pair table of purine-purine and pyrimidine-pyrimidine differences."""
+    table = np.zeros((256, 256), dtype=np.float32)
+    for first, second in TRANSITIONS:
+        table[ord(first), ord(second)] = table[ord(second), ord(first)] = 1.0
+    return table
+
+
+def sharing_table() -> np.ndarray:
+    """Pair table of the fraction of alleles two diploid genotypes share (1, 0.5 or 0)."""
+    table = np.zeros((256, 256), dtype=np.float32)
+    for first, alleles in GENOTYPE_ALLELES.items():
+        for second, others in GENOTYPE_ALLELES.items():
+            shared = sum((Counter(alleles) & Counter(others)).values())
+            table[ord(first), ord(second)] = shared / 2
+    return table
+
+
+def factor_table(table: np.ndarray, symbols: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """256 x r lookups ``left``, ``right`` with ``table[a, b] == left[a] @ right[b]`` on ``symbols``.
+
+    ``left`` one-hot encodes the group of identical table rows of a symbol and ``right``
+    holds the rows, so the product is exact and r is the number of distinct nonzero rows
+    (1 for "called in both", the number of called symbols for "identical").
+    """
+    reduced = table[np.ix_(symbols, symbols)]
+    rows, group = np.unique(reduced, axis=0, return_inverse=True)
+    keep = rows.any(axis=1)
+    rank = np.cumsum(keep) - 1
+    left = np.zeros((256, int(keep.sum())), dtype=np.float32)
+    right = np.zeros((256, int(keep.sum())), dtype=np.float32)
+    group = group.ravel()
+    called_rows = keep[group]
+    left[symbols[called_rows], rank[group[called_rows]]] = 1.0
+    right[symbols] = rows[keep].T
+    return left, right
+
+
+def pair_sums(
+    alignment: np.ndarray,
+    tables: Sequence[np.ndarray],
+    block_samples: int = 512,
+    block_sites: int = 1024,
+    workers: int | None = None,
+    site_weights: np.ndarray | None = None,
+) -> np.ndarray:
+    """(tables, samples, samples) sums over sites of ``table[symbol_i, symbol_j]``.
+
+    Tables are symmetric 256 x 256 lookups by byte value. Sums are exact for tables
+    of small dyadic fractions (0, 0.5, 1, ...): partial sums are float32 over at most
+    ``block_sites`` sites and are accumulated in float64. ``site_weights`` counts every
+    site that many times, e.g. the site patterns of a bootstrap replicate; integer weights
+    stay exact while each block's weights sum below 2**23.
+    """
+    alignment = np.asarray(alignment, dtype=np.uint8)
+    n, sites = alignment.shape
+    if site_weights is not None:
+        site_weights = np.asarray(site_weights, dtype=np.float32)[:, None]
+    present = np.flatnonzero(np.bincount(alignment.ravel(), minlength=256))
+    factors = [factor_table(np.asarray(table, dtype=np.float32), present) for table in tables]
+
+    out = np.zeros((len(factors), n, n), dtype=np.float64)
+    starts = range(0, n, block_samples)
+    tasks = [(i, j) for i in starts for j in starts if j >= i]
+
+    def run(task: tuple[int, int]) -> None:
+        i, j = task
+        rows = slice(i, min(i + block_samples, n))
+        cols = slice(j, min(j + block_samples, n))
+        sums = np.zeros((len(factors), rows.stop - rows.start, cols.stop - cols.start))
+        for start in range(0, sites, block_sites):
+            span = slice(start, min(start + block_sites, sites))
+            first, second = alignment[rows, span], alignment[cols, span]
+            for t, (left, right) in enumerate(factors):
+                if left.shape[1]:
+                    # (samples, sites * r) feature rows, one GEMM per table and block
+                    features = left[first]
+                    if site_weights is not None:
+                        features = features * site_weights[span]
+                    features = features.reshape(len(first), -1)
+                    weights = right[second].reshape(len(second), -1)
+                    sums[t] += features @ weights.T
+        out[:, rows, cols] = sums
+        out[:, cols, rows] = sums.transpose(0, 2, 1)
+
+    if sites:
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            # list() re-raises the first exception of a block
+            list(pool.map(run, tasks))
+    return out
+
+
+def matched_distance(matches: np.ndarray, sites: np.ndarray) -> np.ndarray:
+    """1 - matches / sites, and 1 where no site is shared (elementwise)."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(sites > 0, 1 - matches / sites, 1.0)
+
+
+def jc69(same: np.ndarray, transitions: np.ndarray, sites: np.ndarray) -> np.ndarray:
+    """Jukes-Cantor distance, ``inf`` for saturated pairs (p >= 0.75) or pairs without sites."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        argument = 1 - 4 * (sites - same) / (3 * sites)
+        return np.where(argument > 0, -0.75 * np.log(argument), np.inf)
+
+
+def k2p(same: np.ndarray, transitions: np.ndarray, sites: np.ndarray) -> np.ndarray:
+    """Kimura 2-parameter distance, ``inf`` for saturated pairs or pairs without sites."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        P = transitions / sites
+        Q = (sites - same - transitions) / sites
+        first, second = 1 - 2 * P - Q, 1 - 2 * Q
+        return np.where(
+            (first > 0) & (second > 0), -0.5 * np.log(first) - 0.25 * np.log(second), np.inf
+        )
+
+
+def matching_tables(missing: bytes = MISSING_SYMBOLS) -> list[np.ndarray]:
+    """Identical called symbols, and sites called in both sequences."""
+    ok = called(missing)
+    return [identity_table(ok), both_table(ok)]
+
+
+def masked_tables() -> list[np.ndarray]:
+    return matching_tables(N_MASKED)
+
+
+def sharing_tables() -> list[np.ndarray]:
+    """Shared allele fraction, and sites genotyped in both samples."""
+    genotyped = lookup("".join(GENOTYPE_ALLELES).encode("ascii"))
+    return [sharing_table(), both_table(genotyped)]
+
+
+def base_tables() -> list[np.ndarray]:
+    """Identical bases, transitions, and sites with unambiguous bases in both sequences."""
+    ok = lookup(BASES)
+    return [identity_table(ok), transition_table(), both_table(ok)]
+
+
+class Kernel(NamedTuple):
+    """Pair tables of a distance and the elementwise function of their sums giving it."""
+
+    tables: Callable[[], list[np.ndarray]]
+    finish: Callable[..., np.ndarray]
+
+    def __call__(
+        self, alignment: np.ndarray, site_weights: np.ndarray | None = None, **blocking: int
+    ) -> np.ndarray:
+        """Square distance matrix of ``alignment``, 0 on the diagonal."""
+        sums = pair_sums(alignment, self.tables(), site_weights=site_weights, **blocking)
+        distances = self.finish(*sums)
+        np.fill_diagonal(distances, 0.0)
+        return distances
+
+
+METRICS: dict[str, Kernel] = {
+    "hamming": Kernel(matching_tables, matched_distance),
+    "p": Kernel(masked_tables, matched_distance),
+    "asd": Kernel(sharing_tables, matched_distance),
+    "jc69": Kernel(base_tables, jc69),
+    "k2p": Kernel(base_tables, k2p),
+}
+
+
+def p_distance(
+    alignment: np.ndarray, missing: bytes = MISSING_SYMBOLS, **blocking: int
+) -> np.ndarray:
+    """Proportion of differing sites over the sites called in both sequences.
+
+    Pairs without a shared called site are at distance 1, the diagonal is 0.
+    """
+    return Kernel(lambda: matching_tables(missing), matched_distance)(alignment, **blocking)
@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""Chunked, compressed on-disk genotype store built once from a VCF.
+
+The store is a directory holding:
+
+- ``meta.json``: samples, chromosome names and the chunk table (row range,
+  chromosome, first/last position and byte ranges of each chunk).
+- ``variants.npz``: per-SNP columns (chromosome code, position, ID, REF,
+  ALT) and summaries (called samples, heterozygotes, ALT allele count,
+  ALT frequency, MAF, missing rate).
+- ``genotypes.bin``: one zlib-compressed block per chunk with the 2-bit
+  genotype codes (four samples per byte, lowest bits first) followed by
+  the missingness bitmap (eight samples per byte).
+
+Genotypes are decoded to int8 ALT allele counts (0, 1, 2) with ``MISSING``
+for missing calls. Only biallelic A/C/G/T SNPs are imported, as in stage 01
+(``plink --snps-only just-acgt``). A chunk never spans two chromosomes, so
+a region query decompresses only the chunks overlapping it.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import zlib
+from pathlib import Path
+from typing import Iterable, Iterator, Sequence
+
+import numpy as np
+import pandas as pd
+
+from fababean.plink_bed import MISSING, pack_codes
+
+STORE_VERSION = 1
+DEFAULT_CHUNK_SNPS = 16384
+NUCLEOTIDES = {"A", "C", "G", "T"}
+
+# 2-bit genotype code of each diploid GT string, anything else is missing (3)
+GT_CODES = {
+    "0/0": 0, "0|0": 0,
+    "0/1": 1, "1/0": 1, "0|1": 1, "1|0": 1,
+    "1/1": 2, "1|1": 2,
+}
+MISSING_CODE = 3
+CODE_VALUES = np.array([0, 1, 2, MISSING], dtype=np.int8)
+
+VARIANT_COLUMNS = [
+    "chrom", "pos", "id", "ref", "alt",
+    "n_called", "n_het", "ac", "af", "maf", "missing_rate",
+]
+
+
+def is_store(path: str | Path) -> bool:
+    return Path(path, "meta.json").is_file()
+
+
+def plink_variant_id(chrom: str, pos: str, ref: str, alt: str) -> str:
+    """ID given by ``--set-missing-var-ids '@:#:$1:$2'`` (alleles in ASCII order)."""
+    first, second = sorted((ref, alt))
+    return f"{chrom}:{pos}:{first}:{second}"
+
+
+def summarize(codes: np.ndarray) -> dict[str, np.ndarray]:
+    """Per-SNP summary columns of an (snps, samples) array of 2-bit codes."""
+    n_samples = codes.shape[1]
+    n_called = (codes != MISSING_CODE).sum(axis=1).astype(np.int32)
+    n_het = (codes == 1).sum(axis=1).astype(np.int32)
+    ac = (np.where(codes == MISSING_CODE, 0, codes)).sum(axis=1).astype(np.int32)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        af = np.where(n_called > 0, ac / (2.0 * n_called), np.nan).astype(np.float32)
+    return {
+        "n_called": n_called,
+        "n_het": n_het,
+        "ac": ac,
+        "af": af,
+        "maf": np.minimum(af, 1 - af),
+        "missing_rate": (1 - n_called / max(n_samples, 1)).astype(np.float32),
+    }
+
+
+def open_text(path: Path):
+    if path.suffix == ".gz":
+        return gzip.open(path, "rt")
+    return path.open("r")
+
+
+def iter_vcf(path: Path) -> Iterator[tuple[list[str], list[str]]]:
+    """Yield the sample names and then ``(fields, gt_strings)`` of every biallelic SNP.
+
+    Malformed records (wrong number of sample columns) are skipped.
+    """
+    num_columns = None
+    with open_text(path) as handle:
+        for line in handle:
+            if line.startswith("##"):
+                continue
+            if line.startswith("#CHROM"):
+                header = line.rstrip("\n").split("\t")
+                num_columns = len(header)
+                yield header[9:], []
+                continue
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) != num_columns:
+                continue
+            if fields[3] not in NUCLEOTIDES or fields[4] not in NUCLEOTIDES:
+                continue
+            if not fields[8].startswith("GT"):
+                continue
+            yield fields[:5], [value.partition(":")[0] for value in fields[9:]]
+
+
+def build_store(
+    vcf_path: str | Path, store_path: str | Path, chunk_snps: int = DEFAULT_CHUNK_SNPS
+) -> "GenotypeStore":
+    """Import the biallelic SNPs of a (gzipped) VCF into a new store directory."""
+    vcf_path, store_path = Path(vcf_path), Path(store_path)
+    store_path.mkdir(parents=True, exist_ok=True)
+
+    records = iter_vcf(vcf_path)
+    header = next(records, None)
+    if header is None or header[1]:
+        raise ValueError(f"{vcf_path} has no '#CHROM' header line")
+    samples = header[0]
+
+    chroms: list[str] = []
+    columns: dict[str, list] = {name: [] for name in VARIANT_COLUMNS}
+    chunks: list[dict] = []
+    pending_fields: list[list[str]] = []
+    pending_codes: list[list[int]] = []
+    offset = 0
+
+    with (store_path / "genotypes.bin").open("wb") as blob:
+
+        def flush() -> None:
+            nonlocal offset
+            if not pending_fields:
+                return
+            codes = np.array(pending_codes, dtype=np.uint8).reshape(-1, len(samples))
+            packed = zlib.compress(pack_codes(codes).tobytes())
+            bitmap = zlib.compress(
+                np.packbits(codes == MISSING_CODE, axis=1, bitorder="little").tobytes()
+            )
+            blob.write(packed)
+            blob.write(bitmap)
+            start = len(columns["pos"])
+            chunks.append({
+                "chrom": pending_fields[0][0],
+                "start": start,
+                "stop": start + len(pending_fields),
+                "first_pos": int(pending_fields[0][1]),
+                "last_pos": int(pending_fields[-1][1]),
+                "offset": offset,
+                "genotype_bytes": len(packed),
+                "bitmap_bytes": len(bitmap),
+            })
+            offset += len(packed) + len(bitmap)
+            for name, values in summarize(codes).items():
+                columns[name].append(values)
+            for chrom, pos, vid, ref, alt in pending_fields:
+                columns["chrom"].append(len(chroms) - 1)
+                columns["pos"].append(int(pos))
+                columns["id"].append(vid if vid != "." else plink_variant_id(chrom, pos, ref, alt))
+                columns["ref"].append(ref)
+                columns["alt"].append(alt)
+            pending_fields.clear()
+            pending_codes.clear()
+
+        last_pos = 0
+        for fields, gts in records:
+            pos = int(fields[1])
+            if not chroms or fields[0] != chroms[-1]:
+                flush()
+                if fields[0] in chroms:
+                    raise ValueError(f"{vcf_path} is not sorted: '{fields[0]}' appears twice")
+                chroms.append(fields[0])
+            else:
+                # region() binary-searches the positions of a chromosome
+                if pos < last_pos:
+                    raise ValueError(
+                        f"{vcf_path} is not sorted: {fields[0]}:{pos} follows position {last_pos}"
+                    )
+                if len(pending_fields) == chunk_snps:
+                    flush()
+            last_pos = pos
+            pending_fields.append(fields)
+            pending_codes.append([GT_CODES.get(gt, MISSING_CODE) for gt in gts])
+        flush()
+
+    arrays = {
+        "chrom": np.asarray(columns["chrom"], dtype=np.int32),
+        "pos": np.asarray(columns["pos"], dtype=np.int64),
+        "id": np.asarray(columns["id"], dtype=str),
+        "ref": np.asarray(columns["ref"], dtype="<U1"),
+        "alt": np.asarray(columns["alt"], dtype="<U1"),
+    }
+    for name in VARIANT_COLUMNS[5:]:
+        parts = columns[name]
+        arrays[name] = np.concatenate(parts) if parts else np.zeros(0)
+    np.savez_compressed(store_path / "variants.npz", **arrays)
+
+    meta = {
+        "version": STORE_VERSION,
+        "source": str(vcf_path),
+        "samples": samples,
+        "chroms": chroms,
+        "n_snps": len(arrays["pos"]),
+        "chunks": chunks,
+    }
+    (store_path / "meta.json").write_text(json.dumps(meta, indent=1), encoding="utf-8")
+    return GenotypeStore(store_path)
+
+
+class GenotypeStore:
+    """Random access to a store written by :func:`build_store`."""
+
+    def __init__(self, path: str | Path, cache_chunks: int = 4) -> None:
+        self.path = Path(path)
+        meta = json.loads((self.path / "meta.json").read_text(encoding="utf-8"))
+        if meta.get("version") != STORE_VERSION:
+            raise ValueError(f"{self.path} has unsupported store version {meta.get('version')}")
+        self.samples: list[str] = meta["samples"]
+        self.chroms: list[str] = meta["chroms"]
+        self.chunks: list[dict] = meta["chunks"]
+        self.n_snps: int = meta["n_snps"]
+        self.n_samples = len(self.samples)
+        with np.load(self.path / "variants.npz") as data:
+            self._columns = {name: data[name] for name in VARIANT_COLUMNS}
+        self._chunk_starts = np.array([chunk["start"] for chunk in self.chunks], dtype=np.int64)
+        self._sample_index = {name: i for i, name in enumerate(self.samples)}
+        self._cache: dict[int, tuple[np.ndarray, np.ndarray]] = {}
+        self._cache_chunks = cache_chunks
+
+    @property
+    def pos(self) -> np.ndarray:
+        return self._columns["pos"]
+
+    def variants(self, rows: slice | Sequence[int] | np.ndarray = slice(None)) -> pd.DataFrame:
+        """Per-SNP columns and summaries as a DataFrame (chromosome as a categorical)."""
+        frame = pd.DataFrame({name: self._columns[name][rows] for name in VARIANT_COLUMNS})
+        frame["chrom"] = pd.Categorical.from_codes(frame["chrom"], categories=self.chroms)
+        return frame
+
+    def sample_indices(self, samples: Iterable[str]) -> np.ndarray:
+        return np.array([self._sample_index[name] for name in samples], dtype=np.int64)
+
+    def chrom_rows(self, chrom: str) -> slice:
+        code = self.chroms.index(chrom)
+        codes = self._columns["chrom"]
+        return slice(
+            int(np.searchsorted(codes, code, side="left")),
+            int(np.searchsorted(codes, code, side="right")),
+        )
+
+    def region(self, chrom: str, start: int | None = None, end: int | None = None) -> slice:
+        """Rows of the SNPs of ``chrom`` with ``start <= pos <= end`` (1-based, inclusive)."""
+        rows = self.chrom_rows(chrom)
+        pos = self.pos[rows]
+        lo = 0 if start is None else int(np.searchsorted(pos, start, side="left"))
+        hi = len(pos) if end is None else int(np.searchsorted(pos, end, side="right"))
+        return slice(rows.start + lo, rows.start + hi)
+
+    def _chunk(self, index: int) -> tuple[np.ndarray, np.ndarray]:
+        """Packed genotypes and missingness bitmap of a chunk, with a small LRU cache."""
+        if index in self._cache:
+            self._cache[index] = self._cache.pop(index)
+            return self._cache[index]
+        chunk = self.chunks[index]
+        n_rows = chunk["stop"] - chunk["start"]
+        with (self.path / "genotypes.bin").open("rb") as blob:
+            blob.seek(chunk["offset"])
+            packed = zlib.decompress(blob.read(chunk["genotype_bytes"]))
+            bitmap = zlib.decompress(blob.read(chunk["bitmap_bytes"]))
+        result = (
+            np.frombuffer(packed, dtype=np.uint8).reshape(n_rows, -1),
+            np.frombuffer(bitmap, dtype=np.uint8).reshape(n_rows, -1),
+        )
+        self._cache[index] = result
+        while len(self._cache) > self._cache_chunks:
+            self._cache.pop(next(iter(self._cache)))
+        return result
+
+    def _chunk_spans(self, start: int, stop: int) -> Iterator[tuple[int, slice]]:
+        """Chunks overlapping rows ``[start, stop)`` with the local row range of each."""
+        first = max(int(np.searchsorted(self._chunk_starts, start, side="right")) - 1, 0)
+        for index in range(first, len(self.chunks)):
+            chunk = self.chunks[index]
+            if chunk["start"] >= stop:
+                break
+            lo = max(start, chunk["start"]) - chunk["start"]
+            hi = min(stop, chunk["stop"]) - chunk["start"]
+            yield index, slice(lo, hi)
+
+    def _decode(
+        self, index: int, local_rows: slice | np.ndarray, columns: np.ndarray
+    ) -> np.ndarray:
+        """Decode the selected rows and sample columns of a chunk."""
+        packed = self._chunk(index)[0][local_rows]
+        shifts = (2 * (columns % 4)).astype(np.uint8)
+        return CODE_VALUES[(packed[:, columns // 4] >> shifts) & 3]
+
+    def _columns_of(self, samples: Sequence[int] | np.ndarray | None) -> np.ndarray:
+        return np.arange(self.n_samples) if samples is None else np.asarray(samples, dtype=np.int64)
+
+    def read(
+        self,
+        rows: slice = slice(None),
+        samples: Sequence[int] | np.ndarray | None = None,
+    ) -> np.ndarray:
+        """Decode a row range into an int8 (snps, samples) array of ALT allele counts."""
+        start, stop, _ = rows.indices(self.n_snps)
+        columns = self._columns_of(samples)
+        blocks = [
+            self._decode(index, local, columns)
+            for index, local in self._chunk_spans(start, stop)
+        ]
+        if not blocks:
+            return np.zeros((0, len(columns)), dtype=np.int8)
+        return np.concatenate(blocks)
+
+    def take(
+        self,
+        rows: Sequence[int] | np.ndarray,
+        samples: Sequence[int] | np.ndarray | None = None,
+    ) -> np.ndarray:
+        """Decode an arbitrary selection of rows (indices in any order, or a boolean mask)."""
+        rows = np.asarray(rows)
+        if rows.dtype == bool:
+            rows = np.flatnonzero(rows)
+        rows = rows.astype(np.int64)
+        columns = self._columns_of(samples)
+        result = np.empty((len(rows), len(columns)), dtype=np.int8)
+        chunk_of = np.searchsorted(self._chunk_starts, rows, side="right") - 1
+        # Decompress each touched chunk once
+        for index in np.unique(chunk_of):
+            members = np.flatnonzero(chunk_of == index)
+            local = rows[members] - self.chunks[index]["start"]
+            result[members] = self._decode(int(index), local, columns)
+        return result
+
+    def missing(
+        self,
+        rows: slice = slice(None),
+        samples: Sequence[int] | np.ndarray | None = None,
+    ) -> np.ndarray:
+        """Boolean (snps, samples) missingness from the bitmap, without decoding genotypes."""
+        start, stop, _ = rows.indices(self.n_snps)
+        columns = self._columns_of(samples)
+        blocks = [
+            np.unpackbits(
+                self._chunk(index)[1][local], axis=1, count=self.n_samples, bitorder="little"
+            )[:, columns].astype(bool)
+            for index, local in self._chunk_spans(start, stop)
+        ]
+        if not blocks:
+            return np.zeros((0, len(columns)), dtype=bool)
+        return np.concatenate(blocks)
+
+    def query(
+        self,
+        chrom: str,
+        start: int | None = None,
+        end: int | None = None,
+        samples: Iterable[str] | None = None,
+    ) -> tuple[pd.DataFrame, np.ndarray]:
+        """Variants and genotypes of a region, optionally restricted to named samples."""
+        rows = self.region(chrom, start, end)
+        columns = None if samples is None else self.sample_indices(samples)
+        return self.variants(rows), self.read(rows, columns)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Build a genotype store from a VCF.")
+    parser.add_argument("--vcf", required=True, type=Path)
+    parser.add_argument("--out", required=True, type=Path)
+    parser.add_argument("--chunk-snps", type=int, default=DEFAULT_CHUNK_SNPS)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    store = build_store(args.vcf, args.out, args.chunk_snps)
+    print(
+        f"Stored {store.n_snps} SNPs x {store.n_samples} samples in "
+        f"{len(store.chunks)} chunks: {args.vcf} -> {args.out}"
+    )
+
+
+if __name__ == "__main__":
+    main()
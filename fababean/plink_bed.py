@@ -0,0 +1,237 @@
+"""Memory-mapped reader and subset writer for PLINK 1 binary filesets (.bed/.bim/.fam).
+
+Genotypes are decoded from the SNP-major 2-bit packed layout into int8 counts
+of the A1 allele (0, 1 or 2, as in ``plink --recode A``) with ``MISSING`` for
+missing calls. Only the packed rows or byte columns needed for a block are
+touched, the file itself is never read into memory as a whole.
+
+:func:`write_subset` writes a SNP and/or sample subset of a fileset like
+``plink --extract/--keep --make-bed``, copying packed rows unchanged whenever
+the sample selection allows it.
+"""
+
+from __future__ import annotations
+
+import mmap
+from pathlib import Path
+from typing import Iterable, Iterator, Sequence
+
+import numpy as np
+import pandas as pd
+
+BED_MAGIC = b"\x6c\x1b\x01"
+MISSING = -9
+
+BIM_COLUMNS = ["chrom", "snp", "cm", "pos", "a1", "a2"]
+FAM_COLUMNS = ["fid", "iid", "father", "mother", "sex", "phenotype"]
+
+# A1 allele count of each 2-bit code: 00 hom A1, 01 missing, 10 het, 11 hom A2
+CODE_VALUES = np.array([2, MISSING, 1, 0], dtype=np.int8)
+
+# Genotypes of the four samples packed in each possible byte, lowest bits first
+DECODE = CODE_VALUES[(np.arange(256)[:, None] >> np.arange(0, 8, 2)) & 3]
+
+
+def bed_prefix(path: str | Path) -> Path:
+    """Strip a .bed/.bim/.fam suffix so both prefixes and file names are accepted."""
+    path = str(path)
+    if path.endswith((".bed", ".bim", ".fam")):
+        return Path(path[:-4])
+    return Path(path)
+
+
+def fileset_path(prefix: str | Path, suffix: str) -> Path:
+    """Member file of a fileset, appending the suffix so dotted prefixes stay intact."""
+    return Path(f"{prefix}{suffix}")
+
+
+def read_bim(path: str | Path) -> pd.DataFrame:
+    return pd.read_csv(
+        path,
+        sep=r"\s+",
+        header=None,
+        names=BIM_COLUMNS,
+        dtype={"chrom": str, "snp": str, "cm": float, "pos": np.int64, "a1": str, "a2": str},
+    )
+
+
+def read_fam(path: str | Path) -> pd.DataFrame:
+    return pd.read_csv(
+        path,
+        sep=r"\s+",
+        header=None,
+        names=FAM_COLUMNS,
+        dtype={"fid": str, "iid": str, "father": str, "mother": str},
+    )
+
+
+def decode(packed: np.ndarray, n_samples: int) -> np.ndarray:
+    """Decode packed SNP rows of shape (snps, bytes) into an int8 (snps, n_samples) array."""
+    return DECODE[packed].reshape(packed.shape[0], -1)[:, :n_samples]
+
+
+class BedFile:
+    """Read-only view of a SNP-major PLINK fileset backed by a memory map of the .bed file."""
+
+    def __init__(self, prefix: str | Path) -> None:
+        self.prefix = bed_prefix(prefix)
+        self.bim = read_bim(fileset_path(self.prefix, ".bim"))
+        self.fam = read_fam(fileset_path(self.prefix, ".fam"))
+        self.n_snps = len(self.bim)
+        self.n_samples = len(self.fam)
+        self.bytes_per_snp = (self.n_samples + 3) // 4
+
+        bed_path = fileset_path(self.prefix, ".bed")
+        expected = len(BED_MAGIC) + self.n_snps * self.bytes_per_snp
+        with bed_path.open("rb") as handle:
+            if handle.read(len(BED_MAGIC)) != BED_MAGIC:
+                raise ValueError(f"{bed_path} is not a SNP-major PLINK 1 .bed file")
+            size = handle.seek(0, 2)
+            if size != expected:
+                raise ValueError(
+                    f"{bed_path} has {size} bytes, expected {expected} for "
+                    f"{self.n_snps} SNPs x {self.n_samples} samples"
+                )
+            self._mmap = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        self.packed = np.frombuffer(
+            self._mmap, dtype=np.uint8, count=expected - len(BED_MAGIC), offset=len(BED_MAGIC)
+        ).reshape(self.n_snps, self.bytes_per_snp)
+
+    def __enter__(self) -> "BedFile":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        # Arrays still viewing the map keep it alive, drop ours and let mmap raise if exported
+        self.packed = None
+        try:
+            self._mmap.close()
+        except BufferError:
+            pass
+
+    @property
+    def samples(self) -> list[str]:
+        return self.fam["iid"].tolist()
+
+    @property
+    def snp_ids(self) -> list[str]:
+        return self.bim["snp"].tolist()
+
+    def read_snps(self, start: int = 0, stop: int | None = None) -> np.ndarray:
+        """Decode a contiguous SNP range into an int8 (snps, samples) array."""
+        return decode(self.packed[start:stop], self.n_samples)
+
+    def read_samples(self, start: int = 0, stop: int | None = None) -> np.ndarray:
+        """Decode a contiguous sample range for every SNP into an int8 (snps, samples) array.
+
+        Only the byte columns holding the requested samples are decoded.
+        """
+        start, stop, _ = slice(start, stop).indices(self.n_samples)
+        first = start // 4
+        last = (stop + 3) // 4
+        block = DECODE[self.packed[:, first:last]].reshape(self.n_snps, -1)
+        return block[:, start - 4 * first : stop - 4 * first]
+
+    def take(self, snps: Sequence[int] | np.ndarray) -> np.ndarray:
+        """Decode an arbitrary selection of SNP rows (indices or boolean mask)."""
+        return decode(self.packed[np.asarray(snps)], self.n_samples)
+
+    def iter_blocks(self, block_snps: int = 8192) -> Iterator[tuple[int, np.ndarray]]:
+        """Yield ``(first_snp, genotypes)`` blocks of at most ``block_snps`` SNPs."""
+        for start in range(0, self.n_snps, block_snps):
+            yield start, self.read_snps(start, start + block_snps)
+
+    def sample_matrix(self, snps: Sequence[int] | np.ndarray | None = None) -> np.ndarray:
+        """Samples x SNPs int8 matrix, the orientation of a ``plink --recode A`` table."""
+        genotypes = self.read_snps() if snps is None else self.take(snps)
+        return np.ascontiguousarray(genotypes.T)
+
+    def snp_indices(self, snp_ids: Iterable[str]) -> np.ndarray:
+        """Indices of the listed SNP IDs in file order, as ``plink --extract`` keeps them."""
+        return np.flatnonzero(self.bim["snp"].isin(set(snp_ids)).to_numpy())
+
+    def sample_indices(self, sample_ids: Iterable[tuple[str, str]]) -> np.ndarray:
+        """Indices of the listed (FID, IID) pairs in file order, as ``plink --keep`` keeps them."""
+        keep = set(map(tuple, sample_ids))
+        pairs = zip(self.fam["fid"], self.fam["iid"])
+        return np.array([i for i, pair in enumerate(pairs) if pair in keep], dtype=np.int64)
+
+    def packed_samples(
+        self, samples: Sequence[int] | np.ndarray, snps: slice | np.ndarray
+    ) -> np.ndarray:
+        """Packed rows of the selected SNPs restricted to the selected samples.
+
+        A contiguous selection starting on a byte boundary is a plain byte slice of each row,
+        other selections are re-packed from the 2-bit codes without decoding genotypes.
+        """
+        samples = np.asarray(samples, dtype=np.int64)
+        rows = self.packed[snps]
+        if len(samples) and samples[0] % 4 == 0 and np.array_equal(
+            samples, np.arange(samples[0], samples[0] + len(samples))
+        ):
+            first = samples[0] // 4
+            block = rows[:, first : first + (len(samples) + 3) // 4].copy()
+            if len(samples) % 4:
+                # Clear the bits of the samples after the selection in the last byte
+                block[:, -1] &= (1 << 2 * (len(samples) % 4)) - 1
+            return block
+        codes = (rows[:, samples // 4] >> (2 * (samples % 4)).astype(np.uint8)) & 3
+        return pack_codes(codes)
+
+
+def pack_codes(codes: np.ndarray) -> np.ndarray:
+    """Pack an (snps, samples) array of 2-bit codes four samples per byte, lowest bits first."""
+    n_snps, n_samples = codes.shape
+    padded = np.zeros((n_snps, 4 * ((n_samples + 3) // 4)), dtype=np.uint8)
+    padded[:, :n_samples] = codes
+    quads = padded.reshape(n_snps, -1, 4)
+    return quads[..., 0] | quads[..., 1] << 2 | quads[..., 2] << 4 | quads[..., 3] << 6
+
+
+def copy_lines(source: Path, target: Path, indices: np.ndarray | None) -> None:
+    """Copy the selected lines of a .bim or .fam file unchanged."""
+    with source.open("r", encoding="utf-8") as handle:
+        lines = [line for line in handle if line.strip()]
+    if indices is not None:
+        lines = [lines[i] for i in indices]
+    with target.open("w", encoding="utf-8") as handle:
+        handle.writelines(line if line.endswith("\n") else line + "\n" for line in lines)
+
+
+def write_subset(
+    bed: BedFile,
+    out_prefix: str | Path,
+    snps: Sequence[int] | np.ndarray | None = None,
+    samples: Sequence[int] | np.ndarray | None = None,
+    block_snps: int = 65536,
+) -> tuple[int, int]:
+    """Write the selected SNPs and samples (indices in file order) as a new fileset.
+
+    With every sample kept the packed SNP rows are copied byte for byte. Returns the numbers of
+    SNPs and samples written.
+    """
+    out_prefix = bed_prefix(out_prefix)
+    snps = np.arange(bed.n_snps) if snps is None else np.asarray(snps, dtype=np.int64)
+    keep_all_samples = samples is None or (
+        len(samples) == bed.n_samples and np.array_equal(samples, np.arange(bed.n_samples))
+    )
+    n_samples = bed.n_samples if keep_all_samples else len(samples)
+
+    out_prefix.parent.mkdir(parents=True, exist_ok=True)
+    with fileset_path(out_prefix, ".bed").open("wb") as handle:
+        handle.write(BED_MAGIC)
+        for start in range(0, len(snps), block_snps):
+            rows = snps[start : start + block_snps]
+            if keep_all_samples:
+                handle.write(bed.packed[rows].tobytes())
+            else:
+                handle.write(bed.packed_samples(samples, rows).tobytes())
+    copy_lines(fileset_path(bed.prefix, ".bim"), fileset_path(out_prefix, ".bim"), snps)
+    copy_lines(
+        fileset_path(bed.prefix, ".fam"),
+        fileset_path(out_prefix, ".fam"),
+        None if keep_all_samples else np.asarray(samples),
+    )
+    return len(snps), n_samples
@@ -0,0 +1,144 @@
+"""Sample x sample matrices written by PLINK 1.9 and PLINK 2, read straight into NumPy.
+
+Supported outputs:
+
+- ``--make-king triangle``/``square`` (``.king`` with ``.king.id``),
+- ``--distance ... ibs``/``1-ibs``/``allele-ct`` in ``square``, ``square0`` and
+  ``triangle`` shape (``.mibs``, ``.mdist``, ``.dist`` with ``<file>.id``),
+- ``--genome`` pair tables (``.genome``), turned into a square matrix of one column.
+
+The shape of a matrix file is recognized from its number of values, so lower
+triangles with or without diagonal and square files need no option. Values are
+parsed in one pass and placed with ``tril_indices``; the result is a float32
+DataFrame labeled with the sample IIDs, memoized in a ``<file>.f32.npz`` sidecar
+keyed on the size and mtime of the matrix and ID files.
+"""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from fababean.bim_index import source_stamp
+
+SIDECAR_SUFFIX = ".f32.npz"
+
+
+def read_ids(path: str | Path) -> pd.DataFrame:
+    """FID/IID of a .id file, with or without PLINK 2's ``#FID IID``/``#IID`` header."""
+    with open(path, "r", encoding="utf-8") as handle:
+        rows = [line.split() for line in handle if line.strip()]
+    header = rows[0] if rows and rows[0][0].startswith("#") else None
+    if header is not None:
+        rows = rows[1:]
+    if header == ["#IID"] or (header is None and rows and len(rows[0]) == 1):
+        iids = [row[0] for row in rows]
+        return pd.DataFrame({"fid": iids, "iid": iids})
+    return pd.DataFrame({"fid": [row[0] for row in rows], "iid": [row[1] for row in rows]})
+
+
+def read_values(path: str | Path) -> np.ndarray:
+    """Every whitespace-separated value of a text matrix, in file order."""
+    with open(path, "r", encoding="utf-8") as handle:
+        # Parsed in C without building a Python string per value ('nan' included)
+        return np.fromstring(handle.read(), dtype=np.float32, sep=" ")
+
+
+def square_from_values(values: np.ndarray, n: int, diagonal: float = np.nan) -> np.ndarray:
+    """Symmetric (n, n) float32 matrix of a square, square0 or lower-triangle value list.
+
+    ``diagonal`` fills the diagonal of a triangle written without it.
+    """
+    matrix = np.empty((n, n), dtype=np.float32)
+    if len(values) == n * n:
+        matrix[:] = values.reshape(n, n)
+        upper = np.triu_indices(n, k=1)
+        if not matrix[upper].any():
+            # square0: only the lower triangle is filled in
+            matrix[upper] = matrix.T[upper]
+        return matrix
+    if len(values) == n * (n + 1) // 2:
+        lower = np.tril_indices(n)
+    elif len(values) == n * (n - 1) // 2:
+        lower = np.tril_indices(n, k=-1)
+        np.fill_diagonal(matrix, diagonal)
+    else:
+        raise ValueError(f"{len(values)} values do not form a square or triangle of {n} samples")
+    matrix[lower] = values
+    matrix.T[lower] = values
+    return matrix
+
+
+def labeled(matrix: np.ndarray, iids: list[str]) -> pd.DataFrame:
+    return pd.DataFrame(matrix, index=pd.Index(iids, name="IID"), columns=iids)
+
+
+def sidecar_path(path: Path, variant: str = "") -> Path:
+    return path.with_name(path.name + variant + SIDECAR_SUFFIX)
+
+
+def cached(sidecar: Path, sources: list[Path], build) -> pd.DataFrame:
+    """``build()``, memoized in ``sidecar`` and keyed on the stamps of every source."""
+    stamp = np.concatenate([source_stamp(path) for path in sources])
+    if sidecar.exists():
+        with np.load(sidecar) as data:
+            if np.array_equal(data["source"], stamp):
+                return labeled(data["matrix"], data["iids"].tolist())
+    frame = build()
+    try:
+        tmp = sidecar.with_name(sidecar.name + ".tmp.npz")
+        np.savez(tmp, matrix=frame.to_numpy(), iids=np.asarray(frame.index, dtype=str),
+                 source=stamp)
+        os.replace(tmp, sidecar)
+    except OSError:
+        # A read-only data directory only costs the parse next time
+        pass
+    return frame
+
+
+def load_matrix(
+    path: str | Path, id_path: str | Path | None = None, diagonal: float = np.nan
+) -> pd.DataFrame:
+    """Labeled float32 matrix of a PLINK matrix file and its ``<file>.id`` sample list."""
+    path = Path(path)
+    id_path = Path(f"{path}.id") if id_path is None else Path(id_path)
+
+    def build() -> pd.DataFrame:
+        iids = read_ids(id_path)["iid"].tolist()
+        return labeled(square_from_values(read_values(path), len(iids), diagonal), iids)
+
+    variant = "" if np.isnan(diagonal) else f".diag{diagonal:g}"
+    return cached(sidecar_path(path, variant), [path, id_path], build)
+
+
+def load_king(path: str | Path, id_path: str | Path | None = None) -> pd.DataFrame:
+    """KING-robust kinship; a triangle without diagonal gets the self-kinship 0.5."""
+    return load_matrix(path, id_path, diagonal=0.5)
+
+
+def load_genome(path: str | Path, column: str = "PI_HAT", diagonal: float = 1.0) -> pd.DataFrame:
+    """Square matrix of one ``--genome`` column (PI_HAT, DST, Z0, ...), samples in file order.
+
+    Pairs missing from the table (e.g. dropped by ``--min``) are NaN.
+    """
+    path = Path(path)
+
+    def build() -> pd.DataFrame:
+        pairs = pd.read_csv(path, sep=r"\s+", usecols=["IID1", "IID2", column],
+                            dtype={"IID1": str, "IID2": str, column: np.float32})
+        iids = pd.unique(pd.concat([pairs["IID1"], pairs["IID2"]], ignore_index=True))
+        position = pd.Series(np.arange(len(iids)), index=iids)
+        first = position[pairs["IID1"]].to_numpy()
+        second = position[pairs["IID2"]].to_numpy()
+        matrix = np.full((len(iids), len(iids)), np.nan, dtype=np.float32)
+        values = pairs[column].to_numpy()
+        matrix[first, second] = values
+        matrix[second, first] = values
+        np.fill_diagonal(matrix, diagonal)
+        return labeled(matrix, list(iids))
+
+    variant = f".{column}" if diagonal == 1.0 else f".{column}.diag{diagonal:g}"
+    return cached(sidecar_path(path, variant), [path], build)
@@ -0,0 +1,148 @@
+"""Typed readers for PLINK tables with a binary columnar sidecar cache.
+
+The readers give every known column an explicit compact dtype: categorical
+chromosomes and alleles, int32 positions and counts, float64 rates. The
+whitespace-separated text is tokenized once; :func:`load_cached` then keeps the
+parsed columns in ``<file>.cols.npz`` next to the source and reuses them while
+the source size and modification time are unchanged. The sidecar holds plain
+arrays only (strings as fixed-width unicode, categoricals as codes plus
+categories), so loading it needs no pickle.
+"""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+from fababean.bim_index import source_stamp
+
+SIDECAR_SUFFIX = ".cols.npz"
+# Stored with the source stamp, so sidecars of an older layout are rebuilt
+SIDECAR_VERSION = 2
+
+BIM_NAMES = ["chr", "snp_id", "cm", "pos", "a1", "a2"]
+FAM_NAMES = ["fid", "iid", "father", "mother", "sex", "phenotype"]
+
+# Columns of the .imiss, .lmiss and .het reports; anything else is inferred
+REPORT_DTYPES = {
+    "FID": str,
+    "IID": str,
+    "CHR": str,
+    "SNP": str,
+    "MISS_PHENO": str,
+    "N_MISS": np.int32,
+    "N_GENO": np.int32,
+    "F_MISS": np.float64,
+    "O(HOM)": np.int32,
+    "E(HOM)": np.float64,
+    "N(NM)": np.int32,
+    "F": np.float64,
+}
+REPORT_CATEGORIES = ["CHR", "MISS_PHENO"]
+
+
+def read_bim(path: str | Path) -> pd.DataFrame:
+    bim = pd.read_csv(
+        path,
+        sep=r"\s+",
+        header=None,
+        names=BIM_NAMES,
+        dtype={"chr": str, "snp_id": str, "cm": np.float32, "pos": np.int32,
+               "a1": str, "a2": str},
+    )
+    # Sorted categories, so value_counts().sort_index() orders chromosomes by name as before
+    for column in ("chr", "a1", "a2"):
+        bim[column] = bim[column].astype("category")
+    return bim
+
+
+def read_fam(path: str | Path) -> pd.DataFrame:
+    return pd.read_csv(
+        path,
+        sep=r"\s+",
+        header=None,
+        names=FAM_NAMES,
+        dtype={"fid": str, "iid": str, "father": str, "mother": str, "sex": np.int8,
+               "phenotype": str},
+    )
+
+
+def read_report(path: str | Path) -> pd.DataFrame:
+    """Read a whitespace-aligned PLINK report with a header line (.imiss, .lmiss, .het)."""
+    with open(path, "r", encoding="utf-8") as handle:
+        header = handle.readline().split()
+    report = pd.read_csv(
+        path,
+        sep=r"\s+",
+        comment="#",
+        dtype={name: REPORT_DTYPES[name] for name in header if name in REPORT_DTYPES},
+    )
+    for column in REPORT_CATEGORIES:
+        if column in report.columns:
+            report[column] = report[column].astype("category")
+    return report
+
+
+def sidecar_path(path: str | Path) -> Path:
+    path = Path(path)
+    return path.with_name(path.name + SIDECAR_SUFFIX)
+
+
+def save_columns(frame: pd.DataFrame, path: Path, stamp: np.ndarray) -> None:
+    arrays = {"__source__": stamp, "__columns__": np.array(frame.columns, dtype=str)}
+    for i, column in enumerate(frame.columns):
+        values = frame[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            arrays[f"{i}.codes"] = values.cat.codes.to_numpy()
+            arrays[f"{i}.categories"] = np.asarray(values.cat.categories, dtype=str)
+        elif pd.api.types.is_string_dtype(values.dtype):
+            # Missing strings (e.g. an NA IID) would be written as "nan", keep a mask instead
+            null = values.isna().to_numpy()
+            arrays[f"{i}.str"] = np.asarray(values.where(~null, ""), dtype=str)
+            if null.any():
+                arrays[f"{i}.null"] = null
+        else:
+            arrays[f"{i}.values"] = values.to_numpy()
+    tmp = path.with_name(path.name + ".tmp.npz")
+    np.savez(tmp, **arrays)
+    os.replace(tmp, path)
+
+
+def load_columns(data: np.lib.npyio.NpzFile) -> pd.DataFrame:
+    columns = {}
+    for i, column in enumerate(data["__columns__"].tolist()):
+        if f"{i}.codes" in data:
+            columns[column] = pd.Categorical.from_codes(
+                data[f"{i}.codes"], categories=pd.Index(data[f"{i}.categories"]).astype(str)
+            )
+        elif f"{i}.str" in data:
+            # The string dtype read_csv(dtype=str) gives (object before pandas 3)
+            strings = pd.Series(data[f"{i}.str"]).astype(str)
+            if f"{i}.null" in data:
+                strings = strings.mask(data[f"{i}.null"])
+            columns[column] = strings
+        else:
+            columns[column] = data[f"{i}.values"]
+    return pd.DataFrame(columns)
+
+
+def load_cached(path: str | Path, reader: Callable[[str | Path], pd.DataFrame]) -> pd.DataFrame:
+    """``reader(path)``, memoized in a sidecar next to ``path`` keyed on its size and mtime."""
+    path = Path(path)
+    stamp = np.append(source_stamp(path), SIDECAR_VERSION)
+    cached = sidecar_path(path)
+    if cached.exists():
+        with np.load(cached) as data:
+            if np.array_equal(data["__source__"], stamp):
+                return load_columns(data)
+    frame = reader(path)
+    try:
+        save_columns(frame, cached, stamp)
+    except OSError:
+        # A read-only data directory only costs the parse next time
+        pass
+    return frame
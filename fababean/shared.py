@@ -0,0 +1,167 @@
+"""Publish genotype arrays once for every worker process of a multiprocessing pool.
+
+:func:`share_genotypes` copies a genotype matrix (and its missingness mask) into
+POSIX shared memory, or into ``.npy`` files opened as memory maps when a
+directory is given, and returns a :class:`SharedGenotypes` owner. Its
+``handle`` is a small picklable description that tasks send to the workers
+instead of the arrays; :meth:`SharedGenotypesHandle.attach` maps the same pages
+in the worker, once per process. Handles are meant for processes started by
+the owner (they share its resource tracker), the owner alone unlinks the memory::
+
+    with share_genotypes(view) as shared:
+        with ProcessPoolExecutor() as pool:
+            results = pool.map(work, [(shared.handle, block) for block in blocks])
+
+    def work(args):
+        handle, block = args
+        genotypes, missing = handle.attach()
+        ...
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from multiprocessing.shared_memory import SharedMemory
+from pathlib import Path
+
+import numpy as np
+
+from fababean.plink_bed import MISSING
+from fababean.views import GenotypeView
+
+# Arrays attached in this process, by shared memory name or file path
+_ATTACHED: dict[str, tuple[np.ndarray, SharedMemory | None]] = {}
+
+
+@dataclass(frozen=True)
+class SharedArray:
+    """Picklable location of an array in shared memory (``name``) or in a ``.npy`` file."""
+
+    name: str
+    shape: tuple[int, ...]
+    dtype: str
+    path: str | None = None
+
+    def attach(self) -> np.ndarray:
+        """Read-only array over the shared pages, mapped once per process."""
+        key = self.path or self.name
+        if key not in _ATTACHED:
+            if self.path is not None:
+                array = np.load(self.path, mmap_mode="r")
+                _ATTACHED[key] = (array, None)
+            else:
+                # Pool workers share the owner's resource tracker, registering again is a no-op
+                shm = SharedMemory(name=self.name)
+                array = np.ndarray(self.shape, dtype=self.dtype, buffer=shm.buf)
+                array.flags.writeable = False
+                _ATTACHED[key] = (array, shm)
+        return _ATTACHED[key][0]
+
+
+@dataclass(frozen=True)
+class SharedGenotypesHandle:
+    """What workers receive: where the (snps, samples) genotypes and missingness live."""
+
+    genotypes: SharedArray
+    missing: SharedArray
+
+    def attach(self) -> tuple[np.ndarray, np.ndarray]:
+        return self.genotypes.attach(), self.missing.attach()
+
+
+def detach_all() -> None:
+    """Drop the arrays attached in this process, e.g. at the end of a worker."""
+    attached = list(_ATTACHED.values())
+    _ATTACHED.clear()
+    for _, shm in attached:
+        if shm is not None:
+            close_block(shm)
+
+
+def close_block(shm: SharedMemory) -> None:
+    # Arrays still viewing the block keep it mapped, let them go with the process instead
+    try:
+        shm.close()
+    except BufferError:
+        pass
+
+
+def allocate(
+    shape: tuple[int, ...], dtype: type | np.dtype
+) -> tuple[np.ndarray, SharedArray, SharedMemory]:
+    """Writable array over a new shared memory block, its handle, and the block to unlink."""
+    dtype = np.dtype(dtype)
+    shm = SharedMemory(create=True, size=max(int(np.prod(shape)) * dtype.itemsize, 1))
+    array = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    return array, SharedArray(shm.name, tuple(shape), dtype.str), shm
+
+
+class SharedGenotypes:
+    """Owner of published genotype and missingness arrays, released by :meth:`close`."""
+
+    def __init__(self, shape: tuple[int, int], directory: str | Path | None = None) -> None:
+        self._blocks: list[SharedMemory] = []
+        self._files: list[Path] = []
+        self.genotypes, genotypes_ref = self._allocate("genotypes", shape, np.int8, directory)
+        self.missing, missing_ref = self._allocate("missing", shape, np.bool_, directory)
+        self.handle = SharedGenotypesHandle(genotypes_ref, missing_ref)
+
+    def _allocate(
+        self, label: str, shape: tuple[int, int], dtype: type, directory: str | Path | None
+    ) -> tuple[np.ndarray, SharedArray]:
+        dtype = np.dtype(dtype)
+        if directory is not None:
+            path = Path(directory) / f"{label}.npy"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            array = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=shape)
+            self._files.append(path)
+            return array, SharedArray(str(path), shape, dtype.str, path=str(path))
+        array, ref, shm = allocate(shape, dtype)
+        self._blocks.append(shm)
+        return array, ref
+
+    def __enter__(self) -> "SharedGenotypes":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Release the shared memory; ``.npy`` files are flushed and left on disk."""
+        self.genotypes = self.missing = None
+        for shm in self._blocks:
+            _ATTACHED.pop(shm.name, None)
+            close_block(shm)
+            shm.unlink()
+        self._blocks.clear()
+        self._files.clear()
+
+
+def share_genotypes(
+    source: GenotypeView | np.ndarray,
+    missing: np.ndarray | None = None,
+    directory: str | Path | None = None,
+    block_snps: int = 8192,
+) -> SharedGenotypes:
+    """Publish an int8 (snps, samples) genotype matrix and its missingness mask.
+
+    A view is decoded block by block straight into the shared buffer, so the data never
+    exists twice in the parent either. Without ``missing`` the mask is ``genotypes == MISSING``.
+    """
+    shared = SharedGenotypes(source.shape, directory)
+    if isinstance(source, GenotypeView):
+        blocks = source.iter_blocks(block_snps)
+    else:
+        blocks = ((start, source[start : start + block_snps])
+                  for start in range(0, source.shape[0], block_snps))
+    for start, block in blocks:
+        stop = start + len(block)
+        shared.genotypes[start:stop] = block
+        if missing is None:
+            np.equal(block, MISSING, out=shared.missing[start:stop])
+        else:
+            shared.missing[start:stop] = missing[start:stop]
+    if directory is not None:
+        shared.genotypes.flush()
+        shared.missing.flush()
+    return shared
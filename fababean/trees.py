@@ -0,0 +1,409 @@
+"""Neighbour-joining trees and their bipartitions.
+
+Trees are :mod:`Bio.Phylo` trees, so the scripts keep drawing and writing them
+with ``Phylo``. :func:`neighbor_joining` replaces Biopython's pure Python
+``DistanceTreeConstructor.nj``: the closest pair of every join is searched on
+float32 copies of the distances with NumPy, optionally pruned with the RapidNJ
+bound, and decided in float64 the way Biopython does, so the trees and their
+Newick are the same.
+
+A bipartition (split) of an unrooted tree is stored as an int
+bitmask over the sample order, normalized to the side without sample 0, so
+splits of trees built from resampled data compare and count as plain ints.
+
+:func:`root_at_midpoint` and :func:`root_with_outgroup` reroot in O(n) with
+iterative traversals, so deep trees of thousands of tips stay within Python's
+recursion limit.
+"""
+
+from __future__ import annotations
+
+from typing import Iterator, Mapping, Sequence
+
+import numpy as np
+from Bio.Phylo.BaseTree import Clade, Tree
+
+# Relative error bound of float32 Q values; pairs within it of the minimum are compared in float64
+Q_TOLERANCE = 2.0**-20
+
+
+def _margin(best: float, r: np.ndarray) -> float:
+    return Q_TOLERANCE * (abs(float(best)) + 4 * float(np.abs(r).max()))
+
+
+def _candidates(d: np.ndarray, r: np.ndarray, lower: np.ndarray, q: np.ndarray) -> list:
+    """Pairs ``(a, b)``, ``a > b``, whose float32 ``Q = d - r_a - r_b`` is near the minimum."""
+    np.subtract(d, r[:, None], out=q)
+    np.subtract(q, r[None, :], out=q)
+    np.copyto(q, np.inf, where=~lower)
+    best = q.min()
+    rows, cols = np.nonzero(q <= best + _margin(best, r))
+    return list(zip(rows.tolist(), cols.tolist()))
+
+
+class _SortedRows:
+    """RapidNJ search structure: every row of the float32 distances sorted once.
+
+    Distances between existing nodes never change in NJ, so a sorted row stays valid
+    except for entries of slots that died or were reused by a joined node after the
+    row was sorted (``born[k] >= stamp[i]``); a joined node gets a freshly sorted row.
+    Every live pair is thus valid in the row of its younger node.
+    """
+
+    def __init__(self, d: np.ndarray) -> None:
+        self.order = np.argsort(d, axis=1, kind="stable").astype(np.int32)
+        self.values = np.take_along_axis(d, self.order, axis=1)
+        self.born = np.full(len(d), -1)
+        self.stamp = np.zeros(len(d), dtype=int)
+
+    def insert(self, slot: int, row: np.ndarray, step: int) -> None:
+        self.order[slot] = np.argsort(row, kind="stable")
+        self.values[slot] = row[self.order[slot]]
+        self.born[slot] = self.stamp[slot] = step
+
+    def candidates(self, r: np.ndarray, alive: np.ndarray, block: int = 16) -> list:
+        """:func:`_candidates` scanning sorted rows only while their Q can reach the minimum.
+
+        ``Q[i, k] >= d[i, k] - r_i - max r``, so a row is done at the first sorted
+        distance whose bound exceeds the smallest Q found (plus the float32 margin).
+        """
+        top = r[alive].max()
+        rows = np.flatnonzero(alive)
+        best, found = np.inf, []
+        for start in range(0, self.order.shape[1], block):
+            cols = self.order[rows, start : start + block]
+            values = self.values[rows, start : start + block]
+            # Evaluated from the larger index, as in _candidates
+            later = cols < rows[:, None]
+            q = np.where(later, values - r[rows, None] - r[cols], values - r[cols] - r[rows, None])
+            q[~(alive[cols] & (self.born[cols] < self.stamp[rows, None]))] = np.inf
+            best = min(best, q.min())
+            limit = best + _margin(best, r)
+            near, position = np.nonzero(q <= limit)
+            found += zip(rows[near].tolist(), cols[near, position].tolist())
+            if start + block >= self.order.shape[1]:
+                break
+            following = self.values[rows, start + block]
+            rows = rows[np.minimum(following - r[rows] - top, following - top - r[rows]) <= limit]
+            if not len(rows):
+                break
+        return [(max(pair), min(pair)) for pair in found]
+
+
+def _closest_pair(pairs: list, d: np.ndarray, r: np.ndarray) -> tuple[int, int]:
+    """Biopython's pick among ``(a, b)``, ``a > b``: smallest float64 Q, then first in row order."""
+    return min((d[a, b] - r[a] - r[b], a, b) for a, b in pairs)[1:]
+
+
+def _closest_pair_exact(d: np.ndarray, r: np.ndarray, alive: np.ndarray) -> tuple[int, int]:
+    """Biopython's scan over every live pair, used for the last joins.
+
+    With four nodes left, complementary pairs tie in exact arithmetic, so rounding
+    picks the join and no pair is left to the float32 filter.
+    """
+    live = np.flatnonzero(alive).tolist()
+    return _closest_pair([(i, j) for i in live for j in live if j < i], d, r)
+
+
+def _search_copy(d: np.ndarray, alive: np.ndarray) -> np.ndarray:
+    """float32 distances searched for the closest pair, ``inf`` on the diagonal and dead nodes."""
+    single = d.astype(np.float32)
+    np.fill_diagonal(single, np.inf)
+    single[~alive], single[:, ~alive] = np.inf, np.inf
+    return single
+
+
+def neighbor_joining(distances: np.ndarray, names: Sequence[str], bound: bool = True) -> Tree:
+    """Unrooted NJ tree of a square distance matrix (lower triangle read, as Biopython does).
+
+    Joins, tie-breaking, branch lengths, ``InnerN`` names and the final root follow
+    ``Bio.Phylo.TreeConstruction.DistanceTreeConstructor.nj``, so the trees write the
+    same Newick: row sums are recomputed at every join, adding the live distances in
+    Biopython's order. Each Q matrix is one NumPy expression over float32 distances, or
+    with ``bound`` a scan of the sorted rows that stops where no row can beat the best
+    pair. Joined rows are dropped from the matrices once a quarter of them is dead,
+    keeping each step proportional to the remaining nodes.
+    """
+    names = list(names)
+    n = len(names)
+    clades = [Clade(None, name) for name in names]
+    lower_half = np.tril(np.asarray(distances, dtype=np.float64))
+    if lower_half.shape != (n, n):
+        raise ValueError(f"{lower_half.shape} distance matrix for {n} names")
+    if not np.isfinite(lower_half).all():
+        raise ValueError("neighbour-joining needs finite distances")
+    if n == 1:
+        return Tree(clades[0], rooted=False)
+    if n == 2:
+        half = lower_half[1, 0] / 2.0
+        clades[1].branch_length, clades[0].branch_length = half, lower_half[1, 0] - half
+        return Tree(Clade(None, "Inner", clades=[clades[1], clades[0]]), rooted=False)
+
+    # Dead and diagonal entries are 0, so they drop out of the row sums
+    d = lower_half + np.tril(lower_half, -1).T
+    np.fill_diagonal(d, 0.0)
+    alive = np.ones(n, dtype=bool)
+    m, inner = n, None
+    while m > 2:
+        if inner is None or m <= 3 * len(d) // 4:
+            if m < len(d):
+                # Keep the live rows, in their order
+                keep = np.flatnonzero(alive)
+                d, clades = d[np.ix_(keep, keep)], [clades[k] for k in keep]
+                alive = np.ones(m, dtype=bool)
+            single = _search_copy(d, alive)
+            if bound:
+                sorted_rows, single = _SortedRows(single), None
+            else:
+                lower, q = np.tri(m, k=-1, dtype=bool), np.empty((m, m), dtype=np.float32)
+
+        # Biopython sums each row left to right; down the columns of the symmetric
+        # matrix NumPy adds the rows one after the other, in that same order
+        r = d.sum(axis=0) / (m - 2)
+        if m <= 4:
+            a, b = _closest_pair_exact(d, r, alive)
+        elif bound:
+            a, b = _closest_pair(sorted_rows.candidates(r.astype(np.float32), alive), d, r)
+        else:
+            a, b = _closest_pair(_candidates(single, r.astype(np.float32), lower, q), d, r)
+        if [b, a] == np.flatnonzero(alive)[:2].tolist():
+            # Biopython's scan starts from the first two nodes the other way round and
+            # keeps them unless strictly beaten
+            a, b = b, a
+
+        dab = d[a, b]
+        clades[a].branch_length = float(dab + r[a] - r[b]) / 2.0
+        clades[b].branch_length = float(dab) - clades[a].branch_length
+        inner = Clade(None, f"Inner{n - m + 1}", clades=[clades[a], clades[b]])
+        clades[b], clades[a] = inner, None
+
+        # The joined node takes row b
+        alive[a] = False
+        joined = (d[a] + d[b] - dab) / 2.0
+        joined[~alive] = 0.0
+        joined[b] = 0.0
+        d[b], d[:, b] = joined, joined
+        d[a], d[:, a] = 0.0, 0.0
+        m -= 1
+        row = joined.astype(np.float32)
+        row[~alive] = np.inf
+        row[b] = np.inf
+        if bound:
+            sorted_rows.insert(b, row, n - m)
+        else:
+            single[b], single[:, b] = row, row
+            single[a], single[:, a] = np.inf, np.inf
+
+    low, high = np.flatnonzero(alive)
+    first, second, dab = clades[low], clades[high], float(d[high, low])
+    if first is inner:
+        first.branch_length, second.branch_length = 0, dab
+        first.clades.append(second)
+        return Tree(first, rooted=False)
+    first.branch_length, second.branch_length = dab, 0
+    second.clades.append(first)
+    return Tree(second, rooted=False)
+
+
+def clade_splits(tree: Tree, index: Mapping[str, int]) -> Iterator[tuple[Clade, int]]:
+    """``(clade, split)`` for the clades below internal branches (nontrivial splits only).
+
+    ``index`` gives the bit of every tip name. On an unrooted tree drawn from a
+    bifurcating root, both root children yield the same split.
+    """
+    n = len(index)
+    full = (1 << n) - 1
+    masks: dict[int, int] = {}
+    for clade in tree.find_clades(order="postorder"):
+        if clade.is_terminal():
+            masks[id(clade)] = 1 << index[clade.name]
+        else:
+            mask = 0
+            for child in clade.clades:
+                mask |= masks[id(child)]
+            masks[id(clade)] = mask
+    for clade in tree.find_clades():
+        if clade is tree.root or clade.is_terminal():
+            continue
+        mask = masks[id(clade)]
+        if mask & 1:
+            mask ^= full
+        if 1 < bin(mask).count("1") < n - 1:
+            yield clade, mask
+
+
+def splits(tree: Tree, index: Mapping[str, int]) -> set[int]:
+    return {mask for _, mask in clade_splits(tree, index)}
+
+
+def annotate_support(
+    tree: Tree, counts: Mapping[int, int], replicates: int, index: Mapping[str, int]
+) -> Tree:
+    """Set the confidence of every internal clade to the percentage of replicates with its split.
+
+    Internal clade names are cleared, Newick would otherwise write them glued to the support
+    (the root's too, it becomes an internal clade when the tree is rooted).
+    """
+    tree.root.name = None
+    for clade, mask in clade_splits(tree, index):
+        clade.name = None
+        clade.confidence = round(100.0 * counts.get(mask, 0) / replicates, 1)
+    return tree
+
+
+def support_values(tree: Tree) -> list[float]:
+    """Support values of the internal clades that have one."""
+    return [clade.confidence for clade in tree.get_nonterminals()
+            if clade is not tree.root and clade.confidence is not None]
+
+
+def _preorder(root: Clade) -> Iterator[Clade]:
+    stack = [root]
+    while stack:
+        clade = stack.pop()
+        yield clade
+        stack.extend(reversed(clade.clades))
+
+
+def _tips(tree: Tree) -> list[Clade]:
+    return [clade for clade in _preorder(tree.root) if not clade.clades]
+
+
+def _parents(tree: Tree) -> dict[int, Clade]:
+    """Parent of every non-root clade, by ``id(clade)``."""
+    return {id(child): clade for clade in _preorder(tree.root) for child in clade.clades}
+
+
+def _farthest_tip(
+    start: Clade, parents: Mapping[int, Clade]
+) -> tuple[Clade, float, dict[int, Clade]]:
+    """Tip farthest from ``start`` along branch lengths, its distance and the path back.
+
+    The path is given as the previous clade of every clade reached, by ``id(clade)``.
+    """
+    distance, previous = {id(start): 0.0}, {}
+    farthest, longest = start, 0.0
+    stack = [start]
+    while stack:
+        clade = stack.pop()
+        here = distance[id(clade)]
+        if not clade.clades and here > longest:
+            farthest, longest = clade, here
+        parent = parents.get(id(clade))
+        neighbors = [(child, child.branch_length) for child in clade.clades]
+        if parent is not None:
+            neighbors.append((parent, clade.branch_length))
+        for neighbor, length in neighbors:
+            if id(neighbor) not in distance:
+                distance[id(neighbor)] = here + (length or 0.0)
+                previous[id(neighbor)] = clade
+                stack.append(neighbor)
+    return farthest, longest, previous
+
+
+def _reroot(tree: Tree, outgroup: Clade, length: float, parents: Mapping[int, Clade]) -> Tree:
+    """Root ``tree`` on the branch above ``outgroup``, ``length`` from it.
+
+    Clades are rearranged as by ``Bio.Phylo``'s ``root_with_outgroup``: the clades on the
+    path to the old root are reversed and a bifurcating old root is dropped, preserving
+    the total branch length. Support values move with their branches.
+    """
+    path = []
+    clade = outgroup
+    while id(clade) in parents:
+        clade = parents[id(clade)]
+        path.append(clade)
+    old_root = path[-1]
+    above, support = (outgroup.branch_length or 0.0) - length, outgroup.confidence
+    outgroup.branch_length = length
+    new_root = Clade(branch_length=old_root.branch_length, clades=[outgroup])
+    new_parent, child = new_root, outgroup
+    for clade in path[:-1]:
+        del clade.clades[[id(c) for c in clade.clades].index(id(child))]
+        above, clade.branch_length = clade.branch_length or 0.0, above
+        support, clade.confidence = clade.confidence, support
+        new_parent.clades.insert(0, clade)
+        new_parent = child = clade
+    del old_root.clades[[id(c) for c in old_root.clades].index(id(child))]
+    if len(old_root.clades) == 1:
+        ingroup = old_root.clades[0]
+        ingroup.branch_length = (ingroup.branch_length or 0.0) + above
+        if ingroup.confidence is None:
+            ingroup.confidence = support
+        new_parent.clades.insert(0, ingroup)
+    else:
+        old_root.branch_length, old_root.confidence = above, support
+        new_parent.clades.insert(0, old_root)
+    tree.root, tree.rooted = new_root, True
+    return tree
+
+
+def root_at_midpoint(tree: Tree) -> Tree:
+    """Root ``tree`` in place at the midpoint of its longest tip-to-tip path.
+
+    The longest path is found with two farthest-tip traversals: the tip farthest from
+    any tip is an end of it, and the tip farthest from that end is the other.
+    """
+    tips = _tips(tree)
+    if len(tips) < 2:
+        return tree
+    parents = _parents(tree)
+    end, _, _ = _farthest_tip(tips[0], parents)
+    other, longest, previous = _farthest_tip(end, parents)
+    # Walk back from the other end to the branch holding the midpoint
+    remaining, clade = longest / 2, other
+    while True:
+        step = previous[id(clade)]
+        below = parents.get(id(clade)) is step
+        length = ((clade if below else step).branch_length) or 0.0
+        if remaining <= length:
+            if below:
+                return _reroot(tree, clade, remaining, parents)
+            return _reroot(tree, step, length - remaining, parents)
+        remaining -= length
+        clade = step
+
+
+def root_with_outgroup(tree: Tree, outgroup: Sequence[str]) -> Tree:
+    """Root ``tree`` in place at the middle of the branch between the outgroup and the ingroup.
+
+    The outgroup clade is the smallest side of a branch of the unrooted tree holding all
+    ``outgroup`` tips, so an outgroup that is not monophyletic brings in the fewest
+    ingroup tips.
+    """
+    tips = {tip.name: tip for tip in _tips(tree)}
+    outgroup = set(outgroup)
+    missing = sorted(outgroup - set(tips))
+    if missing:
+        raise ValueError(f"Outgroup tips not in the tree: {missing}")
+    ingroup = [tip for name, tip in tips.items() if name not in outgroup]
+    if not outgroup or not ingroup:
+        raise ValueError("Outgroup must be a nonempty proper subset of the tips")
+    _reroot(tree, ingroup[0], 0.0, _parents(tree))
+    parents = _parents(tree)
+
+    # Outgroup tips and all tips below every clade, children before parents
+    below: dict[int, int] = {}
+    size: dict[int, int] = {}
+    for clade in reversed(list(_preorder(tree.root))):
+        if clade.clades:
+            below[id(clade)] = sum(below[id(child)] for child in clade.clades)
+            size[id(clade)] = sum(size[id(child)] for child in clade.clades)
+        else:
+            below[id(clade)], size[id(clade)] = clade.name in outgroup, 1
+    # Common ancestor of the outgroup tips when rooted on an ingroup tip
+    ancestor = tree.root
+    while True:
+        inner = [child for child in ancestor.clades if below[id(child)] == len(outgroup)]
+        if not inner:
+            break
+        ancestor = inner[0]
+    # Cut off the largest part without outgroup tips: the tree above the ancestor, or a
+    # clade hanging inside it when the outgroup is not monophyletic
+    cut, largest = ancestor, len(tips) - size[id(ancestor)]
+    for clade in _preorder(ancestor):
+        if below[id(clade)]:
+            for child in clade.clades:
+                if not below[id(child)] and size[id(child)] > largest:
+                    cut, largest = child, size[id(child)]
+    return _reroot(tree, cut, (cut.branch_length or 0.0) / 2, parents)
@@ -0,0 +1,192 @@
+"""Lazy sample and SNP subset views over a genotype matrix.
+
+A :class:`GenotypeView` holds a source (a :class:`~fababean.plink_bed.BedFile`,
+a :class:`~fababean.genotype_store.GenotypeStore` or an in-memory (snps, samples)
+array) and two index selections into it. Selecting from a view by index,
+boolean mask or ID returns a new view with the composed selection; nothing is
+decoded or copied until :meth:`GenotypeView.materialize` (or a block iterator)
+asks for the genotypes, and then only the selected rows and sample columns are
+touched. Contiguous selections of an array source stay NumPy views.
+"""
+
+from __future__ import annotations
+
+from typing import Hashable, Iterable, Iterator, Mapping, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from fababean.plink_bed import CODE_VALUES, BedFile, decode
+
+Selection = Union[slice, Sequence[int], Sequence[bool], Iterable[str], np.ndarray]
+
+
+def contiguous(index: np.ndarray) -> slice | None:
+    """The equivalent slice of an increasing run of consecutive indices, else None."""
+    if len(index) == 0:
+        return slice(0, 0)
+    first = int(index[0])
+    if int(index[-1]) - first == len(index) - 1 and np.all(np.diff(index) == 1):
+        return slice(first, first + len(index))
+    return None
+
+
+class GenotypeView:
+    """Composable (snps, samples) selection over a genotype source, decoded on demand."""
+
+    def __init__(
+        self,
+        source: object,
+        snps: np.ndarray | None = None,
+        samples: np.ndarray | None = None,
+        snp_ids: Sequence[str] | None = None,
+        sample_ids: Sequence[str] | None = None,
+    ) -> None:
+        self.source = source
+        if isinstance(source, BedFile):
+            self._snp_ids = source.bim["snp"].to_numpy()
+            self._sample_ids = source.fam["iid"].to_numpy()
+            shape = (source.n_snps, source.n_samples)
+        elif isinstance(source, np.ndarray):
+            self._snp_ids = None if snp_ids is None else np.asarray(snp_ids, dtype=object)
+            self._sample_ids = None if sample_ids is None else np.asarray(sample_ids, dtype=object)
+            shape = source.shape
+        else:
+            # GenotypeStore, imported lazily by the caller's choice of source
+            self._snp_ids = source.variants()["id"].to_numpy()
+            self._sample_ids = np.asarray(source.samples, dtype=object)
+            shape = (source.n_snps, source.n_samples)
+        self._source_shape = shape
+        # None selects everything, so a fresh view costs no index arrays at all
+        self._snps = snps
+        self._samples = samples
+
+    def _derive(self, snps: np.ndarray | None, samples: np.ndarray | None) -> "GenotypeView":
+        view = object.__new__(GenotypeView)
+        view.__dict__.update(self.__dict__)
+        view._snps = snps
+        view._samples = samples
+        return view
+
+    @property
+    def snp_index(self) -> np.ndarray:
+        """Source rows of the selected SNPs."""
+        return np.arange(self._source_shape[0]) if self._snps is None else self._snps
+
+    @property
+    def sample_index(self) -> np.ndarray:
+        """Source columns of the selected samples."""
+        return np.arange(self._source_shape[1]) if self._samples is None else self._samples
+
+    @property
+    def n_snps(self) -> int:
+        return self._source_shape[0] if self._snps is None else len(self._snps)
+
+    @property
+    def n_samples(self) -> int:
+        return self._source_shape[1] if self._samples is None else len(self._samples)
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self.n_snps, self.n_samples
+
+    @property
+    def snp_ids(self) -> list[str]:
+        if self._snp_ids is None:
+            raise ValueError("The source of this view has no SNP IDs")
+        return self._snp_ids[self.snp_index].tolist()
+
+    @property
+    def sample_ids(self) -> list[str]:
+        if self._sample_ids is None:
+            raise ValueError("The source of this view has no sample IDs")
+        return self._sample_ids[self.sample_index].tolist()
+
+    @staticmethod
+    def _compose(
+        current: np.ndarray | None, size: int, ids: np.ndarray | None, selection: Selection
+    ) -> np.ndarray:
+        """Source indices of ``selection``, given relative to the ``current`` selection."""
+        base = np.arange(size) if current is None else current
+        if isinstance(selection, slice):
+            return base[selection]
+        if not isinstance(selection, np.ndarray):
+            selection = list(selection)
+            if selection and isinstance(selection[0], str):
+                if ids is None:
+                    raise ValueError("Selection by ID needs a source with IDs")
+                # Keep the view order, as plink --extract/--keep keep the file order
+                return base[pd.Series(ids[base]).isin(set(selection)).to_numpy()]
+            selection = np.asarray(selection)
+        if selection.dtype == bool:
+            if len(selection) != len(base):
+                raise ValueError(f"Mask of length {len(selection)} for {len(base)} entries")
+            return base[selection]
+        if selection.dtype == object or selection.dtype.kind in "US":
+            return GenotypeView._compose(current, size, ids, selection.tolist())
+        return base[selection.astype(np.int64)]
+
+    def snps(self, selection: Selection) -> "GenotypeView":
+        """View of the selected SNPs (view positions, boolean mask, slice or SNP IDs)."""
+        snps = self._compose(self._snps, self._source_shape[0], self._snp_ids, selection)
+        return self._derive(snps, self._samples)
+
+    def samples(self, selection: Selection) -> "GenotypeView":
+        """View of the selected samples (view positions, boolean mask, slice or sample IDs)."""
+        samples = self._compose(self._samples, self._source_shape[1], self._sample_ids, selection)
+        return self._derive(self._snps, samples)
+
+    def groups(
+        self, labels: Mapping[str, Hashable] | pd.Series
+    ) -> dict[Hashable, "GenotypeView"]:
+        """Sample views per group label, ``labels`` maps sample IDs to groups.
+
+        Samples without a label are left out of every group.
+        """
+        labels = pd.Series(labels).reindex(self.sample_ids).reset_index(drop=True)
+        return {
+            label: self._derive(self._snps, self.sample_index[positions])
+            for label, positions in labels.groupby(labels, sort=True).indices.items()
+        }
+
+    def _decode(self, snps: np.ndarray | None) -> np.ndarray:
+        """Genotypes of the selected samples for the given source rows (None for all)."""
+        source = self.source
+        samples = self._samples
+        rows = slice(None) if snps is None else contiguous(snps)
+        columns = slice(None) if samples is None else contiguous(samples)
+        if isinstance(source, np.ndarray):
+            # Basic slicing keeps views of the source, fancy indexing copies only the selection
+            if columns is not None:
+                return source[snps if rows is None else rows, columns]
+            if rows is None:
+                return source[np.ix_(snps, samples)]
+            return source[rows, samples]
+        if isinstance(source, BedFile):
+            packed = source.packed[snps if rows is None else rows]
+            if samples is None:
+                return decode(packed, source.n_samples)
+            shifts = (2 * (samples % 4)).astype(np.uint8)
+            return CODE_VALUES[(packed[:, samples // 4] >> shifts) & 3]
+        if rows is not None:
+            return source.read(rows, samples)
+        return source.take(snps, samples)
+
+    def materialize(self) -> np.ndarray:
+        """Decode the selection into an int8 (snps, samples) array."""
+        return self._decode(self._snps)
+
+    def __array__(self, dtype: object = None, copy: object = None) -> np.ndarray:
+        genotypes = self.materialize()
+        return genotypes if dtype is None else genotypes.astype(dtype)
+
+    def sample_matrix(self) -> np.ndarray:
+        """Contiguous samples x SNPs matrix, the orientation of a ``plink --recode A`` table."""
+        return np.ascontiguousarray(self.materialize().T)
+
+    def iter_blocks(self, block_snps: int = 8192) -> Iterator[tuple[int, np.ndarray]]:
+        """Yield ``(first_snp, genotypes)`` blocks of at most ``block_snps`` selected SNPs."""
+        for start in range(0, self.n_snps, block_snps):
+            stop = min(start + block_snps, self.n_snps)
+            snps = np.arange(start, stop) if self._snps is None else self._snps[start:stop]
+            yield start, self._decode(snps)
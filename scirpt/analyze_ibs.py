@@ -4,30 +4,26 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 from scipy.cluster.hierarchy import linkage, dendrogram
 from scipy.spatial.distance import squareform
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from fababean.plink_matrices import load_matrix
 
 # Set style
 plt.style.use('default')
 plt.rcParams['font.family'] = 'DejaVu Sans'
 
-# Read IBS matrix (lower triangular format)
+# Read IBS matrix, labeled with the sample IDs of the .mibs.id file
 print("Reading IBS matrix...")
-with open('Diversity/IBS/Faba_IBS.mdis.id', 'r') as f:
-    samples = [line.strip().split()[1] for line in f.readlines()]
+ibs = load_matrix('Diversity/IBS/Faba_IBS.mibs')
+samples = ibs.index.tolist()
 
 n_samples = len(samples)
 print(f"Found {n_samples} samples")
 
-# Read the IBS distance matrix
-ibs_matrix = np.loadtxt('Diversity/IBS/Faba_IBS.mibs.id', dtype=float)
-
-# Convert lower triangular to full matrix
-full_matrix = np.zeros((n_samples, n_samples))
-full_matrix[np.triu_indices(n_samples, k=1)] = ibs_matrix
-full_matrix = full_matrix + full_matrix.T  # Make symmetric
-
-# Convert distance to similarity (IBS proportion)
-# PLINK's distance is 1 - IBS proportion, so IBS proportion = 1 - distance
-ibs_similarity = 1 - full_matrix
+# --distance ibs already writes the IBS proportion (1 - distance)
+ibs_similarity = ibs.to_numpy(copy=True)
 
 # Set diagonal to 1 (self-similarity)
 np.fill_diagonal(ibs_similarity, 1.0)
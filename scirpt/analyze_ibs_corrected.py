@@ -4,6 +4,11 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 from scipy.cluster.hierarchy import linkage, dendrogram
 from scipy.spatial.distance import squareform
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from fababean.plink_matrices import load_matrix
 
 # Set style
 plt.style.use('default')
@@ -11,27 +16,14 @@ plt.rcParams['font.family'] = 'DejaVu Sans'
 
 # Read IBS matrix (PLINK .mibs format is already IBS similarity, not distance)
 print("Reading IBS matrix...")
-with open('Diversity/IBS/Faba_IBS.mibs.id', 'r') as f:
-    samples = [line.strip().split()[1] for line in f.readlines()]
+ibs = load_matrix('Diversity/IBS/Faba_IBS.mibs')
+samples = ibs.index.tolist()
 
 n_samples = len(samples)
 print(f"Found {n_samples} samples: {samples}")
 
-# Read the IBS similarity matrix (this is already IBS proportion, not distance)
-ibs_matrix = np.loadtxt('Diversity/IBS/Faba_IBS.mibs', dtype=float)
-
-# The .mibs file is a lower triangular matrix including diagonal
-# Convert to full symmetric matrix
-full_matrix = np.zeros((n_samples, n_samples))
-idx = 0
-for i in range(n_samples):
-    for j in range(i+1):
-        full_matrix[i, j] = ibs_matrix[i, idx]
-        full_matrix[j, i] = ibs_matrix[i, idx]  # Make symmetric
-        idx += 1
-
-# Now we have the full IBS similarity matrix
-ibs_similarity = full_matrix
+# Square or triangle, the loader gives the full symmetric IBS similarity matrix
+ibs_similarity = ibs.to_numpy(copy=True)
 
 print(f"IBS similarity range: {ibs_similarity.min():.4f} - {ibs_similarity.max():.4f}")
 print(f"Mean IBS similarity: {ibs_similarity.mean():.4f}")
@@ -1,8 +1,13 @@
 import matplotlib.pyplot as plt
 import pandas as pd
 import numpy as np
+import sys
+from pathlib import Path
 from matplotlib import rcParams
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from fababean.bim_index import BimIndex
+
 # Set style
 plt.style.use('seaborn-v0_8-whitegrid')
 rcParams['font.family'] = 'DejaVu Sans'
@@ -30,17 +35,9 @@ for bar, value, pct in zip(bars, snps, retention_pct):
              fontweight='bold', fontsize=9)
 
 # Plot 2: Chromosome Distribution with your specific names and order
-import subprocess
-
-# Get chromosome counts
-result = subprocess.run(["cut", "-f1", "03_LD_Prune/Faba_chrOnly_pruned.bim"], 
-                       capture_output=True, text=True)
-chromosomes = result.stdout.strip().split('\n')
-
-# Count SNPs per chromosome
-chrom_counts = {}
-for chrom in chromosomes:
-    chrom_counts[chrom] = chrom_counts.get(chrom, 0) + 1
+# Get chromosome counts from the position index of the BIM file
+index = BimIndex.open("03_LD_Prune/Faba_chrOnly_pruned.bim")
+chrom_counts = index.counts().to_dict()
 
 # Define the specific order you want
 desired_order = ['chr1L', 'chr1S', '2', '3', '4', '5', '6']
@@ -1,8 +1,13 @@
 import matplotlib.pyplot as plt
 import pandas as pd
 import numpy as np
+import sys
+from pathlib import Path
 from matplotlib import rcParams
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from fababean.bim_index import BimIndex
+
 # Set style
 plt.style.use('seaborn-v0_8-whitegrid')
 rcParams['font.family'] = 'DejaVu Sans'
@@ -30,19 +35,12 @@ for bar, value, pct in zip(bars, snps, retention_pct):
              fontweight='bold', fontsize=9)
 
 # Plot 2: Chromosome Distribution (ONLY chr1-chr6)
-import subprocess
-
 # Get chromosome counts for main chromosomes only
-result = subprocess.run(["cut", "-f1", "03_LD_Prune/Faba_chrOnly_pruned.bim"], 
-                       capture_output=True, text=True)
-chromosomes = result.stdout.strip().split('\n')
+index = BimIndex.open("03_LD_Prune/Faba_chrOnly_pruned.bim")
 
 # Filter only chr1-chr6
 main_chromosomes = ['chr1', 'chr2', 'chr3', 'chr4', 'chr5', 'chr6']
-chrom_counts = {}
-for chrom in chromosomes:
-    if chrom in main_chromosomes:
-        chrom_counts[chrom] = chrom_counts.get(chrom, 0) + 1
+chrom_counts = {chrom: index.count(chrom) for chrom in main_chromosomes if index.count(chrom)}
 
 # Sort by chromosome number
 sorted_chroms = sorted(chrom_counts.items(), key=lambda x: int(x[0][3:]))
@@ -1,6 +1,11 @@
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib import rcParams
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from fababean.plink_matrices import load_matrix
 
 # Set style
 plt.style.use('seaborn-v0_8-whitegrid')
@@ -8,8 +13,9 @@ rcParams['font.family'] = 'DejaVu Sans'
 rcParams['font.size'] = 10
 
 # Read data
-samples = [line.strip().split()[1] for line in open('Diversity/IBS/Faba_IBS.mibs.id')]
-ibs_matrix = np.loadtxt('Diversity/IBS/Faba_IBS.mibs')
+ibs = load_matrix('Diversity/IBS/Faba_IBS.mibs')
+samples = ibs.index.tolist()
+ibs_matrix = ibs.to_numpy()
 
 # Create figure
 fig, ax = plt.subplots(figsize=(13, 10))
@@ -4,6 +4,11 @@ from matplotlib import rcParams
 import pandas as pd
 from scipy.cluster.hierarchy import linkage, dendrogram
 from scipy.spatial.distance import squareform
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from fababean.plink_matrices import load_king
 
 # Set style
 plt.style.use('default')
@@ -11,43 +16,16 @@ rcParams['font.family'] = 'DejaVu Sans'
 
 print("=== CORRECTED KINSHIP ANALYSIS ===")
 
-# Read sample IDs - SKIP THE HEADER
-with open('Diversity/Kinship/Faba_Kinship.king.id', 'r') as f:
-    lines = f.readlines()
-    # Skip the first line (header) and take the rest
-    samples = [line.strip().split()[1] for line in lines[1:]]
+# Read kinship matrix; the .king.id header is skipped and a value count that does
+# not match the samples raises instead of silently building a partial matrix
+kinship = load_king('Diversity/Kinship/Faba_Kinship.king')
+samples = kinship.index.tolist()
 
 print(f"Number of actual samples: {len(samples)}")
 print(f"Sample names: {samples}")
 
-# Read kinship file line by line
-kinship_lines = []
-with open('Diversity/Kinship/Faba_Kinship.king', 'r') as f:
-    for line in f:
-        if line.strip():  # Skip empty lines
-            kinship_lines.append([float(x) for x in line.strip().split()])
-
-print(f"Kinship file lines: {len(kinship_lines)}")
-
-# For n samples, we expect n-1 lines in the kinship file (lower triangular without diagonal)
-# So kinship_lines should have len(samples) - 1 lines
-expected_lines = len(samples) - 1
-print(f"Expected kinship lines for {len(samples)} samples: {expected_lines}")
-
-if len(kinship_lines) != expected_lines:
-    print(f"⚠️  WARNING: Expected {expected_lines} lines but got {len(kinship_lines)}")
-    print("Using available data to build matrix...")
-
-# Build the kinship matrix
 n = len(samples)
-kinship_matrix = np.zeros((n, n))
-
-# Fill the lower triangular part (without diagonal)
-for i in range(len(kinship_lines)):
-    for j in range(len(kinship_lines[i])):
-        # i+1 because kinship_lines starts from row 1 (not row 0)
-        kinship_matrix[i+1, j] = kinship_lines[i][j]
-        kinship_matrix[j, i+1] = kinship_lines[i][j]  # Make symmetric
+kinship_matrix = kinship.to_numpy(copy=True)
 
 # Set diagonal to 1 (self-kinship for visualization)
 np.fill_diagonal(kinship_matrix, 1.0)
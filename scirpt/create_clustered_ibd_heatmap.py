@@ -4,21 +4,19 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 from scipy.cluster.hierarchy import linkage, dendrogram
 from scipy.spatial.distance import squareform
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from fababean.plink_matrices import load_genome
 
 # Read IBD data
-df = pd.read_csv("Diversity/IBD/Faba_IBD.genome", sep='\s+')
+pi_hat = load_genome("Diversity/IBD/Faba_IBD.genome", column="PI_HAT", diagonal=1.0)
 
-# Create matrix
-samples = sorted(set(df['IID1']).union(set(df['IID2'])))
+# Create matrix, samples sorted by name
+samples = sorted(pi_hat.index)
 n_samples = len(samples)
-sample_to_idx = {sample: idx for idx, sample in enumerate(samples)}
-
-matrix = np.zeros((n_samples, n_samples))
-for _, row in df.iterrows():
-    i = sample_to_idx[row['IID1']]
-    j = sample_to_idx[row['IID2']]
-    matrix[i, j] = matrix[j, i] = row['PI_HAT']
-np.fill_diagonal(matrix, 1.0)
+matrix = pi_hat.loc[samples, samples].to_numpy()
 
 # Convert to distance matrix (1 - PI_HAT) for clustering
 distance_matrix = 1 - matrix
@@ -3,6 +3,11 @@ import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 from matplotlib import rcParams
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from fababean.plink_matrices import load_genome
 
 # Set style
 plt.style.use('default')
@@ -13,24 +18,15 @@ rcParams['font.size'] = 10
 ibd_file = "Diversity/IBD/Faba_IBD.genome"
 df = pd.read_csv(ibd_file, sep='\s+')
 
+# PI_HAT matrix with self-relatedness 1 on the diagonal
+pi_hat = load_genome(ibd_file, column="PI_HAT", diagonal=1.0)
+
 # Get unique samples and sort them
-samples = sorted(set(df['IID1']).union(set(df['IID2'])))
+samples = sorted(pi_hat.index)
 n_samples = len(samples)
 print(f"Creating IBD heatmap for {n_samples} samples")
 
-# Create relatedness matrix
-relatedness_matrix = np.zeros((n_samples, n_samples))
-sample_to_idx = {sample: idx for idx, sample in enumerate(samples)}
-
-# Fill the matrix with PI_HAT values
-for _, row in df.iterrows():
-    i = sample_to_idx[row['IID1']]
-    j = sample_to_idx[row['IID2']]
-    relatedness_matrix[i, j] = row['PI_HAT']
-    relatedness_matrix[j, i] = row['PI_HAT']
-
-# Set diagonal to 1 (self-relatedness)
-np.fill_diagonal(relatedness_matrix, 1.0)
+relatedness_matrix = pi_hat.loc[samples, samples].to_numpy()
 
 # Create the heatmap
 fig, ax = plt.subplots(figsize=(10, 8))
@@ -2,21 +2,19 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from fababean.plink_matrices import load_genome
 
 # Read IBD data
-df = pd.read_csv("Diversity/IBD/Faba_IBD.genome", sep='\s+')
+pi_hat = load_genome("Diversity/IBD/Faba_IBD.genome", column="PI_HAT", diagonal=1.0)
 
-# Create matrix
-samples = sorted(set(df['IID1']).union(set(df['IID2'])))
+# Create matrix, samples sorted by name
+samples = sorted(pi_hat.index)
 n_samples = len(samples)
-sample_to_idx = {sample: idx for idx, sample in enumerate(samples)}
-
-matrix = np.zeros((n_samples, n_samples))
-for _, row in df.iterrows():
-    i = sample_to_idx[row['IID1']]
-    j = sample_to_idx[row['IID2']]
-    matrix[i, j] = matrix[j, i] = row['PI_HAT']
-np.fill_diagonal(matrix, 1.0)
+matrix = pi_hat.loc[samples, samples].to_numpy()
 
 # Create clean heatmap
 plt.figure(figsize=(12, 10))
@@ -2,35 +2,29 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
+import sys
+from pathlib import Path
 from matplotlib import rcParams
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from fababean.bim_index import BimIndex
+
 # Set style
 plt.style.use('seaborn-v0_8-whitegrid')
 rcParams['font.family'] = 'DejaVu Sans'
 
-# Read the BIM file
+# Position index of the BIM file (built once, kept next to the .bim)
 bim_file = "03_LD_Prune/Faba_chrOnly_pruned.bim"
-df = pd.read_csv(bim_file, sep='\t', header=None, 
-                 names=['chr', 'snp_id', 'cM', 'pos', 'a1', 'a2'])
-
-# Filter only main chromosomes
-main_chromosomes = ['chr1L', 'chr1S', '2', '3', '4', '5', '6']
-df = df[df['chr'].isin(main_chromosomes)]
+index = BimIndex.open(bim_file)
 
-# Define chromosome order for plotting
+# Main chromosomes, in plotting order
 chr_order = ['chr1L', 'chr1S', '2', '3', '4', '5', '6']
 
 # Create 5Mb windows and count SNPs
 window_size = 5000000  # 5Mb in base pairs
 
 # Get chromosome lengths (approximate from max positions)
-chr_lengths = {}
-for chrom in chr_order:
-    chrom_data = df[df['chr'] == chrom]
-    if len(chrom_data) > 0:
-        chr_lengths[chrom] = chrom_data['pos'].max()
-    else:
-        chr_lengths[chrom] = 0
+chr_lengths = {chrom: index.max_pos(chrom) for chrom in chr_order}
 
 print("Chromosome lengths (approximate):")
 for chrom, length in chr_lengths.items():
@@ -43,22 +37,18 @@ for chrom in chr_order:
     if max_pos == 0:
         continue
         
-    # Create windows
+    # Create windows and count the SNPs of each with two binary searches
     windows = list(range(0, max_pos + window_size, window_size))
+    snp_counts = index.window_counts(chrom, windows)
     for i in range(len(windows) - 1):
         start = windows[i]
         end = windows[i + 1]
         
-        # Count SNPs in this window
-        snp_count = len(df[(df['chr'] == chrom) & 
-                          (df['pos'] >= start) & 
-                          (df['pos'] < end)])
-        
         heatmap_data.append({
             'chromosome': chrom,
             'window_start': start,
             'window_end': end,
-            'snp_count': snp_count,
+            'snp_count': int(snp_counts[i]),
             'window_mid': (start + end) / 2,
             'window_id': f"{chrom}_{i}"
         })
@@ -104,7 +94,7 @@ for i in range(len(pivot_df.index)):
                     color='black' if value < np.max(pivot_df.values) * 0.7 else 'white')
 
 # Plot 2: Bar plot of total SNPs per chromosome
-chrom_totals = df['chr'].value_counts().reindex(chr_order)
+chrom_totals = index.counts(chr_order)
 bars = ax2.bar(range(len(chrom_totals)), chrom_totals.values, 
                color=plt.cm.Set3(np.linspace(0, 1, len(chrom_totals))))
 ax2.set_title('Total SNPs per Chromosome', fontsize=14, fontweight='bold')
@@ -1,83 +1,86 @@
 import pandas as pd
 import numpy as np
 import os
+import sys
 import warnings
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 warnings.filterwarnings('ignore')
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from fababean.bim_index import BimIndex
+from fababean.plink_reports import load_cached, read_bim, read_report
+
+# BIM file of each filtering stage, relative to the QC directory
+BIM_FILES = {
+    'raw_bim': 'Faba_chrOnly_raw.bim',
+    'geno05_bim': '02_SNP_Filter/Faba_chrOnly_geno05.bim',
+    'maf05_bim': '02_SNP_Filter/Faba_chrOnly_geno05_maf05.bim',
+    'pruned_bim': '03_LD_Prune/Faba_chrOnly_pruned.bim',
+}
+
+# Every dataset the loader knows: file relative to the QC directory and how to read it
+DATASETS = {
+    'sample_missingness': ('01_SampleMissingness_QC/Faba_chrOnly_raw.imiss',
+                           lambda path: load_cached(path, read_report)),
+    'snp_missingness': ('01_SampleMissingness_QC/Faba_chrOnly_raw.lmiss',
+                        lambda path: load_cached(path, read_report)),
+    'heterozygosity': ('04_Het_QC/Faba_chrOnly_het.het',
+                       lambda path: load_cached(path, read_report)),
+}
+for key, bim_file in BIM_FILES.items():
+    DATASETS[key] = (bim_file, lambda path: load_cached(path, read_bim))
+    DATASETS[f'{key}_index'] = (bim_file, BimIndex.open)
+
 class SNPDataLoader:
+    """SNP QC datasets, each loaded on first use (``loader.pruned_bim``) and cached"""
+    
     def __init__(self, base_path):
         self.base_path = base_path
         self.data = {}
     
-    def load_all_data(self):
-        """Load all SNP data files with proper error handling"""
-        print("Loading SNP data...")
+    def __getattr__(self, name):
+        if name in DATASETS:
+            return self.load(name)
+        raise AttributeError(f"{type(self).__name__!r} has no attribute or dataset {name!r}")
+    
+    def path(self, name):
+        return os.path.join(self.base_path, DATASETS[name][0])
+    
+    def load(self, name):
+        """Load one dataset, reading its file only the first time"""
+        if name not in self.data:
+            self.data[name] = DATASETS[name][1](self.path(name))
+        return self.data[name]
+    
+    def prefetch(self, names=None, max_workers=4):
+        """Load several datasets in parallel threads and return those that loaded"""
+        names = list(DATASETS) if names is None else list(dict.fromkeys(names))
         
-        try:
-            # Load missingness data with proper separator
-            self.data['sample_missingness'] = pd.read_csv(
-                os.path.join(self.base_path, '01_SampleMissingness_QC/Faba_chrOnly_raw.imiss'), 
-                sep='\s+', comment='#'
-            )
-            self.data['snp_missingness'] = pd.read_csv(
-                os.path.join(self.base_path, '01_SampleMissingness_QC/Faba_chrOnly_raw.lmiss'), 
-                sep='\s+', comment='#'
-            )
-            print("✓ Missingness data loaded")
-            
-        except Exception as e:
-            print(f"✗ Error loading missingness data: {e}")
-            # Try alternative loading method
+        def try_load(name):
             try:
-                self.data['sample_missingness'] = pd.read_csv(
-                    os.path.join(self.base_path, '01_SampleMissingness_QC/Faba_chrOnly_raw.imiss'), 
-                    delim_whitespace=True
-                )
-                self.data['snp_missingness'] = pd.read_csv(
-                    os.path.join(self.base_path, '01_SampleMissingness_QC/Faba_chrOnly_raw.lmiss'), 
-                    delim_whitespace=True
-                )
-                print("✓ Missingness data loaded with alternative method")
-            except Exception as e2:
-                print(f"✗ Alternative loading also failed: {e2}")
+                return self.load(name)
+            except Exception as e:
+                return e
         
-        try:
-            # Load heterozygosity data - check the actual column names
-            het_file = os.path.join(self.base_path, '04_Het_QC/Faba_chrOnly_het.het')
-            if os.path.exists(het_file):
-                het_df = pd.read_csv(het_file, sep='\s+', comment='#')
-                print(f"Heterozygosity file columns: {het_df.columns.tolist()}")
-                self.data['heterozygosity'] = het_df
-                print("✓ Heterozygosity data loaded")
-        except Exception as e:
-            print(f"✗ Error loading heterozygosity data: {e}")
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            results = dict(zip(names, pool.map(try_load, names)))
         
-        try:
-            # Load BIM files for SNP counts
-            self.data['raw_bim'] = pd.read_csv(
-                os.path.join(self.base_path, 'Faba_chrOnly_raw.bim'), 
-                sep='\s+', header=None, 
-                names=['chr', 'snp_id', 'cm', 'pos', 'a1', 'a2']
-            )
-            self.data['geno05_bim'] = pd.read_csv(
-                os.path.join(self.base_path, '02_SNP_Filter/Faba_chrOnly_geno05.bim'), 
-                sep='\s+', header=None, 
-                names=['chr', 'snp_id', 'cm', 'pos', 'a1', 'a2']
-            )
-            self.data['maf05_bim'] = pd.read_csv(
-                os.path.join(self.base_path, '02_SNP_Filter/Faba_chrOnly_geno05_maf05.bim'), 
-                sep='\s+', header=None, 
-                names=['chr', 'snp_id', 'cm', 'pos', 'a1', 'a2']
-            )
-            self.data['pruned_bim'] = pd.read_csv(
-                os.path.join(self.base_path, '03_LD_Prune/Faba_chrOnly_pruned.bim'), 
-                sep='\s+', header=None, 
-                names=['chr', 'snp_id', 'cm', 'pos', 'a1', 'a2']
-            )
-            print("✓ BIM files loaded")
-            
-        except Exception as e:
-            print(f"✗ Error loading BIM files: {e}")
+        loaded = {}
+        for name, result in results.items():
+            if isinstance(result, Exception):
+                print(f"✗ Error loading {name}: {result}")
+            else:
+                loaded[name] = result
+        return loaded
+    
+    def load_all_data(self):
+        """Load all SNP data files with proper error handling"""
+        print("Loading SNP data...")
+        self.prefetch()
+        self.data = {name: self.data[name] for name in DATASETS if name in self.data}
+        if 'heterozygosity' in self.data:
+            print(f"Heterozygosity file columns: {self.data['heterozygosity'].columns.tolist()}")
         
         # Print summary of loaded data
         print("\n=== Data Loading Summary ===")
@@ -1,32 +1,22 @@
 import numpy as np
 import matplotlib.pyplot as plt
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from fababean.plink_matrices import load_king
 
 print("=== FINAL SIMPLE KINSHIP ===")
 
-# Read samples (skip header)
-with open('Diversity/Kinship/Faba_Kinship.king.id', 'r') as f:
-    samples = [line.split()[1] for line in f.readlines()[1:]]  # Skip header
+# Read kinship matrix, labeled with the sample IDs of the .king.id file
+kinship = load_king('Diversity/Kinship/Faba_Kinship.king')
+samples = kinship.index.tolist()
 
 print(f"Actual samples: {len(samples)}")
 print(f"Sample list: {samples}")
 
-# Read kinship data
-kinship_data = []
-with open('Diversity/Kinship/Faba_Kinship.king', 'r') as f:
-    for line in f:
-        kinship_data.append([float(x) for x in line.split()])
-
-print(f"Kinship lines: {len(kinship_data)}")
-
-# Build matrix for 21 samples
-n = 21
-matrix = np.zeros((n, n))
-
-# Fill lower triangular (without diagonal)
-for i in range(len(kinship_data)):
-    for j in range(len(kinship_data[i])):
-        matrix[i+1, j] = kinship_data[i][j]
-        matrix[j, i+1] = kinship_data[i][j]  # Symmetric
+n = len(samples)
+matrix = kinship.to_numpy(copy=True)
 
 # Set diagonal to 1
 np.fill_diagonal(matrix, 1.0)
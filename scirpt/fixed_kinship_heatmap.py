@@ -3,6 +3,11 @@ import matplotlib.pyplot as plt
 from matplotlib import rcParams
 import pandas as pd
 from scipy.cluster.hierarchy import linkage, dendrogram
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from fababean.plink_matrices import load_king
 
 # Set style
 plt.style.use('default')
@@ -10,31 +15,15 @@ rcParams['font.family'] = 'DejaVu Sans'
 
 print("Reading kinship matrix...")
 
-# Read sample IDs
-with open('Diversity/Kinship/Faba_Kinship.king.id', 'r') as f:
-    samples = [line.strip().split()[1] for line in f.readlines()]
+# Read kinship matrix, labeled with the sample IDs of the .king.id file
+kinship = load_king('Diversity/Kinship/Faba_Kinship.king')
+samples = kinship.index.tolist()
 
 n_samples = len(samples)
 print(f"Found {n_samples} accessions")
 
-# Read kinship matrix line by line (ragged format)
-kinship_lines = []
-with open('Diversity/Kinship/Faba_Kinship.king', 'r') as f:
-    for line in f:
-        kinship_lines.append([float(x) for x in line.strip().split()])
-
-print(f"Kinship file has {len(kinship_lines)} lines")
-
-# Build the full symmetric matrix
-full_matrix = np.zeros((n_samples, n_samples))
-
-# Fill the lower triangular part
-for i in range(n_samples):
-    for j in range(len(kinship_lines[i])):
-        full_matrix[i, j] = kinship_lines[i][j]
-        full_matrix[j, i] = kinship_lines[i][j]  # Make symmetric
-
-# Note: The diagonal is already included in the KING output
+# A triangle without diagonal gets the self-kinship 0.5
+full_matrix = kinship.to_numpy()
 
 print(f"Kinship range: {full_matrix.min():.4f} - {full_matrix.max():.4f}")
 print(f"Mean kinship: {full_matrix.mean():.4f}")
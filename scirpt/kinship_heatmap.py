@@ -3,6 +3,11 @@ import matplotlib.pyplot as plt
 from matplotlib import rcParams
 import pandas as pd
 from scipy.cluster.hierarchy import linkage, dendrogram
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from fababean.plink_matrices import load_king
 
 # Set style
 plt.style.use('default')
@@ -11,24 +16,14 @@ rcParams['font.family'] = 'DejaVu Sans'
 # Read kinship matrix (lower triangular format)
 print("Reading kinship matrix...")
 
-# Read sample IDs
-with open('Diversity/Kinship/Faba_Kinship.king.id', 'r') as f:
-    samples = [line.strip().split()[1] for line in f.readlines()]
+# Read kinship matrix, labeled with the sample IDs of the .king.id file
+kinship = load_king('Diversity/Kinship/Faba_Kinship.king')
+samples = kinship.index.tolist()
 
 n_samples = len(samples)
 print(f"Found {n_samples} accessions")
 
-# Read kinship matrix (lower triangular)
-kinship_matrix = np.loadtxt('Diversity/Kinship/Faba_Kinship.king', dtype=float)
-
-# Convert lower triangular to full matrix
-full_matrix = np.zeros((n_samples, n_samples))
-idx = 0
-for i in range(n_samples):
-    for j in range(i):
-        full_matrix[i, j] = kinship_matrix[idx]
-        full_matrix[j, i] = kinship_matrix[idx]
-        idx += 1
+full_matrix = kinship.to_numpy(copy=True)
 
 # Set diagonal to 1 (self-kinship)
 np.fill_diagonal(full_matrix, 1.0)
@@ -2,6 +2,11 @@ import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib import rcParams
 import pandas as pd
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from fababean.plink_matrices import load_king, load_matrix
 
 # Set style
 plt.style.use('default')
@@ -10,32 +15,18 @@ rcParams['font.family'] = 'DejaVu Sans'
 def create_simple_side_by_side():
     print("=== SIDE-BY-SIDE KINSHIP & IBS HEATMAPS ===")
     
-    # Read sample IDs
-    with open('Diversity/Kinship/Faba_Kinship.king.id', 'r') as f:
-        lines = f.readlines()
-        samples = [line.strip().split()[1] for line in lines[1:]]
+    # Read KINSHIP data, labeled with the sample IDs of the .king.id file
+    kinship = load_king('Diversity/Kinship/Faba_Kinship.king')
+    samples = kinship.index.tolist()
 
     print(f"Number of samples: {len(samples)}")
 
-    # Read KINSHIP data
-    kinship_lines = []
-    with open('Diversity/Kinship/Faba_Kinship.king', 'r') as f:
-        for line in f:
-            if line.strip():
-                kinship_lines.append([float(x) for x in line.strip().split()])
-
     n = len(samples)
-    kinship_matrix = np.zeros((n, n))
-    
-    for i in range(len(kinship_lines)):
-        for j in range(len(kinship_lines[i])):
-            kinship_matrix[i+1, j] = kinship_lines[i][j]
-            kinship_matrix[j, i+1] = kinship_lines[i][j]
-    
+    kinship_matrix = kinship.to_numpy(copy=True)
     np.fill_diagonal(kinship_matrix, 1.0)
 
-    # Read IBS data
-    ibs_matrix = np.loadtxt('Diversity/IBS/Faba_IBS.mibs')
+    # Read IBS data, in the sample order of the kinship matrix
+    ibs_matrix = load_matrix('Diversity/IBS/Faba_IBS.mibs').loc[samples, samples].to_numpy()
 
     # Create simple side-by-side figure
     fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(20, 8))
@@ -1,9 +1,15 @@
 import numpy as np
 import matplotlib.pyplot as plt
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from fababean.plink_matrices import load_matrix
 
 # Read data
-samples = [line.strip().split()[1] for line in open('Diversity/IBS/Faba_IBS.mibs.id')]
-ibs_matrix = np.loadtxt('Diversity/IBS/Faba_IBS.mibs')
+ibs = load_matrix('Diversity/IBS/Faba_IBS.mibs')
+samples = ibs.index.tolist()
+ibs_matrix = ibs.to_numpy()
 
 # Create heatmap
 plt.figure(figsize=(12, 10))
@@ -1,19 +1,17 @@
 import numpy as np
 import matplotlib.pyplot as plt
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from fababean.plink_matrices import load_king
 
 # Read kinship data
-samples = [line.strip().split()[1] for line in open('Diversity/Kinship/Faba_Kinship.king.id')]
-kinship_data = np.loadtxt('Diversity/Kinship/Faba_Kinship.king')
+kinship = load_king('Diversity/Kinship/Faba_Kinship.king')
+samples = kinship.index.tolist()
 
-# Reconstruct full matrix
 n_samples = len(samples)
-full_matrix = np.zeros((n_samples, n_samples))
-idx = 0
-for i in range(n_samples):
-    for j in range(i):
-        full_matrix[i, j] = kinship_data[idx]
-        full_matrix[j, i] = kinship_data[idx]
-        idx += 1
+full_matrix = kinship.to_numpy(copy=True)
 np.fill_diagonal(full_matrix, 1.0)
 
 # Create minimal heatmap
@@ -1,6 +1,6 @@
 import matplotlib.pyplot as plt
 import pandas as pd
-from data_loader import SNPDataLoader
+from data_loader import BIM_FILES, SNPDataLoader
 
 def plot_filtering_pipeline(data):
     """Plot SNP counts through the filtering pipeline"""
@@ -69,5 +69,5 @@ def plot_filtering_pipeline(data):
 
 if __name__ == "__main__":
     loader = SNPDataLoader(".")
-    data = loader.load_all_data()
+    data = loader.prefetch(BIM_FILES)
     plot_filtering_pipeline(data)
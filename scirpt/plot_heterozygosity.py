@@ -80,5 +80,5 @@ def plot_heterozygosity(data):
 
 if __name__ == "__main__":
     loader = SNPDataLoader(".")
-    data = loader.load_all_data()
+    data = loader.prefetch(['heterozygosity'])
     plot_heterozygosity(data)
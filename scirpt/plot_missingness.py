@@ -40,5 +40,5 @@ def plot_missingness_distribution(data):
 
 if __name__ == "__main__":
     loader = SNPDataLoader(".")
-    data = loader.load_all_data()
+    data = loader.prefetch(['sample_missingness', 'snp_missingness'])
     plot_missingness_distribution(data)
@@ -1,29 +1,27 @@
 import matplotlib.pyplot as plt
 import pandas as pd
 import numpy as np
-from data_loader import SNPDataLoader
+from data_loader import BIM_FILES, SNPDataLoader
+
+def main_chromosome_counts(data, key, main_chromosomes):
+    """SNPs per main chromosome of a filtering stage, from the position index of its BIM file"""
+    return data[f'{key}_index'].counts(main_chromosomes)
 
 def plot_snp_distribution_main_chromosomes(data):
     """Plot SNP distribution across the 7 main chromosomes for different filtering stages"""
     
-    if 'raw_bim' not in data:
+    if 'raw_bim_index' not in data:
         print("Error: BIM files not loaded")
         return
     
     # Define the main chromosomes based on your data
     main_chromosomes = ['chr1L', 'chr1S', 'chr2', 'chr3', 'chr4', 'chr5', 'chr6']
     
-    # Filter for main chromosomes
-    def filter_main_chromosomes(bim_df):
-        bim_df = bim_df.copy()
-        bim_df['chr_str'] = bim_df['chr'].astype(str)
-        return bim_df[bim_df['chr_str'].isin(main_chromosomes)]
-    
-    # Apply filtering to all BIM files
-    raw_filtered = filter_main_chromosomes(data['raw_bim'])
-    geno05_filtered = filter_main_chromosomes(data['geno05_bim']) if 'geno05_bim' in data else None
-    maf05_filtered = filter_main_chromosomes(data['maf05_bim']) if 'maf05_bim' in data else None
-    pruned_filtered = filter_main_chromosomes(data['pruned_bim']) if 'pruned_bim' in data else None
+    # Per-chromosome counts of all BIM files
+    chr_counts_raw = main_chromosome_counts(data, 'raw_bim', main_chromosomes)
+    chr_counts_geno05 = main_chromosome_counts(data, 'geno05_bim', main_chromosomes) if 'geno05_bim_index' in data else None
+    chr_counts_maf05 = main_chromosome_counts(data, 'maf05_bim', main_chromosomes) if 'maf05_bim_index' in data else None
+    chr_counts_pruned = main_chromosome_counts(data, 'pruned_bim', main_chromosomes) if 'pruned_bim_index' in data else None
     
     # Create the plot
     fig, axes = plt.subplots(2, 2, figsize=(20, 12))
@@ -31,7 +29,6 @@ def plot_snp_distribution_main_chromosomes(data):
                 fontsize=16, fontweight='bold')
     
     # Plot 1: Raw data
-    chr_counts_raw = raw_filtered['chr_str'].value_counts().reindex(main_chromosomes).fillna(0)
     bars_raw = axes[0,0].bar(range(len(chr_counts_raw)), chr_counts_raw.values, 
                            color='skyblue', alpha=0.7, edgecolor='black')
     axes[0,0].set_title('A. Raw SNPs', fontweight='bold')
@@ -47,8 +44,7 @@ def plot_snp_distribution_main_chromosomes(data):
                       f'{int(count):,}', ha='center', va='bottom', fontweight='bold', fontsize=10)
     
     # Plot 2: After genotype filtering
-    if geno05_filtered is not None:
-        chr_counts_geno05 = geno05_filtered['chr_str'].value_counts().reindex(main_chromosomes).fillna(0)
+    if chr_counts_geno05 is not None:
         bars_geno05 = axes[0,1].bar(range(len(chr_counts_geno05)), chr_counts_geno05.values, 
                                   color='lightcoral', alpha=0.7, edgecolor='black')
         axes[0,1].set_title('B. After Genotype Call Rate Filter (--geno 0.05)', fontweight='bold')
@@ -64,8 +60,7 @@ def plot_snp_distribution_main_chromosomes(data):
                           f'{int(count):,}', ha='center', va='bottom', fontweight='bold', fontsize=10)
     
     # Plot 3: After MAF filtering
-    if maf05_filtered is not None:
-        chr_counts_maf05 = maf05_filtered['chr_str'].value_counts().reindex(main_chromosomes).fillna(0)
+    if chr_counts_maf05 is not None:
         bars_maf05 = axes[1,0].bar(range(len(chr_counts_maf05)), chr_counts_maf05.values, 
                                  color='lightgreen', alpha=0.7, edgecolor='black')
         axes[1,0].set_title('C. After MAF Filter (MAF > 0.05)', fontweight='bold')
@@ -81,8 +76,7 @@ def plot_snp_distribution_main_chromosomes(data):
                           f'{int(count):,}', ha='center', va='bottom', fontweight='bold', fontsize=10)
     
     # Plot 4: After LD pruning
-    if pruned_filtered is not None:
-        chr_counts_pruned = pruned_filtered['chr_str'].value_counts().reindex(main_chromosomes).fillna(0)
+    if chr_counts_pruned is not None:
         bars_pruned = axes[1,1].bar(range(len(chr_counts_pruned)), chr_counts_pruned.values, 
                                   color='gold', alpha=0.7, edgecolor='black')
         axes[1,1].set_title('D. After LD Pruning', fontweight='bold')
@@ -103,52 +97,42 @@ def plot_snp_distribution_main_chromosomes(data):
     
     # Print summary statistics
     print("\n=== SNP Counts Summary (Main Chromosomes) ===")
-    print(f"Raw SNPs: {len(raw_filtered):,}")
-    if geno05_filtered is not None:
-        print(f"After genotype filter: {len(geno05_filtered):,}")
-    if maf05_filtered is not None:
-        print(f"After MAF filter: {len(maf05_filtered):,}")
-    if pruned_filtered is not None:
-        print(f"After LD pruning: {len(pruned_filtered):,}")
+    print(f"Raw SNPs: {chr_counts_raw.sum():,}")
+    if chr_counts_geno05 is not None:
+        print(f"After genotype filter: {chr_counts_geno05.sum():,}")
+    if chr_counts_maf05 is not None:
+        print(f"After MAF filter: {chr_counts_maf05.sum():,}")
+    if chr_counts_pruned is not None:
+        print(f"After LD pruning: {chr_counts_pruned.sum():,}")
     
     # Print detailed breakdown
     print("\n=== Detailed Breakdown by Chromosome ===")
     for chrom in main_chromosomes:
-        raw_count = len(raw_filtered[raw_filtered['chr_str'] == chrom])
-        pruned_count = len(pruned_filtered[pruned_filtered['chr_str'] == chrom]) if pruned_filtered is not None else 0
+        raw_count = chr_counts_raw[chrom]
+        pruned_count = chr_counts_pruned[chrom] if chr_counts_pruned is not None else 0
         retention = (pruned_count / raw_count * 100) if raw_count > 0 else 0
         print(f"{chrom}: Raw={raw_count:,}, Pruned={pruned_count:,}, Retention={retention:.1f}%")
 
 def plot_chromosome_comparison(data):
     """Compare SNP counts across main chromosomes for different stages"""
-    if 'raw_bim' not in data:
+    if 'raw_bim_index' not in data:
         return
     
     # Define main chromosomes
     main_chromosomes = ['chr1L', 'chr1S', 'chr2', 'chr3', 'chr4', 'chr5', 'chr6']
     
-    # Filter for main chromosomes
-    def filter_main_chromosomes(bim_df):
-        bim_df = bim_df.copy()
-        bim_df['chr_str'] = bim_df['chr'].astype(str)
-        return bim_df[bim_df['chr_str'].isin(main_chromosomes)]
-    
     # Get chromosome counts for each stage
     chr_counts_data = {}
-    raw_filtered = filter_main_chromosomes(data['raw_bim'])
-    chr_counts_data['Raw'] = raw_filtered['chr_str'].value_counts().reindex(main_chromosomes).fillna(0)
+    chr_counts_data['Raw'] = main_chromosome_counts(data, 'raw_bim', main_chromosomes)
     
-    if 'geno05_bim' in data:
-        geno05_filtered = filter_main_chromosomes(data['geno05_bim'])
-        chr_counts_data['Geno_0.05'] = geno05_filtered['chr_str'].value_counts().reindex(main_chromosomes).fillna(0)
+    if 'geno05_bim_index' in data:
+        chr_counts_data['Geno_0.05'] = main_chromosome_counts(data, 'geno05_bim', main_chromosomes)
     
-    if 'maf05_bim' in data:
-        maf05_filtered = filter_main_chromosomes(data['maf05_bim'])
-        chr_counts_data['MAF_0.05'] = maf05_filtered['chr_str'].value_counts().reindex(main_chromosomes).fillna(0)
+    if 'maf05_bim_index' in data:
+        chr_counts_data['MAF_0.05'] = main_chromosome_counts(data, 'maf05_bim', main_chromosomes)
     
-    if 'pruned_bim' in data:
-        pruned_filtered = filter_main_chromosomes(data['pruned_bim'])
-        chr_counts_data['LD_Pruned'] = pruned_filtered['chr_str'].value_counts().reindex(main_chromosomes).fillna(0)
+    if 'pruned_bim_index' in data:
+        chr_counts_data['LD_Pruned'] = main_chromosome_counts(data, 'pruned_bim', main_chromosomes)
     
     # Create DataFrame with consistent chromosome order
     chr_counts = pd.DataFrame(chr_counts_data)
@@ -186,25 +170,16 @@ def plot_chromosome_comparison(data):
 
 def plot_snp_retention_by_chromosome(data):
     """Plot SNP retention percentage by chromosome"""
-    if 'raw_bim' not in data or 'pruned_bim' not in data:
+    if 'raw_bim_index' not in data or 'pruned_bim_index' not in data:
         print("Raw or pruned data not available for retention plot")
         return
     
     # Define main chromosomes
     main_chromosomes = ['chr1L', 'chr1S', 'chr2', 'chr3', 'chr4', 'chr5', 'chr6']
     
-    # Filter for main chromosomes
-    def filter_main_chromosomes(bim_df):
-        bim_df = bim_df.copy()
-        bim_df['chr_str'] = bim_df['chr'].astype(str)
-        return bim_df[bim_df['chr_str'].isin(main_chromosomes)]
-    
-    raw_filtered = filter_main_chromosomes(data['raw_bim'])
-    pruned_filtered = filter_main_chromosomes(data['pruned_bim'])
-    
     # Get counts by chromosome
-    raw_counts = raw_filtered['chr_str'].value_counts().reindex(main_chromosomes).fillna(0)
-    pruned_counts = pruned_filtered['chr_str'].value_counts().reindex(main_chromosomes).fillna(0)
+    raw_counts = main_chromosome_counts(data, 'raw_bim', main_chromosomes)
+    pruned_counts = main_chromosome_counts(data, 'pruned_bim', main_chromosomes)
     
     # Calculate retention percentage
     retention_pct = (pruned_counts / raw_counts * 100).fillna(0)
@@ -266,7 +241,8 @@ def plot_snp_retention_by_chromosome(data):
 
 if __name__ == "__main__":
     loader = SNPDataLoader(".")
-    data = loader.load_all_data()
+    # Per-chromosome counts only need the position indexes of the BIM files
+    data = loader.prefetch([f'{key}_index' for key in BIM_FILES])
     plot_snp_distribution_main_chromosomes(data)
     plot_chromosome_comparison(data)
     plot_snp_retention_by_chromosome(data)
\ No newline at end of file
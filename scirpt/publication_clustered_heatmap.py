@@ -4,6 +4,11 @@ from matplotlib import rcParams
 import pandas as pd
 from scipy.cluster.hierarchy import linkage, dendrogram
 from scipy.spatial.distance import squareform
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from fababean.plink_matrices import load_king
 
 # Set publication quality style
 plt.style.use('default')
@@ -20,23 +25,12 @@ rcParams.update({
 
 print("Creating publication-ready clustered heatmap...")
 
-# Read samples (skip header)
-with open('Diversity/Kinship/Faba_Kinship.king.id', 'r') as f:
-    samples = [line.split()[1] for line in f.readlines()[1:]]
-
-# Read kinship data
-kinship_data = []
-with open('Diversity/Kinship/Faba_Kinship.king', 'r') as f:
-    for line in f:
-        kinship_data.append([float(x) for x in line.split()])
+# Read kinship matrix, labeled with the sample IDs of the .king.id file
+kinship = load_king('Diversity/Kinship/Faba_Kinship.king')
+samples = kinship.index.tolist()
 
-# Build kinship matrix
 n = len(samples)
-matrix = np.zeros((n, n))
-for i in range(len(kinship_data)):
-    for j in range(len(kinship_data[i])):
-        matrix[i+1, j] = kinship_data[i][j]
-        matrix[j, i+1] = kinship_data[i][j]
+matrix = kinship.to_numpy(copy=True)
 np.fill_diagonal(matrix, 1.0)
 
 # Perform clustering
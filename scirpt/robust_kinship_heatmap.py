@@ -2,6 +2,11 @@ import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib import rcParams
 import pandas as pd
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from fababean.plink_matrices import load_king
 
 # Set style
 plt.style.use('default')
@@ -9,46 +14,13 @@ rcParams['font.family'] = 'DejaVu Sans'
 
 print("=== ROBUST KINSHIP READER ===")
 
-# Read sample IDs
-with open('Diversity/Kinship/Faba_Kinship.king.id', 'r') as f:
-    all_samples = [line.strip().split()[1] for line in f.readlines()]
-
-print(f"All samples in .king.id: {len(all_samples)}")
-print(f"Sample names: {all_samples}")
-
-# Read kinship data
-kinship_lines = []
-with open('Diversity/Kinship/Faba_Kinship.king', 'r') as f:
-    for line in f:
-        if line.strip():  # Skip empty lines
-            kinship_lines.append([float(x) for x in line.strip().split()])
-
-print(f"Kinship file lines: {len(kinship_lines)}")
-
-# Determine the actual number of samples in kinship data
-# For a lower triangular matrix without diagonal, we have n*(n-1)/2 elements
-# Let's find n such that n*(n-1)/2 = total_elements
-total_elements = sum(len(line) for line in kinship_lines)
-print(f"Total kinship values: {total_elements}")
-
-# Solve for n: n*(n-1)/2 = total_elements
-# n^2 - n - 2*total_elements = 0
-n_kinship = int((1 + np.sqrt(1 + 8 * total_elements)) / 2)
-print(f"Calculated samples from kinship data: {n_kinship}")
-
-# Use only the first n_kinship samples
-samples = all_samples[:n_kinship]
+# Read kinship matrix; the loader recognizes the triangle or square shape from the
+# number of values and skips the .king.id header
+kinship = load_king('Diversity/Kinship/Faba_Kinship.king')
+samples = kinship.index.tolist()
 print(f"Using {len(samples)} samples: {samples}")
 
-# Build the kinship matrix
-kinship_matrix = np.zeros((n_kinship, n_kinship))
-
-# Fill the matrix from the triangular data
-idx = 0
-for i in range(n_kinship):
-    for j in range(i):  # j from 0 to i-1 (lower triangular without diagonal)
-        kinship_matrix[i, j] = kinship_lines[i][j]
-        kinship_matrix[j, i] = kinship_lines[i][j]  # Make symmetric
+kinship_matrix = kinship.to_numpy(copy=True)
 
 # Set diagonal to 0 (typical for kinship matrices) or we can set to 1 for self?
 # For visualization, setting diagonal to 1 might be better
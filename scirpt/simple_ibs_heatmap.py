@@ -3,20 +3,24 @@ import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 from scipy.cluster.hierarchy import linkage, dendrogram
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from fababean.plink_matrices import load_matrix
 
 # Set style
 plt.style.use('default')
 plt.rcParams['font.family'] = 'DejaVu Sans'
 
-# Read sample names
-with open('Diversity/IBS/Faba_IBS.mibs.id', 'r') as f:
-    samples = [line.strip().split()[1] for line in f.readlines()]
+# Read the IBS matrix, labeled with the sample names of the .mibs.id file
+ibs = load_matrix('Diversity/IBS/Faba_IBS.mibs')
+samples = ibs.index.tolist()
 
 n_samples = len(samples)
 print(f"Found {n_samples} samples")
 
-# Read the IBS matrix - it's already a full square matrix
-ibs_matrix = np.loadtxt('Diversity/IBS/Faba_IBS.mibs')
+ibs_matrix = ibs.to_numpy()
 
 print(f"IBS matrix shape: {ibs_matrix.shape}")
 print(f"IBS range: {ibs_matrix.min():.4f} - {ibs_matrix.max():.4f}")
@@ -1,32 +1,22 @@
 import numpy as np
 import matplotlib.pyplot as plt
+import sys
+from pathlib import Path
 
-print("=== SIMPLE KINSHIP FIX ===")
-
-# Read samples
-with open('Diversity/Kinship/Faba_Kinship.king.id', 'r') as f:
-    all_samples = [line.split()[1] for line in f]
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from fababean.plink_matrices import load_king
 
-# Read kinship data
-data = []
-with open('Diversity/Kinship/Faba_Kinship.king', 'r') as f:
-    for line in f:
-        data.append([float(x) for x in line.split()])
+print("=== SIMPLE KINSHIP FIX ===")
 
-# Use the number of kinship lines as the sample count
-n = len(data)
-samples = all_samples[:n]  # Use first n samples
+# Read kinship matrix; triangles with or without diagonal are both recognized
+kinship = load_king('Diversity/Kinship/Faba_Kinship.king')
+samples = kinship.index.tolist()
+n = len(samples)
 
 print(f"Using {n} samples from kinship data")
 print(f"Samples: {samples}")
 
-# Build matrix - assuming it's lower triangular including diagonal?
-matrix = np.zeros((n, n))
-for i in range(n):
-    for j in range(len(data[i])):
-        matrix[i, j] = data[i][j]
-        if i != j:  # Avoid overwriting diagonal
-            matrix[j, i] = data[i][j]
+matrix = kinship.to_numpy()
 
 print(f"Matrix shape: {matrix.shape}")
 print(f"Kinship range: {matrix.min():.3f} to {matrix.max():.3f}")
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""Write a SNP/sample subset of a PLINK fileset without launching PLINK."""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from fababean import BedFile, write_subset  # noqa: E402
+
+
+def read_ids(path: Path, column: int) -> list[str]:
+    ids: list[str] = []
+    with path.open("r", encoding="utf-8") as handle:
+        for raw in handle:
+            parts = raw.split()
+            if len(parts) > column:
+                ids.append(parts[column])
+    if not ids:
+        raise ValueError(f"No IDs found in {path}")
+    return ids
+
+
+def read_pairs(path: Path) -> list[tuple[str, str]]:
+    pairs: list[tuple[str, str]] = []
+    with path.open("r", encoding="utf-8") as handle:
+        for raw in handle:
+            parts = raw.split()
+            if len(parts) > 1:
+                pairs.append((parts[0], parts[1]))
+    if not pairs:
+        raise ValueError(f"No FID IID pairs found in {path}")
+    return pairs
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--bfile", required=True, type=Path)
+    parser.add_argument("--extract", type=Path, help="SNP IDs to keep, one per line")
+    parser.add_argument("--keep", type=Path, help="Samples to keep, FID IID per line")
+    parser.add_argument("--out", required=True, type=Path)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    with BedFile(args.bfile) as bed:
+        snps = bed.snp_indices(read_ids(args.extract, 0)) if args.extract else None
+        samples = bed.sample_indices(read_pairs(args.keep)) if args.keep else None
+        n_snps, n_samples = write_subset(bed, args.out, snps, samples)
+    print(f"Wrote {n_snps} SNPs x {n_samples} samples: {args.bfile} -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -27,6 +27,14 @@ run plink \
   --out 01_Raw/Faba_chrOnly_raw \
   --threads "$THREADS"
 
+genotype_store="01_Raw/pop_genotypes.gstore"
+if [[ ! -f "$genotype_store/meta.json" || "$input_vcf" -nt "$genotype_store/meta.json" ]]; then
+  log "Stage 01: VCF -> chunked genotype store (read by later Python steps)"
+  run python3 -m fababean.genotype_store \
+    --vcf "$input_vcf" \
+    --out "$genotype_store"
+fi
+
 log "Stage 01: Missingness and heterozygosity reports"
 run plink \
   --bfile 01_Raw/Faba_chrOnly_raw \
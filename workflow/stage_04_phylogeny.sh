@@ -3,7 +3,6 @@ set -euo pipefail
 
 source "$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)/common.sh"
 
-require_cmd plink
 require_cmd python3
 
 cd "$PROJECT_ROOT"
@@ -20,13 +19,6 @@ run cp -f 03_Fingerprint/data/faba_fingerprint.bed 04_PhylogeneticTree/data/
 run cp -f 03_Fingerprint/data/faba_fingerprint.bim 04_PhylogeneticTree/data/
 run cp -f 03_Fingerprint/data/faba_fingerprint.fam 04_PhylogeneticTree/data/
 
-log "Stage 04: Generate VCF for phylogenetic conversion"
-run plink \
-  --bfile 04_PhylogeneticTree/data/faba_fingerprint \
-  --recode vcf \
-  --allow-extra-chr \
-  --out 04_PhylogeneticTree/data/faba_fingerprint
-
 log "Stage 04: Comprehensive phylogenetic analysis"
 run_in_dir "04_PhylogeneticTree" bash run_comprehensive_phylogenetic_analysis.sh
 